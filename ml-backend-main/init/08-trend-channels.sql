@@ -0,0 +1,17 @@
+-- Create table for the trend channels of generate_trendlines_simplified.py,
+-- kept apart from trendlines so signal generation only reads generate_trendline.py
+-- output there. No DROP: this can also be run against an existing database.
+CREATE TABLE IF NOT EXISTS trend_channels (
+    id SERIAL PRIMARY KEY,
+    symbol VARCHAR(50),
+    timeframe_days INTEGER,
+    trendline_number INTEGER,
+    start_date DATE,
+    end_date DATE,
+    start_price DECIMAL(10,2),
+    end_price DECIMAL(10,2),
+    slope DECIMAL(10,4),
+    trend_type VARCHAR(10), -- 'upper' or 'lower'
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(symbol, timeframe_days, trendline_number)
+);
@@ -0,0 +1,261 @@
+"""
+Vectorized search for the best parallel trend channel
+
+find_best_channel() returns the same channel as trying every pair of pivot
+highs as the upper line against every pair of pivot lows as the lower line
+and keeping the first channel with the highest R-squared (the original
+loops in generate_trendlines_simplified.find_trend_channel), without the
+Python loops:
+
+- all upper and all lower pivot pairs and their slopes are built as arrays,
+- upper pairs are matched to the lower pairs whose slope is within
+  MAX_SLOPE_DIFF with a sort and searchsorted instead of trying every one,
+- the surviving channels are scored with ChannelScorer: cumulative sums
+  give each channel's variance term and a cap on its R-squared in O(1),
+  and only the channels whose cap can still beat the best channel are
+  scored exactly, in batches of NumPy rows.
+
+The width is computed with the same floating point operations as
+calculate_channel_width, so it is identical. The R-squared comes from sums
+taken in a different order than the original loops and can differ from
+them in the last few bits.
+"""
+
+import numpy as np
+
+# A line's two pivots have to be at least this many days apart
+MIN_LINE_DAYS = 15
+# Upper and lower lines count as parallel if their slopes differ by at most this
+MAX_SLOPE_DIFF = 0.1
+MIN_R_SQUARED = 0.2
+# Bars the two lines have to overlap for the channel to be scored
+MIN_PERIOD_BARS = 5
+
+# Upper pairs matched against the lower pairs at a time, and the number of
+# (channel, bar) cells scored at once; these bound the memory used
+UPPER_PAIRS_PER_BLOCK = 256
+SCORE_BATCH_CELLS = 2_000_000
+# Slack when pruning channels on their R-squared cap, for the rounding in
+# the cumulative sums
+BOUND_TOLERANCE = 1e-9
+
+def pivot_pairs(day_numbers, prices, pivots):
+    """
+    Every pair i < j of pivots at least MIN_LINE_DAYS apart, in (i, j)
+    order. Returns the start and end positions of the pairs in the frame
+    and their slopes (price change per day).
+    """
+    i, j = np.triu_indices(len(pivots), k=1)
+    start, end = pivots[i], pivots[j]
+    days_diff = day_numbers[end] - day_numbers[start]
+    keep = days_diff >= MIN_LINE_DAYS
+    start, end, days_diff = start[keep], end[keep], days_diff[keep]
+    return start, end, (prices[end] - prices[start]) / days_diff
+
+def parallel_pairs(upper_slopes, lower_slopes):
+    """
+    (upper, lower) index pairs whose slopes differ by at most
+    MAX_SLOPE_DIFF, ordered by upper index and then lower index
+    """
+    order = np.argsort(lower_slopes, kind='stable')
+    sorted_slopes = lower_slopes[order]
+
+    # Search a slightly wider range so rounding in slope +- MAX_SLOPE_DIFF
+    # can't drop a pair; the exact test below removes the extras
+    margin = 1e-9 * (np.abs(upper_slopes) + MAX_SLOPE_DIFF)
+    lo = np.searchsorted(sorted_slopes, upper_slopes - MAX_SLOPE_DIFF - margin, side='left')
+    hi = np.searchsorted(sorted_slopes, upper_slopes + MAX_SLOPE_DIFF + margin, side='right')
+    counts = hi - lo
+
+    upper = np.repeat(np.arange(len(upper_slopes)), counts)
+    offsets = np.cumsum(counts) - counts
+    lower = order[lo[upper] + np.arange(counts.sum()) - offsets[upper]]
+
+    keep = np.abs(upper_slopes[upper] - lower_slopes[lower]) <= MAX_SLOPE_DIFF
+    upper, lower = upper[keep], lower[keep]
+    by_pair = np.lexsort((lower, upper))
+    return upper[by_pair], lower[by_pair]
+
+class ChannelScorer:
+    """
+    R-squared of many candidate channels over one date-sorted price series
+
+    A channel is scored over the period [start, end] (bar positions) where
+    both its lines exist, against its center line
+    intercept + slope * (day number - first day number):
+
+        r_squared = 1 - sum |close - center| / sum (close - mean close) ** 2
+
+    Cumulative sums of close, close squared and day number make the
+    variance term, and a lower bound on the deviation term, O(1) lookups
+    for any period; the deviation itself is one vectorized expression per
+    batch of channels.
+    """
+
+    def __init__(self, day_numbers, close):
+        self.close = np.asarray(close, dtype=np.float64)
+        # An empty series has no periods to score, but still gets a scorer
+        self._first_day = day_numbers[0] if len(day_numbers) else 0
+        self.days = (np.asarray(day_numbers) - self._first_day).astype(np.float64)
+        missing = np.isnan(self.close)
+        # Sums are taken around the mean so the sum of squares keeps its precision
+        self._offset = self.close[~missing].mean() if (~missing).any() else 0.0
+        shifted = np.where(missing, 0.0, self.close - self._offset)
+
+        def prefix(values):
+            return np.concatenate(([0], np.cumsum(values)))
+
+        self._sum = prefix(shifted)
+        self._sum_squares = prefix(shifted ** 2)
+        self._sum_days = prefix(self.days)
+        self._missing = prefix(missing)
+        # Number of close changes, to tell flat periods (zero variance) exactly
+        self._changes = prefix(np.concatenate(([False], self.close[1:] != self.close[:-1])))
+
+    def intercept(self, upper_start_day, upper_price, lower_start_day, lower_price, slope):
+        """
+        Center line intercept of channels whose upper and lower lines start
+        on the given day numbers at the given prices and share the given slope
+        """
+        return ((upper_price - slope * (upper_start_day - self._first_day))
+                + (lower_price - slope * (lower_start_day - self._first_day))) / 2
+
+    def total_variance(self, starts, ends):
+        """Sum of squared differences of close from its mean over each period"""
+        n = ends - starts + 1
+        total = self._sum[ends + 1] - self._sum[starts]
+        variance = (self._sum_squares[ends + 1] - self._sum_squares[starts]) - total * total / n
+        flat = self._changes[ends + 1] - self._changes[starts + 1] == 0
+        variance = np.where(flat, 0.0, np.maximum(variance, 0.0))
+        return np.where(self._missing[ends + 1] > self._missing[starts], np.nan, variance)
+
+    def deviation_bound(self, starts, ends, slope, intercept):
+        """
+        Lower bound of sum |close - center| over each period: the absolute
+        value of the summed differences, from the cumulative sums
+        """
+        n = ends - starts + 1
+        total_close = (self._sum[ends + 1] - self._sum[starts]) + n * self._offset
+        total_center = n * intercept + slope * (self._sum_days[ends + 1] - self._sum_days[starts])
+        return np.abs(total_close - total_center)
+
+    def deviation(self, starts, ends, slope, intercept):
+        """Sum of |close - center| over each period, one row per channel"""
+        length = int((ends - starts).max()) + 1
+        positions = starts[:, None] + np.arange(length)
+        valid = positions <= ends[:, None]
+        positions = np.minimum(positions, len(self.close) - 1)
+        center = intercept[:, None] + slope[:, None] * self.days[positions]
+        return np.where(valid, np.abs(self.close[positions] - center), 0.0).sum(axis=1)
+
+    def r_squared(self, starts, ends, slope, intercept, total_variance=None):
+        """
+        R-squared of each channel: 0 for periods shorter than
+        MIN_PERIOD_BARS, without variance or with a missing close, and
+        never negative
+        """
+        if total_variance is None:
+            total_variance = self.total_variance(starts, ends)
+        scored = (ends - starts + 1 >= MIN_PERIOD_BARS) & (total_variance > 0)
+        result = np.zeros(len(starts))
+        idx = np.flatnonzero(scored)
+        rows = self.batch_rows(starts[idx], ends[idx]) if len(idx) else 1
+        for k in range(0, len(idx), rows):
+            batch = idx[k:k + rows]
+            deviation = self.deviation(starts[batch], ends[batch], slope[batch], intercept[batch])
+            result[batch] = np.maximum(0, 1 - deviation / total_variance[batch])
+        return result
+
+    @staticmethod
+    def batch_rows(starts, ends):
+        """Channels scored per batch so a batch holds about SCORE_BATCH_CELLS cells"""
+        return max(1, SCORE_BATCH_CELLS // (int((ends - starts).max()) + 1))
+
+def find_best_channel(day_numbers, high, low, close, pivot_highs, pivot_lows):
+    """
+    Return the best channel through pivot pairs of a date-sorted frame as a
+    dict of frame positions (upper_start, upper_end, lower_start, lower_end),
+    slope, channel_width and r_squared, or None if no channel has an
+    R-squared above MIN_R_SQUARED and a positive width.
+
+    day_numbers: the frame's dates as integer day numbers
+    high, low, close: the frame's prices as float arrays
+    pivot_highs, pivot_lows: positions of the pivot highs and lows
+    """
+    upper_start, upper_end, upper_slope = pivot_pairs(day_numbers, high, pivot_highs)
+    lower_start, lower_end, lower_slope = pivot_pairs(day_numbers, low, pivot_lows)
+    if len(upper_slope) == 0 or len(lower_slope) == 0:
+        return None
+
+    scorer = ChannelScorer(day_numbers, close)
+    best = None
+    best_r_squared = MIN_R_SQUARED
+    for block in range(0, len(upper_slope), UPPER_PAIRS_PER_BLOCK):
+        upper, lower = parallel_pairs(upper_slope[block:block + UPPER_PAIRS_PER_BLOCK], lower_slope)
+        upper += block
+        if len(upper) == 0:
+            continue
+
+        us, ue = upper_start[upper], upper_end[upper]
+        ls, le = lower_start[lower], lower_end[lower]
+        usp, lsp = high[us], low[ls]
+        slope = (upper_slope[upper] + lower_slope[lower]) / 2
+
+        # The period where both lines exist
+        starts = np.maximum(us, ls)
+        ends = np.minimum(ue, le)
+
+        # Average of the channel's width at the start and end of the period
+        width_start = (usp + (slope * (day_numbers[starts] - day_numbers[us]))) - \
+                      (lsp + (slope * (day_numbers[starts] - day_numbers[ls])))
+        width_end = (usp + (slope * (day_numbers[ends] - day_numbers[us]))) - \
+                    (lsp + (slope * (day_numbers[ends] - day_numbers[ls])))
+        width = (width_start + width_end) / 2
+
+        candidates = np.flatnonzero((starts < ends) & (ends - starts + 1 >= MIN_PERIOD_BARS) & (width > 0))
+        if len(candidates) == 0:
+            continue
+        starts, ends, slope = starts[candidates], ends[candidates], slope[candidates]
+        intercept = scorer.intercept(day_numbers[us[candidates]], usp[candidates],
+                                     day_numbers[ls[candidates]], lsp[candidates], slope)
+        total_variance = scorer.total_variance(starts, ends)
+
+        # The prefix-sum bound on the deviation caps each channel's R-squared;
+        # only channels whose cap reaches the best so far are scored exactly,
+        # highest cap first, until no remaining cap can reach the best
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cap = 1 - scorer.deviation_bound(starts, ends, slope, intercept) / total_variance
+        cap = np.where(total_variance > 0, cap, -np.inf)
+        order = np.flatnonzero(cap > best_r_squared - BOUND_TOLERANCE)
+        order = order[np.argsort(-cap[order], kind='stable')]
+
+        block_r_squared = best_r_squared
+        block_best = None
+        rows = ChannelScorer.batch_rows(starts[order], ends[order]) if len(order) else 1
+        for k in range(0, len(order), rows):
+            batch = order[k:k + rows]
+            if cap[batch[0]] <= block_r_squared - BOUND_TOLERANCE:
+                break
+            r_squared = scorer.r_squared(starts[batch], ends[batch], slope[batch], intercept[batch],
+                                         total_variance[batch])
+            # The first channel (in pair order) with the highest R-squared wins
+            top = r_squared.max()
+            if top > block_r_squared or (top == block_r_squared and block_best is not None):
+                tied = batch[r_squared == top]
+                first = tied.min()
+                if top > block_r_squared or first < block_best:
+                    block_r_squared, block_best = top, first
+
+        if block_best is not None:
+            best_r_squared = block_r_squared
+            c = candidates[block_best]
+            best = {
+                'upper_start': us[c],
+                'upper_end': ue[c],
+                'lower_start': ls[c],
+                'lower_end': le[c],
+                'slope': slope[block_best],
+                'channel_width': width[c],
+                'r_squared': block_r_squared,
+            }
+    return best
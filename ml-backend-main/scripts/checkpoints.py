@@ -0,0 +1,93 @@
+"""
+Per-symbol checkpoints for resumable pipeline stages
+
+Each stage keeps an append-only log of the symbols it has finished in the
+current run under pipeline-state/checkpoints/. A normal run starts a new log;
+a run with --resume reads the log left by the interrupted run and processes
+only the symbols that are not in it. Stages that only produce their output
+at the end of the run can store each symbol's result in the log so the
+finished symbols don't have to be recomputed.
+"""
+
+import json
+import logging
+import os
+from datetime import date, datetime
+from decimal import Decimal
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHECKPOINT_DIR = os.path.join(BASE_DIR, "pipeline-state", "checkpoints")
+
+def add_resume_argument(parser):
+    """Add the common --resume option to a script's argument parser"""
+    parser.add_argument(
+        '--resume', action='store_true',
+        help="Continue the last interrupted run: skip symbols it already finished "
+             "and keep their results instead of clearing the tables first"
+    )
+
+def _to_json(value):
+    """Convert database and NumPy values that json can't serialise"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f"Cannot checkpoint value of type {type(value).__name__}")
+
+class SymbolCheckpoint:
+    """Append-only record of the symbols a stage has finished in this run"""
+
+    def __init__(self, stage, resume=False, checkpoint_dir=CHECKPOINT_DIR):
+        self.stage = stage
+        self.path = os.path.join(checkpoint_dir, f"{stage}.jsonl")
+        self.results = {}
+
+        partial_line = False
+        if resume:
+            partial_line = self._load()
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        self._file = open(self.path, 'a' if resume else 'w')
+        if partial_line:
+            # Start new entries on a line of their own
+            self._file.write("\n")
+        if resume:
+            logger.info(f"Resuming {stage}: {len(self.results)} symbols already finished")
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            logger.warning(f"No checkpoint for {self.stage} to resume from, starting from scratch")
+            return False
+        line = "\n"
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A line cut short by the crash; that symbol runs again
+                    continue
+                self.results[entry['symbol']] = entry.get('result')
+        return not line.endswith("\n")
+
+    def remaining(self, symbols):
+        """Return the symbols not yet finished, keeping their order"""
+        return [symbol for symbol in symbols if symbol not in self.results]
+
+    def mark_done(self, symbol, result=None):
+        """Record a finished symbol (and optionally its result) durably"""
+        self.results[symbol] = result
+        self._file.write(json.dumps({'symbol': symbol, 'result': result}, default=_to_json) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -6,9 +6,14 @@ from psycopg2.extras import execute_values
 import logging
 import os
 import glob
+import argparse
 import talib
 from talib import abstract
 from dotenv import load_dotenv
+import pipeline_metrics
+from symbol_pool import add_workers_argument, run_sharded
+from checkpoints import SymbolCheckpoint, add_resume_argument
+from ohlcv_panel import OHLCVPanel, symbol_frame
 
 # Load environment variables
 load_dotenv()
@@ -70,6 +75,35 @@ def get_historical_data(conn, symbol, days=120):
     finally:
         cursor.close()
 
+def load_history_panel(conn, days=120):
+    """Load every symbol's recent price data with one query into a shared panel"""
+    cursor = conn.cursor()
+    try:
+        start_date = datetime.now() - timedelta(days=days)
+        
+        cursor.execute("""
+            SELECT date, symbol, open, high, low, close, volume
+            FROM daily_data
+            WHERE date >= %s
+        """, (start_date,))
+        
+        df = pd.DataFrame(cursor.fetchall(),
+                          columns=['date', 'symbol', 'open', 'high', 'low', 'close', 'volume'])
+        for col in ['open', 'high', 'low', 'close', 'volume']:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+        
+        return OHLCVPanel.build(df)
+    finally:
+        cursor.close()
+
+def get_panel_history(symbol, panel_ref):
+    """Get a symbol's historical data from the shared panel, like get_historical_data"""
+    df = symbol_frame(panel_ref).dropna()
+    if df.empty:
+        logger.warning(f"No historical data found for {symbol}")
+        return None
+    return df
+
 def get_trading_zones(conn, symbol, timeframe_days=90):
     """Get trading zones for a symbol"""
     cursor = conn.cursor()
@@ -400,6 +434,7 @@ def store_ai_signals(conn, signals):
         )
         
         conn.commit()
+        pipeline_metrics.count(rows_written=len(values))
         logger.info(f"Successfully stored {len(values)} AI trading signals in ai_trading_signals_new table")
     except Exception as e:
         conn.rollback()
@@ -557,6 +592,7 @@ def store_in_signal_history(conn, signals):
         )
         
         conn.commit()
+        pipeline_metrics.count(rows_written=len(values))
         logger.info(f"Successfully stored {len(values)} signals in history table for tracking")
     except Exception as e:
         conn.rollback()
@@ -577,10 +613,54 @@ def cleanup_ai_signals(conn):
     finally:
         cursor.close()
 
-def main():
+def process_symbol(symbol, conn, panel_ref=None):
+    """Generate the AI signal for one symbol, or None if there is not enough data"""
+    logger.info(f"Processing {symbol}...")
+    
+    # Get historical data, from the shared panel when the symbol is in it
+    if panel_ref is not None:
+        df = get_panel_history(symbol, panel_ref)
+    else:
+        df = get_historical_data(conn, symbol)
+    pipeline_metrics.count(rows_read=0 if df is None else len(df), symbols_processed=1)
+    if df is None or len(df) < 30:
+        logger.warning(f"Not enough historical data for {symbol}")
+        return None
+    
+    # Calculate technical indicators
+    df_with_indicators = calculate_technical_indicators(df)
+    if df_with_indicators is None:
+        logger.warning(f"Failed to calculate indicators for {symbol}")
+        return None
+    
+    # Get trading zones
+    zones = get_trading_zones(conn, symbol)
+    if not zones or (not zones.get('support') and not zones.get('resistance')):
+        logger.warning(f"No trading zones found for {symbol}")
+        # Continue anyway as we can still use technical indicators
+    
+    # Get trendline
+    trendline = get_trendline(conn, symbol)
+    
+    # Analyze signals
+    return analyze_signals(df_with_indicators, zones, trendline)
+
+def process_symbol_task(symbol, panel_ref, conn):
+    """Worker entry point: generate one symbol's AI signal on the given connection"""
+    try:
+        return process_symbol(symbol, conn, panel_ref)
+    except Exception:
+        # Keep a failed query from aborting the connection for later symbols
+        conn.rollback()
+        raise
+
+def main(conn=None, workers=1, resume=False):
+    own_conn = conn is None
+    checkpoint = SymbolCheckpoint('ai_signals', resume)
     try:
         # Get database connection
-        conn = get_db_connection()
+        if own_conn:
+            conn = get_db_connection()
         
         # Clean up existing AI signals
         # cleanup_ai_signals(conn)
@@ -592,42 +672,25 @@ def main():
         symbols = get_all_symbols(conn)
         logger.info(f"Found {len(symbols)} symbols to process")
         
-        # Process each symbol
-        all_signals = {}
-        for symbol in symbols:
-            try:
-                logger.info(f"Processing {symbol}...")
-                
-                # Get historical data
-                df = get_historical_data(conn, symbol)
-                if df is None or len(df) < 30:
-                    logger.warning(f"Not enough historical data for {symbol}")
-                    continue
-                
-                # Calculate technical indicators
-                df_with_indicators = calculate_technical_indicators(df)
-                if df_with_indicators is None:
-                    logger.warning(f"Failed to calculate indicators for {symbol}")
+        # Load the price history of every symbol once into shared memory;
+        # each task only carries a reference to its symbol's rows
+        with load_history_panel(conn) as panel:
+            refs = {symbol: panel.ref(symbol) for symbol in panel.symbols}
+            
+            # Process each symbol not finished by an interrupted run
+            tasks = [(symbol, refs.get(symbol)) for symbol in checkpoint.remaining(symbols)]
+            for symbol, signal, error in run_sharded(tasks, process_symbol_task, workers,
+                                                     get_db_connection, conn):
+                if error:
+                    logger.error(f"Error processing {symbol}: {error}")
                     continue
-                
-                # Get trading zones
-                zones = get_trading_zones(conn, symbol)
-                if not zones or (not zones.get('support') and not zones.get('resistance')):
-                    logger.warning(f"No trading zones found for {symbol}")
-                    # Continue anyway as we can still use technical indicators
-                
-                # Get trendline
-                trendline = get_trendline(conn, symbol)
-                
-                # Analyze signals
-                signal = analyze_signals(df_with_indicators, zones, trendline)
+                checkpoint.mark_done(symbol, signal)
                 if signal:
-                    all_signals[symbol] = signal
                     logger.info(f"Generated signal for {symbol}: {signal['signal']}")
-                    
-            except Exception as e:
-                logger.error(f"Error processing {symbol}: {e}")
-                continue
+        
+        # Include signals checkpointed before an interruption, in symbol order
+        all_signals = {symbol: checkpoint.results[symbol] for symbol in symbols
+                       if checkpoint.results.get(symbol)}
         
         # Store signals
         if all_signals:
@@ -692,8 +755,13 @@ def main():
         import traceback
         logger.error(traceback.format_exc())
     finally:
-        if 'conn' in locals():
+        checkpoint.close()
+        if own_conn and conn is not None:
             conn.close()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate AI trading signals for every symbol")
+    add_workers_argument(parser)
+    add_resume_argument(parser)
+    args = parser.parse_args()
+    main(workers=args.workers, resume=args.resume)
@@ -5,8 +5,11 @@ import psycopg2
 from psycopg2.extras import execute_values
 import logging
 import os
+import argparse
 from dotenv import load_dotenv
-import re
+from concurrent.futures import ThreadPoolExecutor
+import pipeline_metrics
+import ohlcv_store
 
 # Load environment variables
 load_dotenv()
@@ -15,6 +18,9 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Number of threads writing symbols to the store at the same time
+WRITER_THREADS = int(os.getenv('DAILY_DATA_WRITER_THREADS', '4'))
+
 def get_db_connection():
     """Create a database connection"""
     try:
@@ -36,43 +42,68 @@ class DailyDataGenerator:
         # Get the absolute path to the backend directory
         self.base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         self.input_file = os.path.join(self.base_dir, "data", "daily_data_202507172305.csv")
-        self.output_dir = os.path.join(self.base_dir, "all-data")
-        
-    def _sanitize_filename(self, symbol: str) -> str:
-        """Replace invalid filename characters with underscores"""
-        # Replace any character that's not alphanumeric or underscore with underscore
-        return re.sub(r'[^a-zA-Z0-9_]', '_', symbol)
-        
-    def generate_data(self):
-        """Generate individual CSV files for each symbol from the main daily data file"""
-        print(f"Reading data from {self.input_file}...")
+        self.output_dir = ohlcv_store.STORE_DIR
         
-        # Read the main CSV file
-        df = pd.read_csv(self.input_file)
+    def generate_data(self, df=None):
+        """Split the main daily data file into the per-symbol OHLCV store"""
+        if df is None:
+            print(f"Reading data from {self.input_file}...")
+            
+            # Read the main CSV file
+            df = ohlcv_store.load_daily_csv(self.input_file)
+        pipeline_metrics.count(rows_read=len(df))
         
         # Create output directory if it doesn't exist
         if not os.path.exists(self.output_dir):
             os.makedirs(self.output_dir)
         
-        # Get unique symbols
-        symbols = df['symbol'].unique()
+        # Split data by symbol in one pass and write the symbols to the store
+        # from a small pool of writers
+        manifest = ohlcv_store.load_manifest(self.output_dir)
+        with ThreadPoolExecutor(max_workers=WRITER_THREADS) as executor:
+            futures = {}
+            for symbol, symbol_data in df.groupby('symbol', sort=False, observed=True):
+                print(f"Processing {symbol}...")
+                futures[symbol] = executor.submit(ohlcv_store.rebuild_symbol, symbol, symbol_data,
+                                                  manifest['symbols'].get(symbol), self.output_dir)
+            
+            for symbol, future in futures.items():
+                entry = future.result()
+                manifest['symbols'][symbol] = entry
+                pipeline_metrics.count(rows_written=entry['rows'], symbols_processed=1)
+                print(f"Saved data for {symbol} to {os.path.join(self.output_dir, entry['dir'])}")
+        
+        ohlcv_store.save_manifest(manifest, self.output_dir)
+    
+    def ingest_data(self, drop_file):
+        """Append the new bars of a daily drop file to the per-symbol store"""
+        print(f"Ingesting daily drop {drop_file}...")
+        df = pd.read_csv(drop_file)
+        pipeline_metrics.count(rows_read=len(df))
         
-        # Generate timestamp once for all files
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+        with ThreadPoolExecutor(max_workers=WRITER_THREADS) as executor:
+            new_bars = ohlcv_store.ingest(df, self.output_dir, executor)
         
-        # Split data by symbol and save to individual files
-        for symbol in symbols:
-            print(f"Processing {symbol}...")
-            symbol_data = df[df['symbol'] == symbol].copy()
-            
-            if not symbol_data.empty:
-                # Sanitize the symbol name for the filename
-                safe_symbol = self._sanitize_filename(symbol)
-                filename = f"{safe_symbol}_daily_data_{timestamp}.csv"
-                filepath = os.path.join(self.output_dir, filename)
-                symbol_data.to_csv(filepath, index=False)
-                print(f"Saved data for {symbol} to {filepath}")
+        for symbol, rows in new_bars.items():
+            pipeline_metrics.count(rows_written=rows, symbols_processed=1)
+            print(f"Appended {rows} new bars for {symbol}")
+        print(f"Ingest complete: {len(new_bars)} symbols received new bars")
+        return new_bars
 
-if __name__ == "__main__":
+def main(daily_df=None, ingest_file=None):
+    """Split the master daily data file into the per-symbol store, or ingest a daily drop"""
     generator = DailyDataGenerator()
-    generator.generate_data() 
\ No newline at end of file
+    if ingest_file:
+        generator.ingest_data(ingest_file)
+    else:
+        generator.generate_data(daily_df)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the per-symbol daily data store")
+    parser.add_argument(
+        '--ingest', metavar='DROP_CSV',
+        help="Append only the new bars of a daily drop (deduplicated on symbol and date) "
+             "instead of rebuilding the store from the master file"
+    )
+    args = parser.parse_args()
+    main(ingest_file=args.ingest) 
\ No newline at end of file
@@ -5,7 +5,11 @@ import psycopg2
 from psycopg2.extras import execute_values
 import logging
 import os
+import argparse
 from dotenv import load_dotenv
+import pipeline_metrics
+from symbol_pool import add_workers_argument, run_sharded
+from checkpoints import SymbolCheckpoint, add_resume_argument
 
 # Load environment variables
 load_dotenv()
@@ -213,6 +217,7 @@ def store_signals(conn, signals):
         )
         
         conn.commit()
+        pipeline_metrics.count(rows_written=len(values))
         logger.info(f"Successfully stored {len(values)} trading signals")
         
         # Verify the stored data
@@ -249,10 +254,47 @@ def cleanup_signals(conn):
     finally:
         cursor.close()
 
-def main():
+def process_symbol(symbol, conn):
+    """Calculate the trading signal for one symbol, or None if it has no price data or zones"""
+    # Get latest price and change
+    price_data = get_latest_price_and_change(conn, symbol)
+    if not price_data:
+        logger.warning(f"No price data found for {symbol}")
+        return None
+        
+    price_data['symbol'] = symbol
+    
+    # Get trading zones
+    zones = get_trading_zones(conn, symbol)
+    if not zones:
+        logger.warning(f"No trading zones found for {symbol}")
+        return None
+    
+    # Get trendline
+    trendline = get_trendline(conn, symbol)
+    pipeline_metrics.count(rows_read=1 + len(zones) + (1 if trendline else 0))
+    
+    # Calculate signals
+    signal = calculate_signals(price_data, zones, trendline)
+    pipeline_metrics.count(symbols_processed=1)
+    return signal
+
+def process_symbol_task(symbol, _, conn):
+    """Worker entry point: calculate one symbol's signal on the given connection"""
+    try:
+        return process_symbol(symbol, conn)
+    except Exception:
+        # Keep a failed query from aborting the connection for later symbols
+        conn.rollback()
+        raise
+
+def main(conn=None, workers=1, resume=False):
+    own_conn = conn is None
+    checkpoint = SymbolCheckpoint('signals', resume)
     try:
         # Get database connection
-        conn = get_db_connection()
+        if own_conn:
+            conn = get_db_connection()
         
         # Clean up existing signals
         cleanup_signals(conn)
@@ -261,36 +303,21 @@ def main():
         symbols = get_all_symbols(conn)
         logger.info(f"Found {len(symbols)} symbols to process")
         
-        # Process each symbol
-        signals = []
-        for symbol in symbols:
-            try:
-                # Get latest price and change
-                price_data = get_latest_price_and_change(conn, symbol)
-                if not price_data:
-                    logger.warning(f"No price data found for {symbol}")
-                    continue
-                    
-                price_data['symbol'] = symbol
-                
-                # Get trading zones
-                zones = get_trading_zones(conn, symbol)
-                if not zones:
-                    logger.warning(f"No trading zones found for {symbol}")
-                    continue
-                
-                # Get trendline
-                trendline = get_trendline(conn, symbol)
-                
-                # Calculate signals
-                signal = calculate_signals(price_data, zones, trendline)
-                if signal:
-                    signals.append(signal)
-                    logger.info(f"Generated signal for {symbol}: {signal['signal']}")
-                    
-            except Exception as e:
-                logger.error(f"Error processing {symbol}: {e}")
+        # Process each symbol not finished by an interrupted run
+        tasks = [(symbol, None) for symbol in checkpoint.remaining(symbols)]
+        for symbol, signal, error in run_sharded(tasks, process_symbol_task, workers,
+                                                 get_db_connection, conn):
+            if error:
+                logger.error(f"Error processing {symbol}: {error}")
                 continue
+            checkpoint.mark_done(symbol, signal)
+            if signal:
+                logger.info(f"Generated signal for {symbol}: {signal['signal']}")
+        
+        # Signals are stored together at the end, so this includes the ones
+        # checkpointed before an interruption, in symbol order
+        signals = [checkpoint.results[symbol] for symbol in symbols
+                   if checkpoint.results.get(symbol)]
         
         # Store signals
         if signals:
@@ -321,8 +348,13 @@ def main():
     except Exception as e:
         logger.error(f"Error in main execution: {e}")
     finally:
-        if 'conn' in locals():
+        checkpoint.close()
+        if own_conn and conn is not None:
             conn.close()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate trading signals for every symbol")
+    add_workers_argument(parser)
+    add_resume_argument(parser)
+    args = parser.parse_args()
+    main(workers=args.workers, resume=args.resume)
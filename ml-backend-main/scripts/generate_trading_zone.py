@@ -5,7 +5,11 @@ import psycopg2
 from psycopg2.extras import execute_values
 import logging
 import os
+import argparse
 from dotenv import load_dotenv
+import pipeline_metrics
+from symbol_pool import add_workers_argument, run_sharded
+from checkpoints import SymbolCheckpoint, add_resume_argument
 
 # Load environment variables
 load_dotenv()
@@ -161,6 +165,7 @@ def store_trading_zones(conn, zones, symbol, timeframe_days):
         )
         
         conn.commit()
+        pipeline_metrics.count(rows_written=len(values))
         logger.info(f"Successfully stored {len(values)} trading zones in database")
     except Exception as e:
         conn.rollback()
@@ -169,14 +174,17 @@ def store_trading_zones(conn, zones, symbol, timeframe_days):
     finally:
         cursor.close()
 
-def analyze_trading_zones(symbol, timeframe_days):
+def analyze_trading_zones(symbol, timeframe_days, conn=None):
     """
-    Analyze and calculate trading zones for a symbol and timeframe
+    Analyze and calculate trading zones for a symbol and timeframe. Returns
+    None if the symbol has no price data or zones; errors are logged and
+    raised so the symbol isn't checkpointed as done.
     """
-    conn = None
+    own_conn = conn is None
     try:
         # Get current price from daily data
-        conn = get_db_connection()
+        if own_conn:
+            conn = get_db_connection()
         cursor = conn.cursor()
         
         # Get the latest price
@@ -195,6 +203,7 @@ def analyze_trading_zones(symbol, timeframe_days):
         
         # Get support and resistance zones
         support_zones, resistance_zones = get_support_resistance_zones(conn, symbol, timeframe_days)
+        pipeline_metrics.count(rows_read=1 + len(support_zones) + len(resistance_zones))
         
         if not support_zones or not resistance_zones:
             logger.warning(f"No support/resistance zones found for symbol {symbol}")
@@ -205,6 +214,7 @@ def analyze_trading_zones(symbol, timeframe_days):
         
         # Store trading zones
         store_trading_zones(conn, trading_zones, symbol, timeframe_days)
+        pipeline_metrics.count(symbols_processed=1)
         
         # Print results
         print(f"\nTrading Zones Analysis for {symbol} ({timeframe_days} days):")
@@ -232,9 +242,11 @@ def analyze_trading_zones(symbol, timeframe_days):
         return trading_zones
     except Exception as e:
         logger.error(f"Error in analyze_trading_zones for {symbol}: {e}")
-        return None
+        if conn is not None and not own_conn:
+            conn.rollback()
+        raise
     finally:
-        if conn:
+        if own_conn and conn is not None:
             conn.close()
 
 def cleanup_trading_zones(conn):
@@ -250,29 +262,47 @@ def cleanup_trading_zones(conn):
     finally:
         cursor.close()
 
-def main():
+def process_symbol_task(symbol, timeframe_days, conn):
+    """Worker entry point: analyze one symbol's trading zones on the given connection"""
+    logger.info(f"Processing {symbol}...")
+    return analyze_trading_zones(symbol, timeframe_days, conn)
+
+def main(conn=None, workers=1, resume=False):
     # Get database connection
-    conn = get_db_connection()
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    checkpoint = SymbolCheckpoint('trading_zones', resume)
     try:
-        # Clean up existing trading zones
-        cleanup_trading_zones(conn)
+        # Clean up existing trading zones, unless resuming an interrupted run
+        if not resume:
+            cleanup_trading_zones(conn)
         
         # Get all symbols
         symbols = get_all_symbols(conn)
         logger.info(f"Found {len(symbols)} symbols to process")
+        if resume:
+            symbols = checkpoint.remaining(symbols)
+            logger.info(f"{len(symbols)} symbols left to process")
         
-        # Process each symbol
-        for symbol in symbols:
-            try:
-                logger.info(f"Processing {symbol}...")
-                analyze_trading_zones(symbol, 90)  # Using 90-day timeframe
-            except Exception as e:
-                logger.error(f"Error processing {symbol}: {e}")
-                continue
+        # Process each symbol, using the 90-day timeframe
+        tasks = [(symbol, 90) for symbol in symbols]
+        for symbol, _, error in run_sharded(tasks, process_symbol_task, workers,
+                                            get_db_connection, conn):
+            if error:
+                logger.error(f"Error processing {symbol}: {error}")
+            else:
+                checkpoint.mark_done(symbol)
         
         print("\nAnalysis complete! Check the database for stored trading zones.")
     finally:
-        conn.close()
+        checkpoint.close()
+        if own_conn:
+            conn.close()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate trading zones for every symbol")
+    add_workers_argument(parser)
+    add_resume_argument(parser)
+    args = parser.parse_args()
+    main(workers=args.workers, resume=args.resume)
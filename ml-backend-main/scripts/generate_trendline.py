@@ -3,11 +3,16 @@ import numpy as np
 from scipy.signal import argrelextrema
 from datetime import datetime, timedelta
 import psycopg2
-from psycopg2.extras import execute_values
 import logging
 import os
-import glob
+import argparse
 from dotenv import load_dotenv
+import pipeline_metrics
+from pg_bulk import create_staging_table, copy_rows, merge_from_staging
+import ohlcv_store
+from ohlcv_panel import OHLCVPanel, symbol_frame
+from symbol_pool import add_workers_argument, run_sharded
+from checkpoints import SymbolCheckpoint, add_resume_argument
 
 # Load environment variables
 load_dotenv()
@@ -16,6 +21,19 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Trendlines stored per symbol and timeframe. Signal generation reads the
+# one ending latest, so the latest-ending (then steepest) lines are kept.
+MAX_TRENDLINES_PER_TIMEFRAME = int(os.getenv('MAX_TRENDLINES_PER_TIMEFRAME', '10'))
+
+# Symbols whose trendlines are buffered and written together in one transaction
+TRENDLINE_BATCH_SYMBOLS = int(os.getenv('TRENDLINE_BATCH_SYMBOLS', '1000'))
+
+TRENDLINE_COLUMNS = ['symbol', 'timeframe_days', 'trendline_number', 'start_date', 'end_date',
+                     'start_price', 'end_price', 'slope', 'trend_type']
+
+# Bars on each side a pivot has to be lower (minima) or higher (maxima) than
+PIVOT_ORDER = 5
+
 def get_db_connection():
     """Create a database connection"""
     try:
@@ -32,74 +50,130 @@ def get_db_connection():
         logger.error(f"Error connecting to database: {e}")
         raise
 
-def store_trendlines(conn, trendlines, symbol, timeframe_days):
-    """Store trendlines in the database"""
+def trendline_rows(trendlines, symbol, timeframe_days):
+    """Convert trendlines to rows of the trendlines table"""
+    values = []
+    for i, trendline in enumerate(trendlines, 1):
+        values.append((
+            symbol,
+            timeframe_days,
+            i,
+            trendline['start_date'].date(),
+            trendline['end_date'].date(),
+            float(trendline['start_price']),
+            float(trendline['end_price']),
+            float(trendline['slope']),
+            trendline['trend_type']
+        ))
+    return values
+
+def store_trendlines(conn, results):
+    """
+    Replace the trendlines of a batch of symbols and timeframes in one
+    transaction: the rows are copied into a staging table and merged into
+    trendlines with one statement.
+    results: list of (symbol, timeframe_days, rows)
+    """
     cursor = conn.cursor()
-    
     try:
-        # Delete existing trendlines for this symbol and timeframe
-        cursor.execute("DELETE FROM trendlines WHERE symbol = %s AND timeframe_days = %s",
-                      (symbol, timeframe_days))
-        logger.info(f"Deleted existing trendlines for {symbol} with timeframe {timeframe_days}")
-        
-        if not trendlines:
-            logger.warning(f"No trendlines to store for {symbol} with timeframe {timeframe_days}")
-            return
+        # Delete existing trendlines for these symbols and timeframes
+        cursor.execute("""
+            DELETE FROM trendlines
+            WHERE (symbol, timeframe_days) IN (
+                SELECT * FROM unnest(%s::varchar[], %s::integer[])
+            )
+        """, ([symbol for symbol, _, _ in results], [days for _, days, _ in results]))
         
-        # Prepare data for insertion
-        values = []
-        for i, trendline in enumerate(trendlines, 1):
-            values.append((
-                symbol,
-                timeframe_days,
-                i,
-                trendline['start_date'],
-                trendline['end_date'],
-                float(trendline['start_price']),
-                float(trendline['end_price']),
-                float(trendline['slope']),
-                trendline['trend_type']
-            ))
-        
-        logger.info(f"Prepared {len(values)} trendlines for insertion")
-        
-        # Insert new trendlines
-        execute_values(
-            cursor,
-            """
-            INSERT INTO trendlines 
-            (symbol, timeframe_days, trendline_number, start_date, end_date, 
-             start_price, end_price, slope, trend_type)
-            VALUES %s
-            ON CONFLICT (symbol, timeframe_days, trendline_number) 
-            DO UPDATE SET 
-                start_date = EXCLUDED.start_date,
-                end_date = EXCLUDED.end_date,
-                start_price = EXCLUDED.start_price,
-                end_price = EXCLUDED.end_price,
-                slope = EXCLUDED.slope,
-                trend_type = EXCLUDED.trend_type
-            """,
-            values
-        )
+        values = [row for _, _, rows in results for row in rows]
+        if values:
+            create_staging_table(cursor, "trendlines_staging", "trendlines", TRENDLINE_COLUMNS)
+            copy_rows(cursor, "trendlines_staging", TRENDLINE_COLUMNS, values)
+            merge_from_staging(cursor, "trendlines_staging", "trendlines", TRENDLINE_COLUMNS,
+                               ['symbol', 'timeframe_days', 'trendline_number'])
         
         conn.commit()
-        logger.info(f"Successfully stored {len(values)} trendlines in database")
-    except Exception as e:
+        pipeline_metrics.count(rows_written=len(values))
+        logger.info(f"Stored {len(values)} trendlines for {len({symbol for symbol, _, _ in results})} symbols")
+    except Exception:
         conn.rollback()
-        logger.error(f"Error storing trendlines: {e}")
         raise
     finally:
         cursor.close()
 
-def analyze_trendlines(df, days, title_suffix, symbol):
+def find_pivots(df, days):
+    """
+    Local minima of low and maxima of high over the last days of a
+    date-sorted frame, as positions in df
+    """
+    start = df.index.searchsorted(df.index.max() - timedelta(days=days), side='left')
+    return {
+        'min': start + argrelextrema(df['low'].values[start:], np.less, order=PIVOT_ORDER)[0],
+        'max': start + argrelextrema(df['high'].values[start:], np.greater, order=PIVOT_ORDER)[0],
+    }
+
+def timeframe_pivots(values, pivots, start, comparator, order=PIVOT_ORDER):
+    """
+    Pivots of values[start:], as positions relative to start, from the
+    pivots of a longer window ending at the same bar. Only the first order
+    bars of the shorter window lose neighbours on their left, so only those
+    are checked again, clipping at the window edge like argrelextrema does.
+    """
+    n = len(values)
+    edge = np.arange(start, min(start + order, n))
+    shifts = np.arange(1, order + 1)[:, None]
+    left = values[np.maximum(edge - shifts, start)]
+    right = values[np.minimum(edge + shifts, n - 1)]
+    edge_pivots = edge[(comparator(values[edge], left) & comparator(values[edge], right)).all(axis=0)]
+    return np.concatenate([edge_pivots, pivots[pivots >= start + order]]) - start
+
+def pivot_pair_slopes(day_numbers, prices, rising):
+    """
+    Slopes (price change per day) of every pair i < j of date-sorted pivots.
+    Returns the i and j positions and slopes of the pairs that rise (or
+    fall, if rising is False) over a positive number of days.
+    """
+    start, end = np.triu_indices(len(prices), k=1)
+    days_diff = day_numbers[end] - day_numbers[start]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = (prices[end] - prices[start]) / days_diff
+    keep = (days_diff > 0) & ((slope > 0) if rising else (slope < 0))
+    return start[keep], end[keep], slope[keep]
+
+def smallest_pairs(primary, secondary, k):
+    """
+    Positions of the k smallest (primary, secondary) pairs in that order,
+    ties kept in position order: np.lexsort((secondary, primary))[:k], but
+    partitioning the keys and sorting only the k survivors
+    """
+    if len(primary) <= k:
+        return np.lexsort((secondary, primary))
+    # Everything before the k-th primary key survives; of the pairs sharing
+    # it, only as many as are left, by secondary key and then position
+    kth = primary[np.argpartition(primary, k - 1)[k - 1]]
+    before = np.flatnonzero(primary < kth)
+    tied = np.flatnonzero(primary == kth)
+    left = k - len(before)
+    if len(tied) > left:
+        tied_secondary = secondary[tied]
+        kth_secondary = tied_secondary[np.argpartition(tied_secondary, left - 1)[left - 1]]
+        below = tied[tied_secondary < kth_secondary]
+        tied = np.concatenate([below, tied[tied_secondary == kth_secondary][:left - len(below)]])
+    keep = np.sort(np.concatenate([before, tied]))
+    return keep[np.lexsort((secondary[keep], primary[keep]))]
+
+def analyze_trendlines(df, days, title_suffix, symbol, pivots=None):
     """
-    Analyze trendlines for a specific timeframe
+    Analyze trendlines for a specific timeframe of a date-sorted frame and
+    return them, or None if there isn't enough data. Errors are logged and
+    raised.
+    pivots: find_pivots result for this or a longer timeframe, to share the
+    pivot search between timeframes
     """
     try:
         # Filter data for specified timeframe
         start_date = df.index.max() - timedelta(days=days)
-        timeframe_df = df[df.index >= start_date].copy()
+        start = df.index.searchsorted(start_date, side='left')
+        timeframe_df = df.iloc[start:]
         
         logger.info(f"Analyzing {len(timeframe_df)} data points for {title_suffix}")
         
@@ -108,88 +182,44 @@ def analyze_trendlines(df, days, title_suffix, symbol):
             return None
         
         # Find local minima and maxima
-        min_idx = argrelextrema(timeframe_df['low'].values, np.less, order=5)[0]
-        max_idx = argrelextrema(timeframe_df['high'].values, np.greater, order=5)[0]
+        if pivots is None:
+            pivots = find_pivots(df, days)
+        min_idx = timeframe_pivots(df['low'].values, pivots['min'], start, np.less)
+        max_idx = timeframe_pivots(df['high'].values, pivots['max'], start, np.greater)
         
         logger.info(f"Found {len(min_idx)} minima and {len(max_idx)} maxima points")
         
-        # Create points for trendline analysis
-        points = []
+        # Pivot dates as day numbers and prices as arrays
+        day_numbers = timeframe_df.index.values.astype('datetime64[D]').astype(np.int64)
+        low = timeframe_df['low'].values
+        high = timeframe_df['high'].values
         
-        # Add minima points
-        for idx in min_idx:
-            points.append({
-                'date': timeframe_df.index[idx],
-                'price': timeframe_df['low'].iloc[idx],
-                'type': 'min'
-            })
+        # Rising pairs of minima are uptrends, falling pairs of maxima downtrends
+        up_start, up_end, up_slope = pivot_pair_slopes(day_numbers[min_idx], low[min_idx], rising=True)
+        down_start, down_end, down_slope = pivot_pair_slopes(day_numbers[max_idx], high[max_idx], rising=False)
+        start_idx = np.concatenate([min_idx[up_start], max_idx[down_start]])
+        end_idx = np.concatenate([min_idx[up_end], max_idx[down_end]])
+        start_price = np.concatenate([low[min_idx[up_start]], high[max_idx[down_start]]])
+        end_price = np.concatenate([low[min_idx[up_end]], high[max_idx[down_end]]])
+        slope = np.concatenate([up_slope, down_slope])
+        is_uptrend = np.arange(len(slope)) < len(up_slope)
         
-        # Add maxima points
-        for idx in max_idx:
-            points.append({
-                'date': timeframe_df.index[idx],
-                'price': timeframe_df['high'].iloc[idx],
-                'type': 'max'
-            })
-        
-        # Sort points by date
-        points.sort(key=lambda x: x['date'])
-        
-        # Find trendlines
-        trendlines = []
-        
-        # Analyze uptrends
-        for i in range(len(points)):
-            if points[i]['type'] == 'min':
-                for j in range(i + 1, len(points)):
-                    if points[j]['type'] == 'min':
-                        # Calculate slope
-                        days_diff = (points[j]['date'] - points[i]['date']).days
-                        if days_diff > 0:
-                            slope = (points[j]['price'] - points[i]['price']) / days_diff
-                            if slope > 0:  # Uptrend
-                                trendlines.append({
-                                    'start_date': points[i]['date'],
-                                    'end_date': points[j]['date'],
-                                    'start_price': points[i]['price'],
-                                    'end_price': points[j]['price'],
-                                    'slope': slope,
-                                    'trend_type': 'uptrend'
-                                })
-        
-        # Analyze downtrends
-        for i in range(len(points)):
-            if points[i]['type'] == 'max':
-                for j in range(i + 1, len(points)):
-                    if points[j]['type'] == 'max':
-                        # Calculate slope
-                        days_diff = (points[j]['date'] - points[i]['date']).days
-                        if days_diff > 0:
-                            slope = (points[j]['price'] - points[i]['price']) / days_diff
-                            if slope < 0:  # Downtrend
-                                trendlines.append({
-                                    'start_date': points[i]['date'],
-                                    'end_date': points[j]['date'],
-                                    'start_price': points[i]['price'],
-                                    'end_price': points[j]['price'],
-                                    'slope': slope,
-                                    'trend_type': 'downtrend'
-                                })
+        # Keep only the trendlines ending latest (steepest first on the same
+        # end date) instead of every rising min-min and falling max-max pair
+        keep = smallest_pairs(-day_numbers[end_idx], -np.abs(slope), MAX_TRENDLINES_PER_TIMEFRAME)
+        trendlines = [{
+            'start_date': timeframe_df.index[start_idx[k]],
+            'end_date': timeframe_df.index[end_idx[k]],
+            'start_price': start_price[k],
+            'end_price': end_price[k],
+            'slope': slope[k],
+            'trend_type': 'uptrend' if is_uptrend[k] else 'downtrend'
+        } for k in keep]
         
         # Sort trendlines by slope magnitude
         trendlines.sort(key=lambda x: abs(x['slope']), reverse=True)
         
-        logger.info(f"Found {len(trendlines)} trendlines")
-        
-        # Store trendlines in database
-        conn = get_db_connection()
-        try:
-            store_trendlines(conn, trendlines, symbol, days)
-            logger.info(f"Stored {len(trendlines)} trendlines in database")
-        except Exception as e:
-            logger.error(f"Error storing trendlines in database: {e}")
-        finally:
-            conn.close()
+        logger.info(f"Kept {len(trendlines)} trendlines")
         
         # Print trendlines
         print(f"\nTrendlines ({title_suffix}):")
@@ -200,28 +230,32 @@ def analyze_trendlines(df, days, title_suffix, symbol):
             print(f"  End: {trendline['end_date']} at {trendline['end_price']:.2f}")
             print(f"  Slope: {trendline['slope']:.4f}")
         
-        return True
+        return trendlines
     except Exception as e:
         logger.error(f"Error in analyze_trendlines: {e}")
-        return None
+        raise
+
+def process_symbol_task(symbol, panel_ref, conn):
+    """Worker entry point: generate one symbol's trendlines from the shared panel"""
+    print(f"\nProcessing {symbol}...")
+    return process_symbol(symbol_frame(panel_ref).reset_index(), symbol)
 
-def process_file(file_path):
-    """Process a single daily data file"""
+def process_symbol(df, symbol):
+    """
+    Generate trendlines for every timeframe of a single symbol's daily data.
+    Returns a list of (symbol, timeframe_days, rows) for store_trendlines,
+    one per timeframe that could be analyzed. Errors are logged and raised,
+    so run_sharded reports them and a partial result is never stored or
+    checkpointed.
+    """
+    results = []
     try:
-        # Extract symbol from filename
-        filename = os.path.basename(file_path)
-        symbol = filename.split('_')[0]
-        
-        print(f"\nProcessing {symbol}...")
-        
-        # Load and process the data
-        df = pd.read_csv(file_path)
-        df['date'] = pd.to_datetime(df['date'])
-        df.set_index('date', inplace=True)
+        df = df.set_index('date')
         
         # Sort index properly to ensure chronological order
         df = df.sort_index()
         logger.info(f"Loaded {len(df)} data points for {symbol}")
+        pipeline_metrics.count(rows_read=len(df))
         
         # Define timeframes
         timeframes = [
@@ -231,17 +265,38 @@ def process_file(file_path):
             (730, "2 Years")
         ]
         
+        # Find pivots once over the longest timeframe; the shorter ones
+        # narrow them down instead of searching again
+        pivots = find_pivots(df, max(days for days, _ in timeframes))
+        
         # Generate trendlines for each timeframe
         for days, title in timeframes:
             print(f"\nAnalyzing {title} timeframe...")
-            result = analyze_trendlines(df, days, title, symbol)
-            if result:
+            trendlines = analyze_trendlines(df, days, title, symbol, pivots)
+            if trendlines is not None:
                 print(f"Successfully analyzed trendlines for {title}")
+                results.append((symbol, days, trendline_rows(trendlines, symbol, days)))
             else:
                 print(f"Failed to analyze trendlines for {title}")
+        pipeline_metrics.count(symbols_processed=1)
                 
     except Exception as e:
-        logger.error(f"Error processing file {file_path}: {e}")
+        logger.error(f"Error processing symbol {symbol}: {e}")
+        raise
+    return results
+
+def flush_trendline_batch(conn, batch, checkpoint):
+    """Store a batch of (symbol, process_symbol result) pairs and checkpoint its symbols"""
+    results = [result for _, symbol_results in batch for result in symbol_results]
+    try:
+        if results:
+            store_trendlines(conn, results)
+    except Exception as e:
+        # Left out of the checkpoint, so --resume analyzes them again
+        logger.error(f"Error storing trendlines in database: {e}")
+        return
+    for symbol, _ in batch:
+        checkpoint.mark_done(symbol)
 
 def cleanup_trendlines(conn):
     """Clean up trendlines table"""
@@ -256,32 +311,59 @@ def cleanup_trendlines(conn):
     finally:
         cursor.close()
 
-def main():
-    # Get the absolute path to the backend directory
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    all_data_dir = os.path.join(base_dir, "all-data")
-    
-    # Get all CSV files in the all-data directory
-    csv_files = glob.glob(os.path.join(all_data_dir, "*_daily_data_*.csv"))
-    
-    if not csv_files:
-        print("No daily data files found in the all-data directory")
-        return
+def main(conn=None, daily_df=None, workers=1, resume=False):
+    if daily_df is None:
+        # Load every stored symbol in one columnar read
+        daily_df = ohlcv_store.read_ohlcv()
+        
+        if daily_df.empty:
+            print("No symbols found in the daily data store")
+            return
     
-    print(f"Found {len(csv_files)} daily data files to process")
+    symbols = sorted(daily_df['symbol'].unique())
+    print(f"Found {len(symbols)} symbols to process")
     
     # Get database connection and clean up existing data
-    conn = get_db_connection()
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    checkpoint = SymbolCheckpoint('trendlines', resume)
     try:
-        cleanup_trendlines(conn)
+        if not resume:
+            cleanup_trendlines(conn)
+        
+        if resume:
+            # Keep the trendlines of symbols the interrupted run already finished
+            symbols = checkpoint.remaining(symbols)
+            print(f"{len(symbols)} symbols left to process")
         
-        # Process each file
-        for file_path in csv_files:
-            process_file(file_path)
+        # Pack the bars into shared memory once; each task only carries a
+        # reference to its symbol's rows, which the worker reads in place.
+        # Workers only compute trendlines: this process buffers them and
+        # writes each batch of symbols in one bulk transaction.
+        with OHLCVPanel.build(daily_df) as panel:
+            tasks = [(symbol, panel.ref(symbol)) for symbol in symbols]
+            
+            batch = []
+            for symbol, result, error in run_sharded(tasks, process_symbol_task, workers):
+                if error:
+                    logger.error(f"Trendline analysis failed for {symbol}: {error}")
+                    continue
+                batch.append((symbol, result))
+                if len(batch) >= TRENDLINE_BATCH_SYMBOLS:
+                    flush_trendline_batch(conn, batch, checkpoint)
+                    batch = []
+            flush_trendline_batch(conn, batch, checkpoint)
         
         print("\nAnalysis complete! Check the database for stored trendlines.")
     finally:
-        conn.close()
+        checkpoint.close()
+        if own_conn:
+            conn.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate trendlines for every symbol")
+    add_workers_argument(parser)
+    add_resume_argument(parser)
+    args = parser.parse_args()
+    main(workers=args.workers, resume=args.resume)
\ No newline at end of file
@@ -6,7 +6,15 @@ import psycopg2
 from psycopg2.extras import execute_values
 import logging
 import os
+import argparse
 from dotenv import load_dotenv
+import pipeline_metrics
+import ohlcv_store
+from ohlcv_store import load_daily_csv
+from ohlcv_panel import OHLCVPanel, symbol_frame
+from symbol_pool import add_workers_argument, run_sharded
+from checkpoints import SymbolCheckpoint, add_resume_argument
+from channel_search import ChannelScorer, find_best_channel
 
 # Load environment variables
 load_dotenv()
@@ -15,6 +23,27 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Trend channel timeframes: days of history searched, the fewest bars worth
+# searching, whether to fall back to create_simple_channel when no channel
+# is found, and whether to extend the channel's lines to the latest bar
+CHANNEL_TIMEFRAMES = [
+    {'days': 90, 'label': '3M', 'title': '3-Month Short-term', 'min_bars': 20,
+     'simple_fallback': True, 'extend_to_latest': False},
+    {'days': 180, 'label': '6M', 'title': '6-Month Medium-term', 'min_bars': 30,
+     'simple_fallback': False, 'extend_to_latest': False},
+    {'days': 540, 'label': '18M', 'title': '1.5-Year Long-term', 'min_bars': 60,
+     'simple_fallback': False, 'extend_to_latest': False},
+    {'days': 1095, 'label': '3Y', 'title': '3-Year Mega', 'min_bars': 150,
+     'simple_fallback': True, 'extend_to_latest': True},
+]
+
+# Symbols with fewer bars than this are skipped
+MIN_SYMBOL_BARS = 100
+
+# Symbols whose channels are written per transaction; the default covers
+# the whole universe in one
+CHANNEL_BATCH_SYMBOLS = int(os.getenv('CHANNEL_BATCH_SYMBOLS', '1000'))
+
 def get_db_connection():
     """Create a database connection"""
     try:
@@ -32,7 +61,7 @@ def get_db_connection():
         raise
 
 def find_trend_channel(df, timeframe_days):
-    """Find a trend channel with upper and lower parallel lines"""
+    """Find a trend channel with upper and lower parallel lines in a date-sorted frame"""
     if len(df) < 20:
         return None
     
@@ -43,75 +72,28 @@ def find_trend_channel(df, timeframe_days):
     if len(pivot_highs) < 2 or len(pivot_lows) < 2:
         return None
     
-    # Get pivot data
-    high_prices = df.iloc[pivot_highs]['high'].values
-    high_dates = df.iloc[pivot_highs].index
-    low_prices = df.iloc[pivot_lows]['low'].values
-    low_dates = df.iloc[pivot_lows].index
-    
-    # Find the best channel by trying different combinations
-    best_channel = None
-    best_r_squared = 0
-    
-    # Try combinations of high points for upper line
-    for i in range(len(high_prices)):
-        for j in range(i + 1, len(high_prices)):
-            # Calculate upper line
-            days_diff_upper = (high_dates[j] - high_dates[i]).days
-            if days_diff_upper < 15:
-                continue
-            
-            price_diff_upper = high_prices[j] - high_prices[i]
-            slope_upper = price_diff_upper / days_diff_upper
-            
-            # Try combinations of low points for lower line
-            for k in range(len(low_prices)):
-                for l in range(k + 1, len(low_prices)):
-                    # Calculate lower line
-                    days_diff_lower = (low_dates[l] - low_dates[k]).days
-                    if days_diff_lower < 15:
-                        continue
-                    
-                    price_diff_lower = low_prices[l] - low_prices[k]
-                    slope_lower = price_diff_lower / days_diff_lower
-                    
-                    # Check if slopes are similar (parallel lines)
-                    slope_diff = abs(slope_upper - slope_lower)
-                    if slope_diff > 0.1:  # Slopes should be similar for parallel lines
-                        continue
-                    
-                    # Calculate channel width
-                    avg_slope = (slope_upper + slope_lower) / 2
-                    channel_width = calculate_channel_width(df, high_dates[i], high_dates[j], 
-                                                          low_dates[k], low_dates[l], 
-                                                          high_prices[i], high_prices[j],
-                                                          low_prices[k], low_prices[l], avg_slope)
-                    
-                    # Calculate R-squared for the channel
-                    r_squared = calculate_channel_r_squared(df, high_dates[i], high_dates[j], 
-                                                          low_dates[k], low_dates[l], 
-                                                          high_prices[i], high_prices[j],
-                                                          low_prices[k], low_prices[l], avg_slope)
-                    
-                    # Check if this is a better channel
-                    if r_squared > best_r_squared and r_squared > 0.2 and channel_width > 0:
-                        best_r_squared = r_squared
-                        best_channel = {
-                            'upper_start_date': high_dates[i],
-                            'upper_end_date': high_dates[j],
-                            'upper_start_price': high_prices[i],
-                            'upper_end_price': high_prices[j],
-                            'lower_start_date': low_dates[k],
-                            'lower_end_date': low_dates[l],
-                            'lower_start_price': low_prices[k],
-                            'lower_end_price': low_prices[l],
-                            'slope': avg_slope,
-                            'channel_width': channel_width,
-                            'r_squared': r_squared,
-                            'timeframe_days': timeframe_days
-                        }
-    
-    return best_channel
+    # Search every pair of pivot highs (upper line) against every pair of
+    # pivot lows (lower line) with similar slope for the best channel
+    day_numbers = df.index.values.astype('datetime64[D]').astype(np.int64)
+    best = find_best_channel(day_numbers, df['high'].values, df['low'].values, df['close'].values,
+                             pivot_highs, pivot_lows)
+    if best is None:
+        return None
+    
+    return {
+        'upper_start_date': df.index[best['upper_start']],
+        'upper_end_date': df.index[best['upper_end']],
+        'upper_start_price': df['high'].values[best['upper_start']],
+        'upper_end_price': df['high'].values[best['upper_end']],
+        'lower_start_date': df.index[best['lower_start']],
+        'lower_end_date': df.index[best['lower_end']],
+        'lower_start_price': df['low'].values[best['lower_start']],
+        'lower_end_price': df['low'].values[best['lower_end']],
+        'slope': best['slope'],
+        'channel_width': best['channel_width'],
+        'r_squared': best['r_squared'],
+        'timeframe_days': timeframe_days
+    }
 
 def calculate_channel_width(df, upper_start, upper_end, lower_start, lower_end, 
                            upper_start_price, upper_end_price, lower_start_price, lower_end_price, slope):
@@ -142,9 +124,18 @@ def calculate_channel_width(df, upper_start, upper_end, lower_start, lower_end,
     
     return (width_start + width_end) / 2
 
+def channel_scorer(df):
+    """ChannelScorer over a date-sorted frame's close prices"""
+    day_numbers = df.index.values.astype('datetime64[D]').astype(np.int64)
+    return ChannelScorer(day_numbers, df['close'].values)
+
 def calculate_channel_r_squared(df, upper_start, upper_end, lower_start, lower_end, 
-                               upper_start_price, upper_end_price, lower_start_price, lower_end_price, slope):
-    """Calculate R-squared value for the trend channel"""
+                               upper_start_price, upper_end_price, lower_start_price, lower_end_price, slope,
+                               scorer=None):
+    """
+    Calculate R-squared value for the trend channel in a date-sorted frame.
+    Pass a channel_scorer(df) to score many channels of the same frame.
+    """
     # Get the period where both lines exist
     start_date = max(upper_start, lower_start)
     end_date = min(upper_end, lower_end)
@@ -152,52 +143,21 @@ def calculate_channel_r_squared(df, upper_start, upper_end, lower_start, lower_e
     if start_date >= end_date:
         return 0
     
-    # Get data points within the channel period
-    mask = (df.index >= start_date) & (df.index <= end_date)
-    period_data = df[mask]
-    
-    if len(period_data) < 5:
+    if scorer is None:
+        scorer = channel_scorer(df)
+    start = df.index.searchsorted(start_date, side='left')
+    end = df.index.searchsorted(end_date, side='right') - 1
+    if end - start + 1 < 5:
         return 0
     
-    # Calculate expected prices along both lines
-    expected_upper_prices = []
-    expected_lower_prices = []
-    actual_prices = []
-    
-    for date in period_data.index:
-        days_from_upper_start = (date - upper_start).days
-        days_from_lower_start = (date - lower_start).days
-        
-        expected_upper = upper_start_price + (slope * days_from_upper_start)
-        expected_lower = lower_start_price + (slope * days_from_lower_start)
-        
-        expected_upper_prices.append(expected_upper)
-        expected_lower_prices.append(expected_lower)
-        actual_prices.append(period_data.loc[date, 'close'])
-    
-    # Calculate how well the price stays within the channel
-    total_deviation = 0
-    total_variance = 0
-    mean_price = np.mean(actual_prices)
-    
-    for i, actual in enumerate(actual_prices):
-        upper = expected_upper_prices[i]
-        lower = expected_lower_prices[i]
-        
-        # Calculate deviation from channel center
-        channel_center = (upper + lower) / 2
-        deviation = abs(actual - channel_center)
-        total_deviation += deviation
-        
-        # Calculate variance for R-squared
-        total_variance += (actual - mean_price) ** 2
+    def day_number(date):
+        return np.datetime64(date, 'D').astype(np.int64)
     
-    if total_variance == 0:
-        return 0
-    
-    # R-squared based on how well prices follow the channel
-    r_squared = 1 - (total_deviation / total_variance)
-    return max(0, r_squared)
+    intercept = scorer.intercept(day_number(upper_start), upper_start_price,
+                                 day_number(lower_start), lower_start_price, slope)
+    r_squared = scorer.r_squared(np.array([start]), np.array([end]), np.array([slope], dtype=np.float64),
+                                 np.array([intercept], dtype=np.float64))
+    return float(r_squared[0])
 
 def create_simple_channel(df, timeframe_days):
     """Create a simple trend channel based on recent price action"""
@@ -290,63 +250,140 @@ def create_simple_trendline(df, timeframe_days):
         'timeframe_days': timeframe_days
     }
 
-def store_simplified_trendlines(conn, trendlines, symbol):
-    """Store simplified trendlines in the database"""
+def channel_rows(channels, symbol, timeframes=None):
+    """
+    Convert a symbol's channels (one or None per timeframe in timeframes)
+    to rows of the trend_channels table. Numbers follow the timeframe's fixed
+    place in CHANNEL_TIMEFRAMES, whichever timeframes were analyzed: the
+    n-th timeframe's upper line is trendline 2n - 1 and its lower line 2n.
+    """
+    values = []
+    for timeframe, channel in zip(timeframes or CHANNEL_TIMEFRAMES, channels):
+        if channel is None:
+            continue
+        i = CHANNEL_TIMEFRAMES.index(timeframe) + 1
+        for number, line in ((i * 2 - 1, 'upper'), (i * 2, 'lower')):
+            values.append((
+                symbol,
+                timeframe['days'],
+                number,
+                channel[f'{line}_start_date'].date(),
+                channel[f'{line}_end_date'].date(),
+                float(channel[f'{line}_start_price']),
+                float(channel[f'{line}_end_price']),
+                float(channel['slope']),
+                line
+            ))
+    return values
+
+def store_simplified_trendlines(conn, results, timeframes=None):
+    """
+    Replace the channels of a batch of symbols and the analyzed timeframes
+    in one transaction: one delete for all the (symbol, timeframe) pairs,
+    then one multi-row insert. Other timeframes' rows are left alone.
+    Channels go to trend_channels, not trendlines: their 90 and 180-day
+    rows would replace generate_trendline.py's, which signal generation
+    reads.
+    results: list of (symbol, channels), one channel or None per timeframe
+    in timeframes (default: CHANNEL_TIMEFRAMES)
+    """
+    timeframes = timeframes or CHANNEL_TIMEFRAMES
     cursor = conn.cursor()
-    
-    # Clear existing trendlines for NEPSE
-    cursor.execute("DELETE FROM trendlines WHERE symbol = %s", (symbol,))
-    
-    if not trendlines:
-        logger.info("No trendlines to store")
+    try:
+        symbols = [symbol for symbol, _ in results]
+        pairs = [(symbol, timeframe['days']) for symbol in symbols for timeframe in timeframes]
+        cursor.execute("""
+            DELETE FROM trend_channels
+            WHERE (symbol, timeframe_days) IN (
+                SELECT * FROM unnest(%s::varchar[], %s::integer[])
+            )
+        """, ([symbol for symbol, _ in pairs], [days for _, days in pairs]))
+        
+        values = [row for symbol, channels in results
+                  for row in channel_rows(channels, symbol, timeframes)]
+        if values:
+            execute_values(cursor, """
+                INSERT INTO trend_channels 
+                (symbol, timeframe_days, trendline_number, start_date, end_date, 
+                 start_price, end_price, slope, trend_type)
+                VALUES %s
+            """, values, page_size=1000)
+        
         conn.commit()
+        pipeline_metrics.count(rows_written=len(values))
+        logger.info(f"Stored {len(values)} trendlines (channels) for {len(symbols)} symbols")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
         cursor.close()
-        return
-    
-    # Store trend channels
-    for i, channel in enumerate(trendlines, 1):
+
+def flush_channel_batch(conn, batch, checkpoint, timeframes=None):
+    """Store a batch of (symbol, channels) pairs and checkpoint its symbols"""
+    if not batch:
+        return 0
+    try:
+        store_simplified_trendlines(conn, batch, timeframes)
+    except Exception as e:
+        # Left out of the checkpoint, so --resume analyzes them again
+        logger.error(f"Error storing trend channels in database: {e}")
+        return 0
+    for symbol, _ in batch:
+        checkpoint.mark_done(symbol)
+    return sum(channel is not None for _, channels in batch for channel in channels)
+
+def last_days(df, days):
+    """The bars of a date-sorted frame less than `days` days before its last bar, like df.last(f'{days}D')"""
+    start = df.index.searchsorted(df.index[-1] - pd.Timedelta(days=days), side='right')
+    return df.iloc[start:]
+
+def extend_channel(channel, latest_date):
+    """Extend both lines of a channel to the latest bar"""
+    for line in ('upper', 'lower'):
+        channel[f'{line}_end_date'] = latest_date
+        channel[f'{line}_end_price'] = channel[f'{line}_start_price'] + (channel['slope'] * (latest_date - channel[f'{line}_start_date']).days)
+    return channel
+
+def describe_channel(channel, r_squared=True):
+    """One-line summary of a channel's lines for the log"""
+    description = (f"Upper {channel['upper_start_price']:.2f} → {channel['upper_end_price']:.2f}, "
+                   f"Lower {channel['lower_start_price']:.2f} → {channel['lower_end_price']:.2f} "
+                   f"(Slope: {channel['slope']:.4f}, Width: {channel['channel_width']:.2f}")
+    if r_squared:
+        description += f", R²: {channel['r_squared']:.3f}"
+    return description + ")"
+
+def analyze_channels(df, symbol, timeframes=None):
+    """
+    Find a trend channel for every timeframe of a symbol's date-sorted bars.
+    Returns one channel (or None) per timeframe, in timeframe order.
+    """
+    channels = []
+    for timeframe in timeframes or CHANNEL_TIMEFRAMES:
+        label = timeframe['label']
+        logger.info(f"\n=== {symbol} {timeframe['title']} Trend Channel ===")
+        window = last_days(df, timeframe['days'])
+        if len(window) < timeframe['min_bars']:
+            logger.warning(f"Insufficient data for {label} analysis")
+            channels.append(None)
+            continue
+        
+        channel = find_trend_channel(window, timeframe['days'])
+        simple = channel is None and timeframe['simple_fallback']
+        if simple:
+            # Create a simple channel based on recent price action
+            channel = create_simple_channel(window, timeframe['days'])
         if channel is None:
+            logger.info(f"No significant {label} channel found")
+            channels.append(None)
             continue
-            
-        # Store upper line of the channel
-        cursor.execute("""
-            INSERT INTO trendlines 
-            (symbol, timeframe_days, trendline_number, start_date, end_date, 
-             start_price, end_price, slope, trend_type)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (
-            symbol,
-            channel.get('timeframe_days', 180),  # Default to 6 months
-            i * 2 - 1,  # Odd numbers for upper lines
-            channel['upper_start_date'],
-            channel['upper_end_date'],
-            float(channel['upper_start_price']),
-            float(channel['upper_end_price']),
-            float(channel['slope']),
-            'upper'
-        ))
         
-        # Store lower line of the channel
-        cursor.execute("""
-            INSERT INTO trendlines 
-            (symbol, timeframe_days, trendline_number, start_date, end_date, 
-             start_price, end_price, slope, trend_type)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (
-            symbol,
-            channel.get('timeframe_days', 180),  # Default to 6 months
-            i * 2,  # Even numbers for lower lines
-            channel['lower_start_date'],
-            channel['lower_end_date'],
-            float(channel['lower_start_price']),
-            float(channel['lower_end_price']),
-            float(channel['slope']),
-            'lower'
-        ))
-    
-    conn.commit()
-    cursor.close()
-    logger.info(f"Stored {len([t for t in trendlines if t is not None]) * 2} trendlines (channels) for {symbol}")
+        if timeframe['extend_to_latest']:
+            extend_channel(channel, df.index[-1])
+        channels.append(channel)
+        logger.info(f"{label} {'Simple Channel' if simple else 'Channel'}: "
+                    f"{describe_channel(channel, r_squared=not simple)}")
+    return channels
 
 def analyze_nepse_simplified_trendlines():
     """Analyze NEPSE with simplified trendline strategy"""
@@ -357,296 +394,130 @@ def analyze_nepse_simplified_trendlines():
         base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         data_file = os.path.join(base_dir, "data", "daily_data_202507172305.csv")
         
-        df = pd.read_csv(data_file)
-        df['date'] = pd.to_datetime(df['date'])
+        df = load_daily_csv(data_file)
         
         # Filter NEPSE data
         nepse_df = df[df['symbol'] == 'NEPSE'].copy()
         nepse_df.set_index('date', inplace=True)
         nepse_df = nepse_df.sort_index()
         
-        if len(nepse_df) < 100:
+        if len(nepse_df) < MIN_SYMBOL_BARS:
             logger.error("Insufficient NEPSE data")
             return
         
         logger.info(f"Analyzing NEPSE with {len(nepse_df)} data points")
         logger.info(f"Date range: {nepse_df.index.min()} to {nepse_df.index.max()}")
         
-        trendlines = []
-        
-        # 1. 3-Month Short-term Trend Channel
-        logger.info("\n=== 3-Month Short-term Trend Channel ===")
-        three_month_df = nepse_df.last('90D')  # 3 months
-        
-        if len(three_month_df) >= 20:
-            channel_3m = find_trend_channel(three_month_df, 90)
-            if channel_3m:
-                trendlines.append(channel_3m)
-                logger.info(f"3M Channel: Upper {channel_3m['upper_start_price']:.2f} → {channel_3m['upper_end_price']:.2f}, Lower {channel_3m['lower_start_price']:.2f} → {channel_3m['lower_end_price']:.2f} (Slope: {channel_3m['slope']:.4f}, Width: {channel_3m['channel_width']:.2f}, R²: {channel_3m['r_squared']:.3f})")
-            else:
-                # Create a simple channel based on recent price action
-                simple_channel_3m = create_simple_channel(three_month_df, 90)
-                if simple_channel_3m:
-                    trendlines.append(simple_channel_3m)
-                    logger.info(f"3M Simple Channel: Upper {simple_channel_3m['upper_start_price']:.2f} → {simple_channel_3m['upper_end_price']:.2f}, Lower {simple_channel_3m['lower_start_price']:.2f} → {simple_channel_3m['lower_end_price']:.2f} (Slope: {simple_channel_3m['slope']:.4f}, Width: {simple_channel_3m['channel_width']:.2f})")
-                else:
-                    logger.info("No significant 3M channel found")
-                    trendlines.append(None)
-        else:
-            logger.warning("Insufficient data for 3-month analysis")
-            trendlines.append(None)
-        
-        # 2. 6-Month Medium-term Trend Channel
-        logger.info("\n=== 6-Month Medium-term Trend Channel ===")
-        six_month_df = nepse_df.last('180D')  # 6 months
-        
-        if len(six_month_df) >= 30:
-            channel_6m = find_trend_channel(six_month_df, 180)
-            if channel_6m:
-                trendlines.append(channel_6m)
-                logger.info(f"6M Channel: Upper {channel_6m['upper_start_price']:.2f} → {channel_6m['upper_end_price']:.2f}, Lower {channel_6m['lower_start_price']:.2f} → {channel_6m['lower_end_price']:.2f} (Slope: {channel_6m['slope']:.4f}, Width: {channel_6m['channel_width']:.2f}, R²: {channel_6m['r_squared']:.3f})")
-            else:
-                logger.info("No significant 6M channel found")
-                trendlines.append(None)
-        else:
-            logger.warning("Insufficient data for 6-month analysis")
-            trendlines.append(None)
-        
-        # 3. 1.5-Year Long-term Trend Channel
-        logger.info("\n=== 1.5-Year Long-term Trend Channel ===")
-        eighteen_month_df = nepse_df.last('540D')  # 1.5 years (18 months)
-        
-        if len(eighteen_month_df) >= 60:
-            channel_18m = find_trend_channel(eighteen_month_df, 540)
-            if channel_18m:
-                trendlines.append(channel_18m)
-                logger.info(f"18M Channel: Upper {channel_18m['upper_start_price']:.2f} → {channel_18m['upper_end_price']:.2f}, Lower {channel_18m['lower_start_price']:.2f} → {channel_18m['lower_end_price']:.2f} (Slope: {channel_18m['slope']:.4f}, Width: {channel_18m['channel_width']:.2f}, R²: {channel_18m['r_squared']:.3f})")
-            else:
-                logger.info("No significant 18M channel found")
-                trendlines.append(None)
-        else:
-            logger.warning("Insufficient data for 18-month analysis")
-            trendlines.append(None)
-        
-        # 4. 3-Year Mega Trend Channel
-        logger.info("\n=== 3-Year Mega Trend Channel ===")
-        three_year_df = nepse_df.last('1095D')  # 3 years (1095 days)
-        
-        if len(three_year_df) >= 150:
-            channel_3y = find_trend_channel(three_year_df, 1095)
-            if channel_3y:
-                # Extend the channel to cover the latest candle
-                latest_date = nepse_df.index[-1]
-                days_extension = (latest_date - channel_3y['upper_end_date']).days
-                
-                # Extend upper line
-                channel_3y['upper_end_date'] = latest_date
-                channel_3y['upper_end_price'] = channel_3y['upper_start_price'] + (channel_3y['slope'] * (channel_3y['upper_end_date'] - channel_3y['upper_start_date']).days)
-                
-                # Extend lower line
-                channel_3y['lower_end_date'] = latest_date
-                channel_3y['lower_end_price'] = channel_3y['lower_start_price'] + (channel_3y['slope'] * (channel_3y['lower_end_date'] - channel_3y['lower_start_date']).days)
-                
-                trendlines.append(channel_3y)
-                logger.info(f"3Y Channel: Upper {channel_3y['upper_start_price']:.2f} → {channel_3y['upper_end_price']:.2f}, Lower {channel_3y['lower_start_price']:.2f} → {channel_3y['lower_end_price']:.2f} (Slope: {channel_3y['slope']:.4f}, Width: {channel_3y['channel_width']:.2f}, R²: {channel_3y['r_squared']:.3f})")
-            else:
-                # Create a simple channel based on 3-year data
-                simple_channel_3y = create_simple_channel(three_year_df, 1095)
-                if simple_channel_3y:
-                    # Extend the simple channel to cover the latest candle
-                    latest_date = nepse_df.index[-1]
-                    
-                    # Extend upper line
-                    simple_channel_3y['upper_end_date'] = latest_date
-                    simple_channel_3y['upper_end_price'] = simple_channel_3y['upper_start_price'] + (simple_channel_3y['slope'] * (simple_channel_3y['upper_end_date'] - simple_channel_3y['upper_start_date']).days)
-                    
-                    # Extend lower line
-                    simple_channel_3y['lower_end_date'] = latest_date
-                    simple_channel_3y['lower_end_price'] = simple_channel_3y['lower_start_price'] + (simple_channel_3y['slope'] * (simple_channel_3y['lower_end_date'] - simple_channel_3y['lower_start_date']).days)
-                    
-                    trendlines.append(simple_channel_3y)
-                    logger.info(f"3Y Simple Channel: Upper {simple_channel_3y['upper_start_price']:.2f} → {simple_channel_3y['upper_end_price']:.2f}, Lower {simple_channel_3y['lower_start_price']:.2f} → {simple_channel_3y['lower_end_price']:.2f} (Slope: {simple_channel_3y['slope']:.4f}, Width: {simple_channel_3y['channel_width']:.2f})")
-                else:
-                    logger.info("No significant 3Y channel found")
-                    trendlines.append(None)
-        else:
-            logger.warning("Insufficient data for 3-year analysis")
-            trendlines.append(None)
+        trendlines = analyze_channels(nepse_df, 'NEPSE')
         
         # Store trendlines
-        store_simplified_trendlines(conn, trendlines, 'NEPSE')
+        store_simplified_trendlines(conn, [('NEPSE', trendlines)])
         
         # Summary
+        labels = {timeframe['days']: timeframe['label'] for timeframe in CHANNEL_TIMEFRAMES}
         valid_trendlines = [t for t in trendlines if t is not None]
         logger.info(f"\n=== Summary ===")
         logger.info(f"Generated {len(valid_trendlines)} trend channels for NEPSE:")
         for i, channel in enumerate(valid_trendlines, 1):
-            timeframe = "3M" if channel['timeframe_days'] == 90 else "6M" if channel['timeframe_days'] == 180 else "18M" if channel['timeframe_days'] == 540 else "3Y"
-            logger.info(f"  {i}. {timeframe} Channel: Upper {channel['upper_start_price']:.2f} → {channel['upper_end_price']:.2f}, Lower {channel['lower_start_price']:.2f} → {channel['lower_end_price']:.2f} (Width: {channel['channel_width']:.2f}, R²: {channel['r_squared']:.3f})")
+            logger.info(f"  {i}. {labels[channel['timeframe_days']]} Channel: Upper {channel['upper_start_price']:.2f} → {channel['upper_end_price']:.2f}, Lower {channel['lower_start_price']:.2f} → {channel['lower_end_price']:.2f} (Width: {channel['channel_width']:.2f}, R²: {channel['r_squared']:.3f})")
     
     except Exception as e:
         logger.error(f"Error in simplified trendline analysis: {e}")
     finally:
         conn.close()
 
-def analyze_multiple_stocks_trendlines():
-    """Analyze multiple stocks and generate simplified trend channels"""
-    # List of stocks to analyze
-    stocks = ['ACLBSL', 'ADBL', 'ADBLD83', 'ADLB', 'AHL']
+def process_symbol_task(symbol, payload, conn):
+    """Worker entry point: find one symbol's trend channels from the shared panel"""
+    panel_ref, timeframes = payload
+    return process_symbol(symbol_frame(panel_ref), symbol, timeframes)
+
+def process_symbol(df, symbol, timeframes=None):
+    """
+    Find the trend channels of a single symbol's date-indexed, sorted bars.
+    Returns one channel (or None) per timeframe, or None if the symbol has
+    too few bars to analyze.
+    """
+    pipeline_metrics.count(rows_read=len(df))
+    if len(df) < MIN_SYMBOL_BARS:
+        logger.warning(f"Insufficient data for {symbol} ({len(df)} points), skipping...")
+        return None
     
-    conn = get_db_connection()
+    logger.info(f"Analyzing {symbol} with {len(df)} data points")
+    logger.info(f"Date range: {df.index.min()} to {df.index.max()}")
+    channels = analyze_channels(df, symbol, timeframes)
+    pipeline_metrics.count(symbols_processed=1)
+    return channels
+
+def main(conn=None, daily_df=None, workers=1, resume=False, timeframes=None):
+    """Find and store trend channels for every stored symbol"""
+    timeframes = timeframes or CHANNEL_TIMEFRAMES
+    if daily_df is None:
+        # Load every stored symbol in one columnar read
+        daily_df = ohlcv_store.read_ohlcv()
+        
+        if daily_df.empty:
+            logger.error("No symbols found in the daily data store")
+            return
+    
+    symbols = sorted(daily_df['symbol'].unique())
+    logger.info(f"Found {len(symbols)} symbols to analyze")
     
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    checkpoint = SymbolCheckpoint('simplified_trendlines', resume)
     try:
-        total_channels_generated = 0
+        if resume:
+            # Keep the channels of symbols the interrupted run already stored
+            symbols = checkpoint.remaining(symbols)
+            logger.info(f"{len(symbols)} symbols left to analyze")
         
-        for stock_symbol in stocks:
-            logger.info(f"\n{'='*60}")
-            logger.info(f"ANALYZING STOCK: {stock_symbol}")
-            logger.info(f"{'='*60}")
+        total_channels_generated = 0
+        # Pack the bars into shared memory once; workers only find channels
+        # and this process buffers them and writes each batch of symbols in
+        # one transaction
+        with OHLCVPanel.build(daily_df) as panel:
+            tasks = [(symbol, (panel.ref(symbol), timeframes)) for symbol in symbols]
             
-            try:
-                # Load stock data
-                base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-                data_file = os.path.join(base_dir, "data", "daily_data_202507172305.csv")
-                
-                df = pd.read_csv(data_file)
-                df['date'] = pd.to_datetime(df['date'])
-                
-                # Filter stock data
-                stock_df = df[df['symbol'] == stock_symbol].copy()
-                stock_df.set_index('date', inplace=True)
-                stock_df = stock_df.sort_index()
-                
-                if len(stock_df) < 100:
-                    logger.warning(f"Insufficient data for {stock_symbol} ({len(stock_df)} points), skipping...")
+            batch = []
+            for symbol, channels, error in run_sharded(tasks, process_symbol_task, workers):
+                if error:
+                    logger.error(f"Error analyzing {symbol}: {error}")
                     continue
-                
-                logger.info(f"Analyzing {stock_symbol} with {len(stock_df)} data points")
-                logger.info(f"Date range: {stock_df.index.min()} to {stock_df.index.max()}")
-                
-                trendlines = []
-                
-                # 1. 3-Month Short-term Trend Channel
-                logger.info(f"\n=== {stock_symbol} 3-Month Short-term Trend Channel ===")
-                three_month_df = stock_df.last('90D')  # 3 months
-                
-                if len(three_month_df) >= 20:
-                    channel_3m = find_trend_channel(three_month_df, 90)
-                    if channel_3m:
-                        trendlines.append(channel_3m)
-                        logger.info(f"3M Channel: Upper {channel_3m['upper_start_price']:.2f} → {channel_3m['upper_end_price']:.2f}, Lower {channel_3m['lower_start_price']:.2f} → {channel_3m['lower_end_price']:.2f} (Slope: {channel_3m['slope']:.4f}, Width: {channel_3m['channel_width']:.2f}, R²: {channel_3m['r_squared']:.3f})")
-                    else:
-                        # Create a simple channel based on recent price action
-                        simple_channel_3m = create_simple_channel(three_month_df, 90)
-                        if simple_channel_3m:
-                            trendlines.append(simple_channel_3m)
-                            logger.info(f"3M Simple Channel: Upper {simple_channel_3m['upper_start_price']:.2f} → {simple_channel_3m['upper_end_price']:.2f}, Lower {simple_channel_3m['lower_start_price']:.2f} → {simple_channel_3m['lower_end_price']:.2f} (Slope: {simple_channel_3m['slope']:.4f}, Width: {simple_channel_3m['channel_width']:.2f})")
-                        else:
-                            logger.info("No significant 3M channel found")
-                            trendlines.append(None)
-                else:
-                    logger.warning("Insufficient data for 3-month analysis")
-                    trendlines.append(None)
-                
-                # 2. 6-Month Medium-term Trend Channel
-                logger.info(f"\n=== {stock_symbol} 6-Month Medium-term Trend Channel ===")
-                six_month_df = stock_df.last('180D')  # 6 months
-                
-                if len(six_month_df) >= 30:
-                    channel_6m = find_trend_channel(six_month_df, 180)
-                    if channel_6m:
-                        trendlines.append(channel_6m)
-                        logger.info(f"6M Channel: Upper {channel_6m['upper_start_price']:.2f} → {channel_6m['upper_end_price']:.2f}, Lower {channel_6m['lower_start_price']:.2f} → {channel_6m['lower_end_price']:.2f} (Slope: {channel_6m['slope']:.4f}, Width: {channel_6m['channel_width']:.2f}, R²: {channel_6m['r_squared']:.3f})")
-                    else:
-                        logger.info("No significant 6M channel found")
-                        trendlines.append(None)
-                else:
-                    logger.warning("Insufficient data for 6-month analysis")
-                    trendlines.append(None)
-                
-                # 3. 1.5-Year Long-term Trend Channel
-                logger.info(f"\n=== {stock_symbol} 1.5-Year Long-term Trend Channel ===")
-                eighteen_month_df = stock_df.last('540D')  # 1.5 years (18 months)
-                
-                if len(eighteen_month_df) >= 60:
-                    channel_18m = find_trend_channel(eighteen_month_df, 540)
-                    if channel_18m:
-                        trendlines.append(channel_18m)
-                        logger.info(f"18M Channel: Upper {channel_18m['upper_start_price']:.2f} → {channel_18m['upper_end_price']:.2f}, Lower {channel_18m['lower_start_price']:.2f} → {channel_18m['lower_end_price']:.2f} (Slope: {channel_18m['slope']:.4f}, Width: {channel_18m['channel_width']:.2f}, R²: {channel_18m['r_squared']:.3f})")
-                    else:
-                        logger.info("No significant 18M channel found")
-                        trendlines.append(None)
-                else:
-                    logger.warning("Insufficient data for 18-month analysis")
-                    trendlines.append(None)
-                
-                # 4. 3-Year Mega Trend Channel
-                logger.info(f"\n=== {stock_symbol} 3-Year Mega Trend Channel ===")
-                three_year_df = stock_df.last('1095D')  # 3 years (1095 days)
-                
-                if len(three_year_df) >= 150:
-                    channel_3y = find_trend_channel(three_year_df, 1095)
-                    if channel_3y:
-                        # Extend the channel to cover the latest candle
-                        latest_date = stock_df.index[-1]
-                        
-                        # Extend upper line
-                        channel_3y['upper_end_date'] = latest_date
-                        channel_3y['upper_end_price'] = channel_3y['upper_start_price'] + (channel_3y['slope'] * (channel_3y['upper_end_date'] - channel_3y['upper_start_date']).days)
-                        
-                        # Extend lower line
-                        channel_3y['lower_end_date'] = latest_date
-                        channel_3y['lower_end_price'] = channel_3y['lower_start_price'] + (channel_3y['slope'] * (channel_3y['lower_end_date'] - channel_3y['lower_start_date']).days)
-                        
-                        trendlines.append(channel_3y)
-                        logger.info(f"3Y Channel: Upper {channel_3y['upper_start_price']:.2f} → {channel_3y['upper_end_price']:.2f}, Lower {channel_3y['lower_start_price']:.2f} → {channel_3y['lower_end_price']:.2f} (Slope: {channel_3y['slope']:.4f}, Width: {channel_3y['channel_width']:.2f}, R²: {channel_3y['r_squared']:.3f})")
-                    else:
-                        # Create a simple channel based on 3-year data
-                        simple_channel_3y = create_simple_channel(three_year_df, 1095)
-                        if simple_channel_3y:
-                            # Extend the simple channel to cover the latest candle
-                            latest_date = stock_df.index[-1]
-                            
-                            # Extend upper line
-                            simple_channel_3y['upper_end_date'] = latest_date
-                            simple_channel_3y['upper_end_price'] = simple_channel_3y['upper_start_price'] + (simple_channel_3y['slope'] * (simple_channel_3y['upper_end_date'] - simple_channel_3y['upper_start_date']).days)
-                            
-                            # Extend lower line
-                            simple_channel_3y['lower_end_date'] = latest_date
-                            simple_channel_3y['lower_end_price'] = simple_channel_3y['lower_start_price'] + (simple_channel_3y['slope'] * (simple_channel_3y['lower_end_date'] - simple_channel_3y['lower_start_date']).days)
-                            
-                            trendlines.append(simple_channel_3y)
-                            logger.info(f"3Y Simple Channel: Upper {simple_channel_3y['upper_start_price']:.2f} → {simple_channel_3y['upper_end_price']:.2f}, Lower {simple_channel_3y['lower_start_price']:.2f} → {simple_channel_3y['lower_end_price']:.2f} (Slope: {simple_channel_3y['slope']:.4f}, Width: {simple_channel_3y['channel_width']:.2f})")
-                        else:
-                            logger.info("No significant 3Y channel found")
-                            trendlines.append(None)
-                else:
-                    logger.warning("Insufficient data for 3-year analysis")
-                    trendlines.append(None)
-                
-                # Store trendlines for this stock
-                if trendlines:
-                    store_simplified_trendlines(conn, trendlines, stock_symbol)
-                    valid_trendlines = [t for t in trendlines if t is not None]
-                    total_channels_generated += len(valid_trendlines)
-                    logger.info(f"Generated {len(valid_trendlines)} trend channels for {stock_symbol}")
-                else:
-                    logger.warning(f"No trendlines generated for {stock_symbol}")
-                
-            except Exception as e:
-                logger.error(f"Error analyzing {stock_symbol}: {e}")
-                continue
+                if channels is None:
+                    checkpoint.mark_done(symbol)
+                    continue
+                logger.info(f"Generated {sum(channel is not None for channel in channels)} "
+                            f"trend channels for {symbol}")
+                batch.append((symbol, channels))
+                if len(batch) >= CHANNEL_BATCH_SYMBOLS:
+                    total_channels_generated += flush_channel_batch(conn, batch, checkpoint, timeframes)
+                    batch = []
+            total_channels_generated += flush_channel_batch(conn, batch, checkpoint, timeframes)
         
         logger.info(f"\n{'='*60}")
         logger.info(f"ANALYSIS COMPLETED")
         logger.info(f"{'='*60}")
         logger.info(f"Total channels generated: {total_channels_generated}")
-        logger.info(f"Stocks processed: {len(stocks)}")
-        
-    except Exception as e:
-        logger.error(f"Error in multi-stock analysis: {e}")
+        logger.info(f"Stocks processed: {len(symbols)}")
     finally:
-        conn.close()
+        checkpoint.close()
+        if own_conn:
+            conn.close()
 
 if __name__ == "__main__":
-    analyze_multiple_stocks_trendlines()
+    parser = argparse.ArgumentParser(description="Generate simplified trend channels for every symbol")
+    add_workers_argument(parser)
+    add_resume_argument(parser)
+    parser.add_argument(
+        '--timeframes', default=",".join(str(timeframe['days']) for timeframe in CHANNEL_TIMEFRAMES),
+        help="Comma separated channel timeframes in days to analyze, from "
+             f"{','.join(str(timeframe['days']) for timeframe in CHANNEL_TIMEFRAMES)} (default: all)"
+    )
+    args = parser.parse_args()
+    requested = args.timeframes.split(',')
+    known = [str(timeframe['days']) for timeframe in CHANNEL_TIMEFRAMES]
+    if any(days not in known for days in requested):
+        parser.error(f"--timeframes must be days from {','.join(known)}, got {args.timeframes}")
+    main(workers=args.workers, resume=args.resume,
+         timeframes=[timeframe for timeframe in CHANNEL_TIMEFRAMES if str(timeframe['days']) in requested])
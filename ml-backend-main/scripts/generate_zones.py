@@ -1,14 +1,22 @@
 import pandas as pd
 import numpy as np
 from scipy.signal import argrelextrema
-from sklearn.cluster import DBSCAN
 from datetime import datetime, timedelta
 import psycopg2
 from psycopg2.extras import execute_values
 import os
 import glob
+import heapq
+import json
+import argparse
 import logging
 from dotenv import load_dotenv
+import pipeline_metrics
+from symbol_pool import add_workers_argument, run_sharded
+from checkpoints import SymbolCheckpoint, add_resume_argument
+import ohlcv_store
+from ohlcv_panel import OHLCVPanel, symbol_frame
+from price_clustering import cluster_prices, independent_groups
 
 # Load environment variables
 load_dotenv()
@@ -17,6 +25,23 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Symbols whose zones are written to the database together in one transaction
+ZONE_BATCH_SYMBOLS = int(os.getenv('ZONE_BATCH_SYMBOLS', '100'))
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Per-symbol candidate points, clusters and zones of the last run, used by --incremental
+ZONE_STATE_FILE = os.path.join(BASE_DIR, "pipeline-state", "zones_state.json")
+
+# Timeframes (in days) analyzed when none are given on the command line
+DEFAULT_TIMEFRAMES = [90]
+TIMEFRAME_TITLES = {
+    30: "1 Month",
+    90: "3 Months",
+    180: "6 Months",
+    365: "1 Year",
+    730: "2 Years",
+}
+
 def get_db_connection():
     """Create a database connection"""
     try:
@@ -41,16 +66,8 @@ def get_db_connection():
         logger.error(f"Error connecting to database: {e}")
         raise
 
-def store_zones(conn, zones, symbol, timeframe_days, zone_type):
-    """Store zones in the database"""
-    table_name = f"{zone_type}_zones"
-    cursor = conn.cursor()
-    
-    # Delete existing zones for this symbol and timeframe
-    cursor.execute(f"DELETE FROM {table_name} WHERE symbol = %s AND timeframe_days = %s",
-                  (symbol, timeframe_days))
-    
-    # Prepare data for insertion
+def zone_rows(zones, symbol, timeframe_days):
+    """Convert zones to rows of the support_zones / resistance_zones tables"""
     values = []
     for i, zone in enumerate(zones, 1):
         values.append((
@@ -61,180 +78,330 @@ def store_zones(conn, zones, symbol, timeframe_days, zone_type):
             float(zone['center']),
             float(zone['top'])
         ))
-    
-    # Insert new zones
-    execute_values(
-        cursor,
-        f"""
-        INSERT INTO {table_name} 
-        (symbol, timeframe_days, zone_number, bottom_price, center_price, top_price)
-        VALUES %s
-        ON CONFLICT (symbol, timeframe_days, zone_number) 
-        DO UPDATE SET 
-            bottom_price = EXCLUDED.bottom_price,
-            center_price = EXCLUDED.center_price,
-            top_price = EXCLUDED.top_price
-        """,
-        values
-    )
-    
-    conn.commit()
-    cursor.close()
+    return values
+
+def store_zones(conn, results):
+    """
+    Store the zones of a batch of symbols in one transaction.
+    results: list of (symbol, timeframe_days, support_rows, resistance_rows)
+    """
+    cursor = conn.cursor()
+    try:
+        for zone_type, rows_index in (('support', 2), ('resistance', 3)):
+            table_name = f"{zone_type}_zones"
+            
+            # Delete existing zones for these symbols and timeframes
+            symbols_by_timeframe = {}
+            for result in results:
+                symbols_by_timeframe.setdefault(result[1], []).append(result[0])
+            for timeframe_days, symbols in symbols_by_timeframe.items():
+                cursor.execute(
+                    f"DELETE FROM {table_name} WHERE timeframe_days = %s AND symbol = ANY(%s)",
+                    (timeframe_days, symbols)
+                )
+            
+            # Insert new zones
+            values = [row for result in results for row in result[rows_index]]
+            if values:
+                execute_values(
+                    cursor,
+                    f"""
+                    INSERT INTO {table_name} 
+                    (symbol, timeframe_days, zone_number, bottom_price, center_price, top_price)
+                    VALUES %s
+                    ON CONFLICT (symbol, timeframe_days, zone_number) 
+                    DO UPDATE SET 
+                        bottom_price = EXCLUDED.bottom_price,
+                        center_price = EXCLUDED.center_price,
+                        top_price = EXCLUDED.top_price
+                    """,
+                    values,
+                    page_size=1000
+                )
+            pipeline_metrics.count(rows_written=len(values))
+        
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def make_zones(bottom=(), center=(), top=(), count=()):
+    """
+    Zones as parallel arrays: the bottom, center and top price of each zone
+    and the number of candidate points it covers
+    """
+    return {
+        'bottom': np.asarray(bottom, dtype=np.float64),
+        'center': np.asarray(center, dtype=np.float64),
+        'top': np.asarray(top, dtype=np.float64),
+        'count': np.asarray(count, dtype=np.int64),
+    }
+
+def select_zones(zones, index):
+    """Zones picked by a boolean mask or index array"""
+    return {field: values[index] for field, values in zones.items()}
+
+def concat_zones(*zone_sets):
+    """Concatenate zone arrays, keeping their order"""
+    return {field: np.concatenate([zones[field] for zones in zone_sets]) for field in zone_sets[0]}
+
+def zone_records(zones):
+    """Convert zone arrays to a list of zone dicts"""
+    return [
+        {'bottom': bottom, 'center': center, 'top': top, 'count': count}
+        for bottom, center, top, count in zip(zones['bottom'].tolist(), zones['center'].tolist(),
+                                              zones['top'].tolist(), zones['count'].tolist())
+    ]
+
+def cluster_zones(prices, width_factor, single_width_factor, eps_value=None):
+    """
+    Cluster candidate prices and return one zone per cluster, centered on
+    the cluster mean and width_factor standard deviations wide on each side
+    (single_width_factor * center for a single-point cluster). eps_value
+    defaults to 0.2 standard deviations of the prices.
+    """
+    prices = np.asarray(prices, dtype=np.float64).ravel()
+    if eps_value is None:
+        eps_value = np.std(prices) * 0.2
+    labels = cluster_prices(prices, eps_value, min_samples=2)
+    
+    # Group the clustered points by label, keeping their order within a cluster
+    in_cluster = labels != -1
+    order = np.argsort(labels[in_cluster], kind='stable')
+    points = prices[in_cluster][order]
+    _, starts, counts = np.unique(labels[in_cluster][order], return_index=True, return_counts=True)
+    
+    centers = np.empty(len(starts))
+    widths = np.empty(len(starts))
+    for i, cluster_points in enumerate(np.split(points, starts[1:]) if len(starts) else []):
+        centers[i] = cluster_points.mean()
+        widths[i] = np.std(cluster_points) * width_factor if len(cluster_points) > 1 else centers[i] * single_width_factor
+    return make_zones(centers - widths, centers, centers + widths, counts)
+
+def cached_cluster_zones(prices, width_factor, single_width_factor, cache=None, key=None):
+    """
+    cluster_zones with an optional cache dict holding, under key, the
+    candidate prices of the last run split into independent groups
+    (price_clustering.independent_groups) and each group's zones. A group
+    is one cluster or a single noise point whatever eps is, so only the
+    groups that gained or lost a point are clustered again; the other
+    groups keep their zones. Zones come out in order of the groups' prices
+    rather than cluster order, which find_zones doesn't depend on.
+    """
+    if cache is None:
+        return cluster_zones(prices, width_factor, single_width_factor)
+    prices = np.asarray(prices, dtype=np.float64).ravel()
+    eps_value = np.std(prices) * 0.2
+    if not eps_value > 0:
+        # cluster_zones raises the same error as a full run
+        return cluster_zones(prices, width_factor, single_width_factor)
+    
+    cached = cache.get(key) or {}
+    cached_groups = {tuple(group['points']): group['zones'] for group in cached.get('groups', [])}
+    
+    groups = []
+    for index in independent_groups(prices, eps_value):
+        points = prices[index]
+        zones = cached_groups.get(tuple(points.tolist()))
+        if zones is not None:
+            zones = make_zones(**zones)
+        else:
+            zones = cluster_zones(points, width_factor, single_width_factor, eps_value)
+        groups.append((points, zones))
+    
+    cache[key] = {
+        'groups': [
+            {'points': points.tolist(), 'zones': {field: values.tolist() for field, values in zones.items()}}
+            for points, zones in groups
+        ],
+    }
+    return concat_zones(*(zones for _, zones in groups))
 
 def merge_overlapping_zones(zones, proximity_threshold=0.01):
     """Merge overlapping zones or zones that are very close to each other"""
-    if not zones:
+    n = len(zones['center'])
+    if n == 0:
         return zones
     
     # Sort zones by center price
-    zones = sorted(zones, key=lambda x: x['center'])
-    
-    # If more than 3 zones, merge closest zones until we have 3 or fewer
-    while len(zones) > 3:
-        # Find the pair of zones with the smallest distance between centers
-        min_distance = float('inf')
-        merge_idx = 0
-        for i in range(len(zones) - 1):
-            distance = abs(zones[i]['center'] - zones[i + 1]['center'])
-            if distance < min_distance:
-                min_distance = distance
-                merge_idx = i
+    order = np.argsort(zones['center'], kind='stable')
+    bottom = zones['bottom'][order].tolist()
+    center = zones['center'][order].tolist()
+    top = zones['top'][order].tolist()
+    count = zones['count'][order].tolist()
+    next_zone = list(range(1, n)) + [None]
+    prev_zone = [None] + list(range(n - 1))
+    
+    # If more than 3 zones, merge closest zones until we have 3 or fewer.
+    # Zones stay in a linked list in sorted order and a heap holds the
+    # distance between each zone and the next, so the closest pair (the
+    # leftmost one on ties) is found without rescanning every pair.
+    heap = [(abs(center[i] - center[i + 1]), i, i + 1) for i in range(n - 1)]
+    heapq.heapify(heap)
+    remaining = n
+    while remaining > 3:
+        distance, i, j = heapq.heappop(heap)
+        # Skip pairs that a merge has since split or moved
+        if next_zone[i] != j or abs(center[i] - center[j]) != distance:
+            continue
         
-        # Merge the two closest zones
-        current_zone = zones[merge_idx]
-        next_zone = zones[merge_idx + 1]
-        current_zone['bottom'] = min(current_zone['bottom'], next_zone['bottom'])
-        current_zone['top'] = max(current_zone['top'], next_zone['top'])
-        current_zone['center'] = (current_zone['bottom'] + current_zone['top']) / 2
-        current_zone['points'] = pd.concat([current_zone['points'], next_zone['points']])
-        zones[merge_idx] = current_zone
-        zones.pop(merge_idx + 1)
-    
-    # Merge overlapping or close zones
-    merged_zones = []
-    current_zone = zones[0]
-    
-    for next_zone in zones[1:]:
+        # Merge the two closest zones into the left one
+        bottom[i] = min(bottom[i], bottom[j])
+        top[i] = max(top[i], top[j])
+        center[i] = (bottom[i] + top[i]) / 2
+        count[i] += count[j]
+        next_zone[i], next_zone[j] = next_zone[j], None
+        if next_zone[i] is not None:
+            prev_zone[next_zone[i]] = i
+            heapq.heappush(heap, (abs(center[i] - center[next_zone[i]]), i, next_zone[i]))
+        if prev_zone[i] is not None:
+            heapq.heappush(heap, (abs(center[prev_zone[i]] - center[i]), prev_zone[i], i))
+        remaining -= 1
+    
+    # Merge overlapping or close zones in one pass over the sorted zones
+    merged = []
+    current = [bottom[0], center[0], top[0], count[0]]
+    i = next_zone[0]
+    while i is not None:
         # Calculate proximity threshold based on the current price
-        price_range = (current_zone['top'] - current_zone['bottom'])
-        effective_threshold = max(proximity_threshold * current_zone['center'], price_range * 0.5)
+        price_range = (current[2] - current[0])
+        effective_threshold = max(proximity_threshold * current[1], price_range * 0.5)
         
         # Check if zones overlap or are closer than the threshold
-        if current_zone['top'] >= next_zone['bottom'] - effective_threshold:
+        if current[2] >= bottom[i] - effective_threshold:
             # Merge zones
-            current_zone['bottom'] = min(current_zone['bottom'], next_zone['bottom'])
-            current_zone['top'] = max(current_zone['top'], next_zone['top'])
-            current_zone['center'] = (current_zone['bottom'] + current_zone['top']) / 2
-            current_zone['points'] = pd.concat([current_zone['points'], next_zone['points']])
+            current[0] = min(current[0], bottom[i])
+            current[2] = max(current[2], top[i])
+            current[1] = (current[0] + current[2]) / 2
+            current[3] += count[i]
         else:
-            merged_zones.append(current_zone)
-            current_zone = next_zone
+            merged.append(current)
+            current = [bottom[i], center[i], top[i], count[i]]
+        i = next_zone[i]
     
-    merged_zones.append(current_zone)
-    return merged_zones
+    merged.append(current)
+    return make_zones(*zip(*merged))
+
+def zone_window(days):
+    """Rolling window for the candidate points; smaller for more sensitive detection"""
+    return max(3, min(15, days // 20))
+
+def timeframe_title(days):
+    return TIMEFRAME_TITLES.get(days, f"{days} Days")
 
-def analyze_zones(df, days, title_suffix, symbol='NEPSE'):
+def analyze_zones(df, timeframes, symbol='NEPSE', clusters=None):
     """
-    Analyze support and resistance zones for a specific timeframe with improved logic
+    Analyze support and resistance zones for several timeframes with improved logic.
+    df must be sorted by date. The rolling extrema and candidate points are
+    computed once over the longest timeframe and shared by the shorter ones.
+    Returns {days: (support_zones, resistance_zones)}, with (None, None) for a
+    timeframe without enough data.
+    
+    clusters: optional dict of each timeframe's candidate points and clusters
+    from a previous run, updated in place; only the clusters near candidate
+    points that were added or dropped are clustered again.
     """
-    # Filter data for specified timeframe
-    start_date = df.index.max() - timedelta(days=days)
-    timeframe_df = df[df.index >= start_date].copy()
-    
-    if len(timeframe_df) < 2:
-        print(f"Not enough data points for {title_suffix} analysis")
-        return None, None
+    results = {}
+    if df.empty:
+        for days in timeframes:
+            print(f"Not enough data points for {timeframe_title(days)} analysis")
+            results[days] = (None, None)
+        return results
+    
+    # Position of the first bar of each timeframe
+    last_date = df.index.max()
+    starts = {days: df.index.searchsorted(last_date - timedelta(days=days), side='left')
+              for days in timeframes}
+    first = min(starts.values())
+    high = df['high'].values[first:]
+    low = df['low'].values[first:]
     
     # Get current price
-    current_price = timeframe_df['close'].iloc[-1]
-    
-    # Use a smaller window for more sensitive detection
-    window = max(3, min(15, days // 20))
-    
-    # Initialize lists for support and resistance zones
-    support_zones = []
-    resistance_zones = []
-    
-    # Find resistance points
-    resistance_points = timeframe_df[timeframe_df['high'] >= timeframe_df['high'].rolling(window=window).max() * 0.995].copy()
-    # Find support points within 20% of current price
+    current_price = df['close'].iloc[-1]
     price_threshold = current_price * 0.8
-    support_points = timeframe_df[
-        (timeframe_df['low'] <= timeframe_df['low'].rolling(window=window).min() * 1.005) &
-        (timeframe_df['low'] >= price_threshold)
-    ].copy()
     
-    # Process resistance zones
-    if not resistance_points.empty:
-        X = resistance_points[['high']].values
-        eps_value = np.std(X) * 0.2
-        db = DBSCAN(eps=eps_value, min_samples=2).fit(X)
-        resistance_points['cluster'] = db.labels_
+    # Candidate points for each rolling window size over the longest timeframe:
+    # resistance points near the rolling high, support points near the rolling
+    # low and within 20% of current price
+    candidates = {}
+    for window in sorted({zone_window(days) for days in timeframes}):
+        rolling_high = pd.Series(high).rolling(window=window).max().values
+        rolling_low = pd.Series(low).rolling(window=window).min().values
+        candidates[window] = (
+            high >= rolling_high * 0.995,
+            (low <= rolling_low * 1.005) & (low >= price_threshold)
+        )
+    
+    for days in timeframes:
+        title_suffix = timeframe_title(days)
+        offset = starts[days] - first
+        if len(high) - offset < 2:
+            print(f"Not enough data points for {title_suffix} analysis")
+            results[days] = (None, None)
+            continue
         
-        for cluster in set(resistance_points['cluster']):
-            if cluster != -1:
-                cluster_points = resistance_points[resistance_points['cluster'] == cluster]['high']
-                zone_center = cluster_points.mean()
-                zone_width = np.std(cluster_points) * 1.5 if len(cluster_points) > 1 else zone_center * 0.01
-                resistance_zones.append({
-                    'bottom': zone_center - zone_width,
-                    'center': zone_center,
-                    'top': zone_center + zone_width,
-                    'points': resistance_points[resistance_points['cluster'] == cluster]
-                })
+        # The first window - 1 bars of a shorter timeframe have no full
+        # rolling window inside it, so they can't be candidates
+        window = zone_window(days)
+        edge = np.arange(len(high)) >= offset + window - 1
+        resistance_mask, support_mask = candidates[window]
+        try:
+            cache = clusters.setdefault(str(days), {}) if clusters is not None else None
+            results[days] = find_zones(high[resistance_mask & edge], low[support_mask & edge],
+                                       current_price, title_suffix, cache)
+        except ValueError as e:
+            # e.g. every candidate point at the same price; the other
+            # timeframes can still be analyzed
+            logger.error(f"Error analyzing {title_suffix} zones for {symbol}: {e}")
+            results[days] = (None, None)
+    return results
+
+def find_zones(resistance_points, support_points, current_price, title_suffix, cache=None):
+    """
+    Cluster one timeframe's candidate points into support and resistance
+    zones around the current price, reusing clusters from cache if given
+    """
+    # Process resistance zones
+    resistance_zones = make_zones()
+    if len(resistance_points):
+        resistance_zones = cached_cluster_zones(resistance_points, 1.5, 0.01, cache, 'resistance')
     
     # Process support zones
-    if not support_points.empty:
-        X = support_points[['low']].values
-        eps_value = np.std(X) * 0.2
-        db = DBSCAN(eps=eps_value, min_samples=2).fit(X)
-        support_points['cluster'] = db.labels_
-        
-        for cluster in set(support_points['cluster']):
-            if cluster != -1:
-                cluster_points = support_points[support_points['cluster'] == cluster]['low']
-                zone_center = cluster_points.mean()
-                zone_width = np.std(cluster_points) * 0.8 if len(cluster_points) > 1 else zone_center * 0.005
-                price_diff = zone_width * 2
-                min_price_diff = zone_center * 0.005
-                if price_diff >= min_price_diff:
-                    support_zones.append({
-                        'bottom': zone_center - zone_width,
-                        'center': zone_center,
-                        'top': zone_center + zone_width,
-                        'points': support_points[support_points['cluster'] == cluster]
-                    })
+    support_zones = make_zones()
+    if len(support_points):
+        support_zones = cached_cluster_zones(support_points, 0.8, 0.005, cache, 'support')
+        # Drop zones narrower than 0.5% of their center
+        support_zones = select_zones(
+            support_zones,
+            (support_zones['top'] - support_zones['center']) * 2 >= support_zones['center'] * 0.005
+        )
     
     # Convert zones based on close price
-    final_support_zones = []
-    final_resistance_zones = []
-    
-    # Process resistance zones
-    for zone in resistance_zones:
-        if zone['top'] < current_price:
-            # Convert resistance zone below close price to support zone
-            final_support_zones.append(zone)
-        elif zone['bottom'] <= current_price <= zone['top']:
-            # Close price is within the zone, treat as resistance
-            final_resistance_zones.append(zone)
-        elif zone['bottom'] > current_price:
-            # Resistance zone above close price
-            final_resistance_zones.append(zone)
+    r_bottom, r_top = resistance_zones['bottom'], resistance_zones['top']
+    s_bottom, s_top = support_zones['bottom'], support_zones['top']
+    
+    # Resistance zones below the close price become support zones; the
+    # close price within the zone or below it keeps them as resistance
+    resistance_to_support = r_top < current_price
+    resistance_kept = ~resistance_to_support & (
+        ((r_bottom <= current_price) & (current_price <= r_top)) | (r_bottom > current_price)
+    )
+    # Support zones above the close price become resistance zones; the
+    # close price within the zone or above it keeps them as support
+    support_to_resistance = s_bottom > current_price
+    support_kept = ~support_to_resistance & (
+        ((s_bottom <= current_price) & (current_price <= s_top)) | (s_top <= current_price)
+    )
     
-    # Process support zones
-    for zone in support_zones:
-        if zone['bottom'] > current_price:
-            # Convert support zone above close price to resistance zone
-            final_resistance_zones.append(zone)
-        elif zone['bottom'] <= current_price <= zone['top']:
-            # Close price is within the zone, treat as support
-            final_support_zones.append(zone)
-        elif zone['top'] <= current_price:
-            # Support zone below or at close price
-            final_support_zones.append(zone)
+    final_support_zones = concat_zones(select_zones(resistance_zones, resistance_to_support),
+                                       select_zones(support_zones, support_kept))
+    final_resistance_zones = concat_zones(select_zones(resistance_zones, resistance_kept),
+                                          select_zones(support_zones, support_to_resistance))
     
-    final_support_zones = merge_overlapping_zones(final_support_zones, proximity_threshold=0.008)
-    final_resistance_zones = merge_overlapping_zones(final_resistance_zones, proximity_threshold=0.008)
+    final_support_zones = zone_records(merge_overlapping_zones(final_support_zones, proximity_threshold=0.008))
+    final_resistance_zones = zone_records(merge_overlapping_zones(final_resistance_zones, proximity_threshold=0.008))
     
     # Ensure no overlap between support and resistance zones
     non_overlapping_support_zones = []
@@ -259,17 +426,6 @@ def analyze_zones(df, days, title_suffix, symbol='NEPSE'):
         if all(r_zone['bottom'] > s_zone['top'] or r_zone['top'] < s_zone['bottom'] for s_zone in final_support_zones):
             non_overlapping_resistance_zones.append(r_zone)
     
-    # Store zones in database
-    conn = get_db_connection()
-    try:
-        store_zones(conn, non_overlapping_support_zones, symbol, days, 'support')
-        store_zones(conn, non_overlapping_resistance_zones, symbol, days, 'resistance')
-        print(f"Stored {len(non_overlapping_support_zones)} support zones and {len(non_overlapping_resistance_zones)} resistance zones in database")
-    except Exception as e:
-        print(f"Error storing zones in database: {e}")
-    finally:
-        conn.close()
-    
     # Print zones
     print(f"\nSupport Zones ({title_suffix}):")
     print("-" * 50)
@@ -299,64 +455,226 @@ def cleanup_zones(conn):
     finally:
         cursor.close()
 
-def main():
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    data_dir = os.path.join(base_dir, "data")
-    
-    data_file = os.path.join(data_dir, "daily_data_202507172305.csv")
-    
-    if not os.path.exists(data_file):
-        logger.error("No data file found in the data directory")
-        return
-    
-    logger.info("Found data file to process")
-    
-    # Read the single data file
-    df = pd.read_csv(data_file)
-    df['date'] = pd.to_datetime(df['date'])
+def load_zone_state():
+    """Return the zone state saved by the last run, or None if there isn't one"""
+    if not os.path.exists(ZONE_STATE_FILE):
+        return None
+    with open(ZONE_STATE_FILE) as f:
+        return json.load(f)
+
+def save_zone_state(state):
+    """Write the zone state atomically so a crash never leaves a partial file"""
+    os.makedirs(os.path.dirname(ZONE_STATE_FILE), exist_ok=True)
+    tmp_path = ZONE_STATE_FILE + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, ZONE_STATE_FILE)
+
+def changed_symbols(state, store_symbols):
+    """Symbols whose stored bars changed since the zone state was recorded"""
+    return sorted(
+        symbol for symbol, entry in store_symbols.items()
+        if state['symbols'].get(symbol, {}).get('store_updated_at') != entry['updated_at']
+    )
+
+def main(conn=None, daily_df=None, workers=1, resume=False, timeframes=None, incremental=False):
+    timeframes = sorted(set(timeframes or DEFAULT_TIMEFRAMES))
+    store_symbols = ohlcv_store.load_manifest()['symbols']
+    
+    state = load_zone_state()
+    if incremental:
+        if state is None:
+            logger.warning("No zone state from a previous run, analyzing every symbol")
+            incremental = False
+        elif state['timeframes'] != timeframes:
+            logger.warning(f"Last run analyzed timeframes {state['timeframes']}, "
+                           f"analyzing every symbol for {timeframes}")
+            incremental = False
+    if not incremental and not (resume and state and state['timeframes'] == timeframes):
+        state = {'timeframes': timeframes, 'symbols': {}}
+    
+    if incremental:
+        symbols = changed_symbols(state, store_symbols)
+        logger.info(f"{len(symbols)} of {len(store_symbols)} stored symbols have new bars")
+        if not symbols:
+            logger.info("Zones are up to date")
+            return
+        if daily_df is None:
+            # Only the bars of the longest timeframe are needed
+            start = (min(pd.Timestamp(store_symbols[symbol]['max_date']) for symbol in symbols)
+                     - timedelta(days=max(timeframes)))
+            df = ohlcv_store.read_ohlcv(symbols, start=start)
+        else:
+            df = daily_df[daily_df['symbol'].isin(symbols)]
+    elif daily_df is None:
+        # Every stored symbol in one columnar read: the same bars, at the
+        # same precision, as the incremental mode and the state it records
+        df = ohlcv_store.read_ohlcv()
+        
+        if df.empty:
+            logger.error("No symbols found in the daily data store")
+            return
+    else:
+        df = daily_df
+    pipeline_metrics.count(rows_read=len(df))
     
     # Get unique symbols and sort them alphabetically
     symbols = sorted(df['symbol'].unique())
     logger.info(f"Found {len(symbols)} unique symbols to process")
     
     #symbols = ['NEPSE','GLICL']
-    conn = get_db_connection()
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    # An incremental run only rewrites what changed, so it has nothing to resume
+    checkpoint = None if incremental else SymbolCheckpoint('zones', resume)
     try:
-        cleanup_zones(conn)
-        for symbol in symbols:
-            # Filter data for current symbol
-            symbol_df = df[df['symbol'] == symbol].copy()
-            symbol_df.set_index('date', inplace=True)
-            symbol_df = symbol_df.sort_index()
+        if resume and not incremental:
+            # Keep the zones of symbols the interrupted run already finished
+            symbols = checkpoint.remaining(symbols)
+            logger.info(f"{len(symbols)} symbols left to process")
+        elif not incremental:
+            cleanup_zones(conn)
+        
+        # Validate required columns
+        required_columns = ['open', 'high', 'low', 'close', 'volume']
+        if not all(col in df.columns for col in required_columns):
+            logger.error(f"Missing required columns: {required_columns}")
+            return
+        
+        # Pack the bars into shared memory once; each task only carries a
+        # reference to its symbol's rows, which the worker reads in place.
+        # Workers only compute zones: this process writes them for batches of
+        # symbols on its own connection.
+        with OHLCVPanel.build(df) as panel:
+            tasks = [
+                (symbol, (panel.ref(symbol), timeframes,
+                          state['symbols'].get(symbol, {}).get('clusters') if incremental else None))
+                for symbol in symbols
+            ]
             
-            # Validate required columns
-            required_columns = ['open', 'high', 'low', 'close', 'volume']
-            if not all(col in symbol_df.columns for col in required_columns):
-                logger.error(f"Missing required columns for {symbol}: {required_columns}")
-                continue
-                
-            process_symbol(symbol_df, symbol)
+            batch = []
+            for symbol, result, error in run_sharded(tasks, process_symbol_task, workers):
+                if error:
+                    logger.error(f"Zone analysis failed for {symbol}: {error}")
+                    continue
+                result['store_updated_at'] = store_symbols.get(symbol, {}).get('updated_at')
+                batch.append((symbol, result))
+                if len(batch) >= ZONE_BATCH_SYMBOLS:
+                    flush_zone_batch(conn, batch, checkpoint, state, incremental)
+                    batch = []
+            flush_zone_batch(conn, batch, checkpoint, state, incremental)
         logger.info("Analysis complete! Check the database for stored zones.")
     finally:
-        conn.close()
+        if checkpoint is not None:
+            checkpoint.close()
+        if own_conn:
+            conn.close()
 
-def process_symbol(df, symbol):
-    """Process data for a single symbol"""
+def flush_zone_batch(conn, batch, checkpoint, state, incremental=False):
+    """
+    Store a batch of (symbol, process_symbol_task result) pairs, record them
+    in the zone state and checkpoint their symbols. An incremental run only
+    writes the timeframes whose zones differ from the last run's.
+    """
+    results = []
+    for symbol, result in batch:
+        previous = state['symbols'].get(symbol, {}).get('zones', {}) if incremental else {}
+        for days in sorted(set(result['zones']) | set(previous), key=int):
+            zones = result['zones'].get(days, {'support': [], 'resistance': []})
+            if incremental and zones == previous.get(days):
+                continue
+            rows = {
+                zone_type: [(symbol, int(days), i, *prices) for i, prices in enumerate(zones[zone_type], 1)]
+                for zone_type in ('support', 'resistance')
+            }
+            results.append((symbol, int(days), rows['support'], rows['resistance']))
+    try:
+        if results:
+            store_zones(conn, results)
+            print(f"Stored zones for {len({zones[0] for zones in results})} symbols in database")
+    except Exception as e:
+        # Left out of the checkpoint and the state, so --resume and the
+        # next --incremental run analyze them again
+        logger.error(f"Error storing zones in database: {e}")
+        return
+    for symbol, result in batch:
+        state['symbols'][symbol] = result
+        if checkpoint is not None:
+            checkpoint.mark_done(symbol)
+    save_zone_state(state)
+
+def process_symbol_task(symbol, payload, conn):
+    """
+    Worker entry point: analyze one symbol's zones from the shared panel,
+    reusing the clusters of the last run that no added or dropped candidate
+    point touches. Returns the symbol's zone state; errors are raised so
+    run_sharded reports them and the symbol isn't checkpointed.
+    """
+    panel_ref, timeframes, clusters = payload
+    df = symbol_frame(panel_ref)
+    clusters = clusters or {}
+    zones = process_symbol(df, symbol, timeframes, clusters)
+    return {
+        'last_date': df.index.max().strftime("%Y-%m-%d"),
+        'clusters': clusters,
+        'zones': {
+            str(days): {
+                'support': [list(row[3:]) for row in support_rows],
+                'resistance': [list(row[3:]) for row in resistance_rows],
+            }
+            for _, days, support_rows, resistance_rows in zones
+        },
+    }
+
+def process_symbol(df, symbol, timeframes=None, clusters=None):
+    """
+    Process data for a single symbol. Returns a list of (symbol,
+    timeframe_days, support_rows, resistance_rows) for store_zones, one per
+    timeframe that could be analyzed. Errors are logged and raised. clusters
+    is passed on to analyze_zones.
+    """
     try:
         logger.info(f"Processing {symbol}...")
         
-        days = 90
-        title = "3 Months"
+        timeframes = timeframes or DEFAULT_TIMEFRAMES
+        logger.info(f"Analyzing {', '.join(timeframe_title(days) for days in timeframes)} timeframes...")
         
-        logger.info(f"Analyzing {title} timeframe...")
-
-        support_zones, resistance_zones = analyze_zones(df, days, title, symbol)
-        if support_zones is not None or resistance_zones is not None:
-            print(f"Successfully analyzed zones for {title}")
+        zones = analyze_zones(df, timeframes, symbol, clusters)
+        pipeline_metrics.count(symbols_processed=1)
+        results = []
+        for days, (support_zones, resistance_zones) in zones.items():
+            if support_zones is None and resistance_zones is None:
+                continue
+            print(f"Successfully analyzed zones for {timeframe_title(days)}")
+            results.append((symbol, days, zone_rows(support_zones, symbol, days),
+                            zone_rows(resistance_zones, symbol, days)))
+        return results
                 
     except Exception as e:
         logger.error(f"Error processing symbol {symbol}: {e}")
-
+        raise
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate support and resistance zones")
+    add_workers_argument(parser)
+    add_resume_argument(parser)
+    parser.add_argument(
+        '--timeframes', default=",".join(str(days) for days in DEFAULT_TIMEFRAMES),
+        help="Comma separated timeframes in days to analyze, e.g. 30,90,180,365 "
+             f"(default: {','.join(str(days) for days in DEFAULT_TIMEFRAMES)})"
+    )
+    parser.add_argument(
+        '--incremental', action='store_true',
+        help="Only re-analyze symbols whose stored bars changed since the last run, "
+             "keeping the other zones, and only write zones that changed"
+    )
+    args = parser.parse_args()
+    try:
+        timeframes = [int(days) for days in args.timeframes.split(',')]
+    except ValueError:
+        parser.error(f"--timeframes must be a comma separated list of days, got {args.timeframes}")
+    if any(days < 1 for days in timeframes):
+        parser.error("--timeframes must all be at least 1 day")
+    main(workers=args.workers, resume=args.resume, timeframes=timeframes,
+         incremental=args.incremental)
\ No newline at end of file
@@ -0,0 +1,116 @@
+import psycopg2
+import logging
+import os
+import time
+import argparse
+from dotenv import load_dotenv
+import pipeline_metrics
+from pg_bulk import (create_staging_table, copy_csv_file, merge_from_staging,
+                     secondary_indexes, drop_indexes, create_indexes)
+
+# Load environment variables
+load_dotenv()
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DATA_FILE = os.path.join(BASE_DIR, "data", "daily_data_202507172305.csv")
+
+COLUMNS = ['date', 'symbol', 'open', 'high', 'low', 'close', 'volume']
+KEY_COLUMNS = ['date', 'symbol']
+
+def get_db_connection():
+    """Create a database connection"""
+    try:
+        conn = psycopg2.connect(
+            host=os.getenv('DB_HOST', 'localhost'),
+            port=os.getenv('DB_PORT', '5433'),
+            database=os.getenv('DB_NAME', 'stock_market'),
+            user=os.getenv('DB_USER', 'postgres'),
+            password=os.getenv('DB_PASSWORD', 'postgres')
+        )
+        logger.info("Successfully connected to database")
+        return conn
+    except Exception as e:
+        logger.error(f"Error connecting to database: {e}")
+        raise
+
+def read_header(data_file):
+    """Return the CSV's column names, checking they are the daily_data columns"""
+    with open(data_file) as f:
+        header = [column.strip() for column in f.readline().split(',')]
+    if sorted(header) != sorted(COLUMNS):
+        raise ValueError(f"{data_file} has columns {header}, expected {COLUMNS}")
+    return header
+
+def load_daily_data(conn, data_file, defer_indexes=False):
+    """
+    Bulk load a daily data CSV into daily_data: COPY it into a staging
+    table, then merge on (date, symbol). A bar repeated in the file keeps
+    its last occurrence. Returns (rows read, rows inserted or changed).
+    """
+    header = read_header(data_file)
+    cursor = conn.cursor()
+    try:
+        started = time.monotonic()
+        # row_no keeps the file order so the last copy of a repeated bar wins
+        create_staging_table(cursor, "daily_data_staging", "daily_data", COLUMNS, ["row_no BIGSERIAL"])
+        with open(data_file) as f:
+            copy_csv_file(cursor, "daily_data_staging", header, f, force_null=['volume'])
+        cursor.execute("SELECT COUNT(*) FROM daily_data_staging")
+        rows_read = cursor.fetchone()[0]
+        logger.info(f"Copied {rows_read} rows into staging in {time.monotonic() - started:.1f}s")
+
+        indexes = []
+        if defer_indexes:
+            indexes = secondary_indexes(cursor, "daily_data")
+            drop_indexes(cursor, indexes)
+
+        rows_written = merge_from_staging(cursor, "daily_data_staging", "daily_data",
+                                          COLUMNS, KEY_COLUMNS, order_column="row_no")
+        create_indexes(cursor, indexes)
+        cursor.execute("ANALYZE daily_data")
+        conn.commit()
+
+        logger.info(f"Merged {rows_written} new or changed rows into daily_data "
+                    f"in {time.monotonic() - started:.1f}s")
+        return rows_read, rows_written
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def main(conn=None, data_file=None, defer_indexes=False):
+    """Bulk load the master daily data file (or a daily drop) into daily_data"""
+    data_file = data_file or DEFAULT_DATA_FILE
+    if not os.path.exists(data_file):
+        logger.error(f"Data file not found: {data_file}")
+        raise SystemExit(1)
+
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    try:
+        rows_read, rows_written = load_daily_data(conn, data_file, defer_indexes)
+        pipeline_metrics.count(rows_read=rows_read, rows_written=rows_written)
+    finally:
+        if own_conn:
+            conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk load daily OHLCV bars into the daily_data table")
+    parser.add_argument(
+        '--file', metavar='CSV',
+        help="CSV with date,symbol,open,high,low,close,volume columns "
+             "(default: the master daily data file)"
+    )
+    parser.add_argument(
+        '--defer-indexes', action='store_true',
+        help="Drop daily_data's secondary indexes during the load and rebuild them "
+             "afterwards (faster for full-history loads)"
+    )
+    args = parser.parse_args()
+    main(data_file=args.file, defer_indexes=args.defer_indexes)
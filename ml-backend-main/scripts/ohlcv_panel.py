@@ -0,0 +1,132 @@
+"""
+Shared-memory OHLCV panel for the per-symbol worker processes
+
+The parent process loads the daily bars once and packs them into a dense
+symbols x dates x (open, high, low, close, volume) array that lives in
+multiprocessing.shared_memory, with a day with no bar for a symbol stored
+as NaN. Tasks carry only a small reference (the shared memory names and
+the symbol's row); workers attach to the panel by name once and read a
+symbol's rows straight out of the shared block, so memory doesn't grow
+with the number of workers and no bars are pickled.
+
+    with OHLCVPanel.build(df) as panel:
+        tasks = [(symbol, panel.ref(symbol)) for symbol in panel.symbols]
+        ...
+    # in the worker
+    symbol_df = symbol_frame(ref)
+"""
+
+import logging
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ['open', 'high', 'low', 'close', 'volume']
+
+# Panels this process has created or attached to, by shared memory name
+_panels = {}
+
+class OHLCVPanel:
+    """Dense symbols x dates x FIELDS array backed by shared memory"""
+
+    def __init__(self, values_block, dates_block, n_symbols, n_dates, dtype, symbols=None, owner=False):
+        self._values_block = values_block
+        self._dates_block = dates_block
+        self.dtype = np.dtype(dtype)
+        self.values = np.ndarray((n_symbols, n_dates, len(FIELDS)), dtype=self.dtype,
+                                 buffer=values_block.buf)
+        self.dates = np.ndarray((n_dates,), dtype='datetime64[ns]', buffer=dates_block.buf)
+        self.symbols = symbols
+        self.owner = owner
+        self._index = {symbol: i for i, symbol in enumerate(symbols or [])}
+        _panels[values_block.name] = self
+
+    @classmethod
+    def build(cls, df, dtype='float64'):
+        """
+        Build a panel from a long frame with date, symbol and FIELDS columns.
+        If a (symbol, date) appears twice the later row wins.
+        """
+        df = df[df['symbol'].notna() & df['date'].notna()]
+        symbol_codes, symbols = pd.factorize(df['symbol'].astype(str), sort=True)
+        date_values = pd.to_datetime(df['date']).to_numpy(dtype='datetime64[ns]')
+        dates = np.unique(date_values)
+        date_codes = np.searchsorted(dates, date_values)
+        n_symbols, n_dates = len(symbols), len(dates)
+
+        # Position of the last row for every (symbol, date) cell
+        cells = symbol_codes.astype(np.int64) * n_dates + date_codes
+        _, last_from_end = np.unique(cells[::-1], return_index=True)
+        rows = len(cells) - 1 - last_from_end
+
+        dtype = np.dtype(dtype)
+        values_size = max(1, n_symbols * n_dates * len(FIELDS) * dtype.itemsize)
+        values_block = shared_memory.SharedMemory(create=True, size=values_size)
+        dates_block = shared_memory.SharedMemory(create=True, size=max(1, n_dates * 8))
+        panel = cls(values_block, dates_block, n_symbols, n_dates, dtype,
+                    symbols=list(symbols), owner=True)
+        panel.values.fill(np.nan)
+        panel.dates[:] = dates
+        panel.values[symbol_codes[rows], date_codes[rows]] = df[FIELDS].to_numpy(dtype=dtype)[rows]
+
+        logger.info(f"Built shared OHLCV panel: {n_symbols} symbols x {n_dates} dates "
+                    f"({values_size / 1024 / 1024:.1f} MB)")
+        return panel
+
+    @property
+    def spec(self):
+        """What a worker needs to attach to this panel"""
+        return {
+            'values': self._values_block.name,
+            'dates': self._dates_block.name,
+            'n_symbols': self.values.shape[0],
+            'n_dates': self.values.shape[1],
+            'dtype': self.dtype.str,
+        }
+
+    def ref(self, symbol):
+        """Small, picklable reference to one symbol's rows for a task payload"""
+        return self.spec, self._index[symbol]
+
+    @classmethod
+    def attach(cls, spec):
+        """Attach to a panel created by another process, once per process"""
+        panel = _panels.get(spec['values'])
+        if panel is not None:
+            return panel
+        # Pool workers share their parent's resource tracker, so attaching
+        # here doesn't make the blocks outlive (or die before) the owner
+        values_block = shared_memory.SharedMemory(name=spec['values'])
+        dates_block = shared_memory.SharedMemory(name=spec['dates'])
+        return cls(values_block, dates_block, spec['n_symbols'], spec['n_dates'], spec['dtype'])
+
+    def symbol_frame(self, index):
+        """Return one symbol's bars as a date-indexed frame, skipping days without a bar"""
+        rows = self.values[index]
+        has_bar = ~np.isnan(rows[:, FIELDS.index('close')])
+        return pd.DataFrame(rows[has_bar], columns=FIELDS,
+                            index=pd.DatetimeIndex(self.dates[has_bar], name='date'))
+
+    def close(self):
+        """Detach from the panel; the creating process also frees the shared memory"""
+        _panels.pop(self._values_block.name, None)
+        # Drop the array views before closing the blocks they point into
+        self.values = self.dates = None
+        for block in (self._values_block, self._dates_block):
+            block.close()
+            if self.owner:
+                block.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def symbol_frame(ref):
+    """Return the bars for a reference made by OHLCVPanel.ref, attaching if needed"""
+    spec, index = ref
+    return OHLCVPanel.attach(spec).symbol_frame(index)
@@ -0,0 +1,332 @@
+"""
+Columnar per-symbol OHLCV store
+
+generate_daily_data.py splits the master daily data file into this store
+instead of one timestamped CSV per symbol. Every symbol has its own
+directory of Parquet part files under all-data/, with typed columns
+(datetime dates, float prices) and rows sorted by date, plus a small
+manifest listing the stored symbols:
+
+    all-data/
+        _manifest.json
+        NABIL/part-00000.parquet
+        ...
+
+Readers use read_ohlcv() / iter_symbols() to load only the symbols, date
+range and columns they need.
+
+Daily drops are added with ingest(): bars newer than a symbol's high-water
+mark (its max_date in the manifest) are appended as a new part file, so an
+update costs one day of data instead of the full history. The manifest
+records which symbols the last ingest touched for updated_symbols().
+Rebuilding a symbol from the master file with rebuild_symbol() keeps the
+bars ingested after the master file's last day.
+
+load_daily_csv() is the shared loader for the master daily data CSV.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STORE_DIR = os.path.join(BASE_DIR, "all-data")
+MANIFEST_FILE = "_manifest.json"
+
+COLUMNS = ['date', 'symbol', 'open', 'high', 'low', 'close', 'volume']
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+
+# A symbol's part files are merged back into one once it has this many
+MAX_PARTS = 32
+
+# Rows parsed at a time by load_daily_csv
+CSV_CHUNK_ROWS = 200000
+
+def symbol_dir_name(symbol):
+    """
+    Return the directory name for a symbol: the symbol itself, or with
+    invalid characters replaced by underscores and a short hash appended so
+    that e.g. 'A/B' and 'A_B' don't share a directory
+    """
+    safe_name = re.sub(r'[^a-zA-Z0-9_]', '_', symbol)
+    if safe_name == symbol:
+        return safe_name
+    return f"{safe_name}-{hashlib.sha1(symbol.encode('utf-8')).hexdigest()[:8]}"
+
+def _symbol_dir(symbol, store_dir):
+    return os.path.join(store_dir, symbol_dir_name(symbol))
+
+def _part_files(symbol, store_dir):
+    return sorted(glob.glob(os.path.join(_symbol_dir(symbol, store_dir), "part-*.parquet")))
+
+def to_store_frame(df):
+    """Return df with the store's column order and types, sorted by date"""
+    frame = df[COLUMNS].copy()
+    frame['date'] = pd.to_datetime(frame['date'])
+    frame['symbol'] = frame['symbol'].astype(str)
+    # Volume stays float because some bars have no volume
+    for column in PRICE_COLUMNS + ['volume']:
+        frame[column] = frame[column].astype('float64')
+    return frame.sort_values('date', kind='stable').reset_index(drop=True)
+
+def _count_lines(path, block_size=1 << 20):
+    """Number of newlines in a file, read in blocks"""
+    lines = 0
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            lines += block.count(b'\n')
+    return lines
+
+def load_daily_csv(path, price_dtype='float64', chunksize=CSV_CHUNK_ROWS):
+    """
+    Load the master daily data CSV with compact dtypes, parsing it in chunks
+    so the whole file never exists as strings at once: symbol is
+    categorical, prices are price_dtype, volume is int64 when every bar has
+    a whole-number volume (float64 otherwise) and dates are parsed once per
+    chunk. Prices default to float64, the precision of the store and of
+    OHLCVPanel, so every entry point analyzes the same values.
+
+    Each chunk is copied into column arrays sized from the file's line
+    count and the frame is built on those arrays, so the chunks and the
+    loaded frame are never in memory together.
+
+    Group by symbol with observed=True, or every category is visited.
+    """
+    dtypes = {'date': str, 'symbol': 'category', 'volume': 'float64'}
+    dtypes.update({column: price_dtype for column in PRICE_COLUMNS})
+
+    # The line count bounds the number of rows (it includes the header)
+    capacity = _count_lines(path)
+    rows = 0
+    dates = codes = prices = volume = None
+    symbol_codes = {}
+    for chunk in pd.read_csv(path, usecols=COLUMNS, dtype=dtypes, chunksize=chunksize):
+        # to_datetime caches repeated strings, so each distinct date parses once
+        chunk_dates = pd.to_datetime(chunk['date']).values
+        if dates is None:
+            dates = np.empty(capacity, dtype=chunk_dates.dtype)
+            codes = np.empty(capacity, dtype=np.int32)
+            # One block with a row per price column, which the frame uses as is
+            prices = np.empty((len(PRICE_COLUMNS), capacity), dtype=price_dtype)
+            volume = np.empty(capacity, dtype=np.int64)
+        stop = rows + len(chunk)
+        dates[rows:stop] = chunk_dates
+
+        # Chunks see different sets of symbols; number them across the file
+        chunk_symbols = chunk['symbol'].cat
+        lookup = np.array([symbol_codes.setdefault(symbol, len(symbol_codes))
+                           for symbol in chunk_symbols.categories] + [-1], dtype=np.int32)
+        codes[rows:stop] = lookup[chunk_symbols.codes.values]
+
+        for i, column in enumerate(PRICE_COLUMNS):
+            prices[i, rows:stop] = chunk[column].values
+
+        # Volume stays int64 while every bar so far has a whole-number volume
+        chunk_volume = chunk['volume'].values
+        if volume.dtype == np.int64 and not (np.isfinite(chunk_volume).all()
+                                             and (chunk_volume % 1 == 0).all()):
+            volume = volume.astype('float64')
+        volume[rows:stop] = chunk_volume
+        rows = stop
+    if dates is None:
+        return pd.DataFrame(columns=COLUMNS)
+
+    # Categories sorted by name, as union_categoricals(sort_categories=True) gives
+    names = sorted(symbol_codes)
+    sorted_codes = np.empty(len(names) + 1, dtype=np.int32)
+    sorted_codes[[symbol_codes[name] for name in names]] = np.arange(len(names), dtype=np.int32)
+    sorted_codes[-1] = -1
+    codes = sorted_codes[codes[:rows]]
+
+    # Columns are added as Series so the frame takes the arrays without copying
+    df = pd.DataFrame(prices[:, :rows].T, columns=PRICE_COLUMNS, copy=False)
+    df.insert(0, 'date', pd.Series(dates[:rows], copy=False))
+    df.insert(1, 'symbol', pd.Series(pd.Categorical.from_codes(codes, categories=names), copy=False))
+    df.insert(len(COLUMNS) - 1, 'volume', pd.Series(volume[:rows], copy=False))
+    return df
+
+def load_manifest(store_dir=STORE_DIR):
+    """Return the store manifest, or an empty one if the store doesn't exist"""
+    path = os.path.join(store_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {'symbols': {}}
+    with open(path) as f:
+        return json.load(f)
+
+def save_manifest(manifest, store_dir=STORE_DIR):
+    """Write the manifest atomically so readers never see a partial file"""
+    os.makedirs(store_dir, exist_ok=True)
+    path = os.path.join(store_dir, MANIFEST_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def write_symbol(symbol, df, store_dir=STORE_DIR):
+    """
+    Replace a symbol's stored bars with df and return its manifest entry.
+    Only the symbol's own directory is touched, so different symbols can be
+    written concurrently; the caller saves the manifest afterwards.
+    """
+    frame = to_store_frame(df)
+    directory = _symbol_dir(symbol, store_dir)
+    os.makedirs(directory, exist_ok=True)
+    for old_part in _part_files(symbol, store_dir):
+        os.remove(old_part)
+    path = os.path.join(directory, "part-00000.parquet")
+    frame.to_parquet(path, index=False)
+
+    return {
+        'dir': symbol_dir_name(symbol),
+        'rows': len(frame),
+        'min_date': frame['date'].min().strftime("%Y-%m-%d"),
+        'max_date': frame['date'].max().strftime("%Y-%m-%d"),
+        'updated_at': datetime.now().isoformat(),
+    }
+
+def rebuild_symbol(symbol, df, entry=None, store_dir=STORE_DIR):
+    """
+    Rewrite a symbol's stored bars from the master data in df, keeping the
+    stored bars dated after df's last bar (appended by ingest) so a rebuild
+    doesn't lose them. Returns the symbol's manifest entry.
+    """
+    if entry is not None and pd.Timestamp(entry['max_date']) > pd.Timestamp(df['date'].max()):
+        newer = read_ohlcv([symbol], start=pd.Timestamp(df['date'].max()) + pd.Timedelta(days=1),
+                           store_dir=store_dir)
+        df = pd.concat([to_store_frame(df), newer], ignore_index=True)
+    return write_symbol(symbol, df, store_dir)
+
+def _next_part_path(symbol, store_dir):
+    parts = _part_files(symbol, store_dir)
+    number = int(os.path.basename(parts[-1])[5:10]) + 1 if parts else 0
+    return os.path.join(_symbol_dir(symbol, store_dir), f"part-{number:05d}.parquet")
+
+def compact_symbol(symbol, store_dir=STORE_DIR):
+    """Merge a symbol's part files into a single file"""
+    parts = _part_files(symbol, store_dir)
+    if len(parts) <= 1:
+        return
+    frame = read_ohlcv([symbol], store_dir=store_dir)
+    merged_path = _next_part_path(symbol, store_dir)
+    frame.to_parquet(merged_path, index=False)
+    for part in parts:
+        os.remove(part)
+
+def append_symbol(symbol, df, entry=None, store_dir=STORE_DIR):
+    """
+    Append the bars of df dated after the symbol's high-water mark (from its
+    manifest entry) as a new part file. Returns the updated manifest entry,
+    or None if df has no new bars.
+    """
+    frame = to_store_frame(df)
+    if entry is not None:
+        frame = frame[frame['date'] > pd.Timestamp(entry['max_date'])]
+    if frame.empty:
+        return None
+
+    os.makedirs(_symbol_dir(symbol, store_dir), exist_ok=True)
+    frame.to_parquet(_next_part_path(symbol, store_dir), index=False)
+    if len(_part_files(symbol, store_dir)) > MAX_PARTS:
+        compact_symbol(symbol, store_dir)
+
+    return {
+        'dir': symbol_dir_name(symbol),
+        'rows': len(frame) + (entry['rows'] if entry else 0),
+        'min_date': entry['min_date'] if entry else frame['date'].min().strftime("%Y-%m-%d"),
+        'max_date': frame['date'].max().strftime("%Y-%m-%d"),
+        'updated_at': datetime.now().isoformat(),
+    }
+
+def dedupe_bars(df):
+    """Keep one bar per (symbol, date), the last one in the drop"""
+    df = df.dropna(subset=['symbol', 'date'])
+    df = df.assign(date=pd.to_datetime(df['date']))
+    return df.drop_duplicates(subset=['symbol', 'date'], keep='last')
+
+def ingest(df, store_dir=STORE_DIR, executor=None):
+    """
+    Append a daily drop to the store and return {symbol: new bar count}.
+    Only bars after each symbol's high-water mark are stored; bars at or
+    before it (repeats of earlier drops) are ignored. Symbols are appended
+    on the executor if one is given.
+    """
+    drop = dedupe_bars(df)
+    manifest = load_manifest(store_dir)
+    stored = manifest['symbols']
+
+    jobs = {}
+    for symbol, symbol_data in drop.groupby('symbol', sort=True):
+        args = (symbol, symbol_data, stored.get(symbol), store_dir)
+        jobs[symbol] = executor.submit(append_symbol, *args) if executor else append_symbol(*args)
+
+    new_bars = {}
+    for symbol, job in jobs.items():
+        entry = job.result() if executor else job
+        if entry is None:
+            continue
+        new_bars[symbol] = entry['rows'] - (stored[symbol]['rows'] if symbol in stored else 0)
+        stored[symbol] = entry
+
+    manifest['last_ingest'] = {
+        'ingested_at': datetime.now().isoformat(),
+        'symbols': sorted(new_bars),
+    }
+    save_manifest(manifest, store_dir)
+    return new_bars
+
+def updated_symbols(since=None, store_dir=STORE_DIR):
+    """
+    Return the symbols that received new bars: in the last ingest, or at
+    or after since (a datetime or ISO timestamp) if given
+    """
+    manifest = load_manifest(store_dir)
+    if since is None:
+        return manifest.get('last_ingest', {}).get('symbols', [])
+    if isinstance(since, datetime):
+        since = since.isoformat()
+    return sorted(symbol for symbol, entry in manifest['symbols'].items()
+                  if entry['updated_at'] >= since)
+
+def list_symbols(store_dir=STORE_DIR):
+    """Return the stored symbols in sorted order"""
+    return sorted(load_manifest(store_dir)['symbols'])
+
+def read_ohlcv(symbols=None, start=None, end=None, columns=None, store_dir=STORE_DIR):
+    """
+    Load bars from the store as one DataFrame, ordered by symbol (in the
+    order given) and then by date.
+
+    symbols: list of symbols to read (default: every stored symbol)
+    start, end: inclusive date bounds (anything pd.Timestamp accepts)
+    columns: columns to load (default: all of COLUMNS)
+    """
+    import pyarrow.dataset as ds
+
+    if symbols is None:
+        symbols = list_symbols(store_dir)
+    files = [path for symbol in symbols for path in _part_files(symbol, store_dir)]
+    if not files:
+        return pd.DataFrame(columns=columns or COLUMNS)
+
+    condition = None
+    if start is not None:
+        condition = ds.field('date') >= pd.Timestamp(start)
+    if end is not None:
+        upper = ds.field('date') <= pd.Timestamp(end)
+        condition = upper if condition is None else condition & upper
+
+    table = ds.dataset(files, format='parquet').to_table(columns=columns, filter=condition)
+    return table.to_pandas()
+
+def iter_symbols(symbols=None, start=None, end=None, columns=None, store_dir=STORE_DIR):
+    """Yield (symbol, DataFrame) for each symbol, reading one symbol at a time"""
+    if symbols is None:
+        symbols = list_symbols(store_dir)
+    for symbol in symbols:
+        yield symbol, read_ohlcv([symbol], start, end, columns, store_dir)
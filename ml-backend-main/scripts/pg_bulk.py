@@ -0,0 +1,105 @@
+"""
+Bulk write helpers for Postgres
+
+Rows are streamed into a temporary staging table with COPY FROM STDIN and
+then merged into the target table with one INSERT ... SELECT ... ON
+CONFLICT statement, instead of one INSERT per row. Staging tables are
+created ON COMMIT DROP, so everything happens inside the caller's
+transaction and the caller commits or rolls back as usual.
+"""
+
+import csv
+import io
+import logging
+
+logger = logging.getLogger(__name__)
+
+def create_staging_table(cursor, staging_table, target_table, columns, extra_columns=None):
+    """
+    Create a temporary table with the target's types for the given columns
+    only (no constraints, defaults or indexes, so staged rows never draw
+    from the target's serial sequences) that is dropped at the end of the
+    transaction
+    """
+    cursor.execute(f"""
+        CREATE TEMP TABLE {staging_table} ON COMMIT DROP AS
+        SELECT {', '.join(columns)} FROM {target_table} WITH NO DATA
+    """)
+    for column in extra_columns or []:
+        cursor.execute(f"ALTER TABLE {staging_table} ADD COLUMN {column}")
+
+def copy_rows(cursor, table, columns, rows):
+    """COPY an iterable of row tuples into table; None values are loaded as NULL"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+        buffer
+    )
+    return count
+
+def copy_csv_file(cursor, table, columns, file, force_null=()):
+    """COPY a CSV file object with a header row into table"""
+    options = "FORMAT csv, HEADER true"
+    if force_null:
+        options += f", FORCE_NULL ({', '.join(force_null)})"
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH ({options})", file)
+
+def merge_from_staging(cursor, staging_table, target_table, columns, key_columns, order_column=None):
+    """
+    Upsert the staging rows into the target on key_columns and return the
+    number of rows inserted or changed. Rows whose values are unchanged are
+    left alone. If the staging table can hold several rows per key, the one
+    with the highest order_column wins.
+    """
+    column_list = ", ".join(columns)
+    keys = ", ".join(key_columns)
+    value_columns = [column for column in columns if column not in key_columns]
+    updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in value_columns)
+    current = ", ".join(f"{target_table}.{column}" for column in value_columns)
+    incoming = ", ".join(f"EXCLUDED.{column}" for column in value_columns)
+
+    if order_column:
+        source = (f"SELECT DISTINCT ON ({keys}) {column_list} FROM {staging_table} "
+                  f"ORDER BY {keys}, {order_column} DESC")
+    else:
+        source = f"SELECT {column_list} FROM {staging_table}"
+
+    cursor.execute(f"""
+        INSERT INTO {target_table} ({column_list})
+        {source}
+        ON CONFLICT ({keys}) DO UPDATE SET {updates}
+        WHERE ({current}) IS DISTINCT FROM ({incoming})
+    """)
+    return cursor.rowcount
+
+def secondary_indexes(cursor, table):
+    """Return (name, definition) of the table's indexes that don't back a constraint"""
+    cursor.execute("""
+        SELECT i.indexname, i.indexdef
+        FROM pg_indexes i
+        WHERE i.schemaname = current_schema() AND i.tablename = %s
+          AND NOT EXISTS (
+              SELECT 1 FROM pg_constraint c
+              WHERE c.conname = i.indexname AND c.conrelid = %s::regclass
+          )
+        ORDER BY i.indexname
+    """, (table, table))
+    return cursor.fetchall()
+
+def drop_indexes(cursor, indexes):
+    """Drop indexes returned by secondary_indexes so a large load skips their upkeep"""
+    for name, _ in indexes:
+        logger.info(f"Dropping index {name} until the load finishes")
+        cursor.execute(f"DROP INDEX {name}")
+
+def create_indexes(cursor, indexes):
+    """Rebuild indexes dropped by drop_indexes"""
+    for name, definition in indexes:
+        logger.info(f"Rebuilding index {name}")
+        cursor.execute(definition)
@@ -0,0 +1,47 @@
+"""
+Row and symbol counters reported by pipeline stages
+
+Stage scripts call count() as they read rows, write rows and finish symbols.
+When a stage runs as a subprocess of run_production.py the counters are
+written to the file named by PIPELINE_METRICS_FILE on exit; when it runs
+in-process, run_production.py reads them directly with snapshot().
+"""
+
+import atexit
+import json
+import os
+
+METRICS_FILE_ENV = 'PIPELINE_METRICS_FILE'
+
+_counters = {
+    'rows_read': 0,
+    'rows_written': 0,
+    'symbols_processed': 0
+}
+
+def count(rows_read=0, rows_written=0, symbols_processed=0):
+    """Add to the current stage's counters"""
+    _counters['rows_read'] += int(rows_read)
+    _counters['rows_written'] += int(rows_written)
+    _counters['symbols_processed'] += int(symbols_processed)
+
+def reset():
+    """Zero the counters before a stage starts"""
+    for name in _counters:
+        _counters[name] = 0
+
+def snapshot():
+    """Return a copy of the current counters"""
+    return dict(_counters)
+
+def _write_metrics_file():
+    metrics_file = os.getenv(METRICS_FILE_ENV)
+    if not metrics_file:
+        return
+    try:
+        with open(metrics_file, 'w') as f:
+            json.dump(_counters, f)
+    except OSError:
+        pass
+
+atexit.register(_write_metrics_file)
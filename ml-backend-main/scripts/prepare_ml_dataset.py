@@ -11,6 +11,8 @@ import psycopg2
 from psycopg2.extras import execute_values
 import warnings
 from dotenv import load_dotenv
+import pipeline_metrics
+import ohlcv_store
 
 # Load environment variables
 load_dotenv()
@@ -31,40 +33,48 @@ def get_db_connection():
 
 def get_data_directory():
     """Get the absolute path to the data directory."""
-    # Get the absolute path to the backend directory
-    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    # Return the path to the all-data directory
-    return os.path.join(backend_dir, 'all-data')
+    # The per-symbol daily data store lives in the all-data directory
+    return ohlcv_store.STORE_DIR
 
-def load_and_prepare_data(data_dir=None):
-    """Load all CSV files and prepare the dataset with technical indicators."""
+def load_and_prepare_data(data_dir=None, daily_df=None):
+    """Load every symbol's daily data and prepare the dataset with technical indicators."""
     all_data = []
     skipped_files = []
     
-    # Use the correct data directory path
-    if data_dir is None:
-        data_dir = get_data_directory()
-    
-    print(f"Looking for CSV files in: {data_dir}")
-    
-    # Get all CSV files
-    csv_files = list(Path(data_dir).glob('*_daily_data_*.csv'))
-    
-    if not csv_files:
-        warnings.warn(f"No CSV files found in {data_dir} directory")
-        return None
-    
-    print(f"Found {len(csv_files)} CSV files")
+    if daily_df is not None:
+        # Reuse the already loaded master data instead of the per-symbol files
+        sources = list(daily_df.groupby('symbol', sort=True, observed=True))
+        print(f"Preparing {len(sources)} symbols from loaded daily data")
+    else:
+        # Use the correct data directory path
+        if data_dir is None:
+            data_dir = get_data_directory()
+        
+        print(f"Looking for stored daily data in: {data_dir}")
+        
+        # Get all stored symbols; each one is read when it is prepared
+        symbols = ohlcv_store.list_symbols(data_dir)
+        
+        if not symbols:
+            warnings.warn(f"No symbols found in {data_dir} directory")
+            return None
+        
+        print(f"Found {len(symbols)} symbols")
+        sources = [(symbol, None) for symbol in symbols]
     
-    for file_path in csv_files:
+    for source_name, source in sources:
         try:
-            # Read CSV file
-            df = pd.read_csv(file_path)
+            if isinstance(source, pd.DataFrame):
+                df = source.reset_index(drop=True)
+            else:
+                # Read the symbol from the store
+                df = ohlcv_store.read_ohlcv([source_name], store_dir=data_dir)
+            pipeline_metrics.count(rows_read=len(df))
             
             # Check if file has enough data points
             if len(df) < MIN_DATA_POINTS:
-                warnings.warn(f"Insufficient data points in {file_path.name}: {len(df)} points (minimum {MIN_DATA_POINTS} required)")
-                skipped_files.append((file_path.name, "insufficient_data_points"))
+                warnings.warn(f"Insufficient data points in {source_name}: {len(df)} points (minimum {MIN_DATA_POINTS} required)")
+                skipped_files.append((source_name, "insufficient_data_points"))
                 continue
             
             # Convert date to datetime
@@ -73,8 +83,8 @@ def load_and_prepare_data(data_dir=None):
             # Check if data spans enough days
             date_range = (df['date'].max() - df['date'].min()).days
             if date_range < MIN_DAYS:
-                warnings.warn(f"Insufficient date range in {file_path.name}: {date_range} days (minimum {MIN_DAYS} days required)")
-                skipped_files.append((file_path.name, "insufficient_date_range"))
+                warnings.warn(f"Insufficient date range in {source_name}: {date_range} days (minimum {MIN_DAYS} days required)")
+                skipped_files.append((source_name, "insufficient_date_range"))
                 continue
             
             # Sort by date
@@ -82,7 +92,7 @@ def load_and_prepare_data(data_dir=None):
             
             # Add symbol column if not present and format it
             if 'symbol' not in df.columns:
-                symbol = file_path.stem.split('_')[0]
+                symbol = Path(source_name).stem.split('_')[0]
                 # Remove any non-alphanumeric characters and convert to uppercase
                 symbol = ''.join(c for c in symbol if c.isalnum()).upper()
                 df['symbol'] = symbol
@@ -91,8 +101,8 @@ def load_and_prepare_data(data_dir=None):
             essential_columns = ['open', 'high', 'low', 'close', 'volume']
             missing_values = df[essential_columns].isnull().sum()
             if missing_values.any():
-                warnings.warn(f"Missing values found in {file_path.name}:\n{missing_values[missing_values > 0]}")
-                skipped_files.append((file_path.name, "missing_values"))
+                warnings.warn(f"Missing values found in {source_name}:\n{missing_values[missing_values > 0]}")
+                skipped_files.append((source_name, "missing_values"))
                 continue
             
             # Calculate technical indicators
@@ -201,16 +211,17 @@ def load_and_prepare_data(data_dir=None):
             
             # Check if enough data remains after technical indicator calculations
             if len(df) < MIN_DATA_POINTS:
-                warnings.warn(f"Insufficient data points after technical calculations in {file_path.name}: {len(df)} points (minimum {MIN_DATA_POINTS} required)")
-                skipped_files.append((file_path.name, "insufficient_data_after_calculations"))
+                warnings.warn(f"Insufficient data points after technical calculations in {source_name}: {len(df)} points (minimum {MIN_DATA_POINTS} required)")
+                skipped_files.append((source_name, "insufficient_data_after_calculations"))
                 continue
             
             all_data.append(df)
-            print(f"Successfully processed {file_path.name}")
+            pipeline_metrics.count(symbols_processed=1)
+            print(f"Successfully processed {source_name}")
             
         except Exception as e:
-            warnings.warn(f"Error processing {file_path}: {str(e)}")
-            skipped_files.append((file_path.name, str(e)))
+            warnings.warn(f"Error processing {source_name}: {str(e)}")
+            skipped_files.append((source_name, str(e)))
             continue
     
     # Print summary of skipped files
@@ -229,13 +240,15 @@ def load_and_prepare_data(data_dir=None):
         warnings.warn("No data was successfully processed")
         return None
 
-def save_to_database(df):
+def save_to_database(df, conn=None):
     """Save the prepared dataset to the signal_history_analytics table."""
     if df is None:
         print("No data to save")
         return
     
-    conn = get_db_connection()
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
@@ -322,6 +335,7 @@ def save_to_database(df):
         """
         
         execute_values(cursor, insert_query, values)
+        pipeline_metrics.count(rows_written=len(values))
         
         # Get count of records
         cursor.execute("SELECT COUNT(*) FROM signal_history_analytics")
@@ -336,11 +350,16 @@ def save_to_database(df):
         raise
     finally:
         cursor.close()
-        conn.close()
+        if own_conn:
+            conn.close()
 
-if __name__ == "__main__":
+def main(conn=None, daily_df=None):
+    """Prepare the ML dataset and save it to the database."""
     # Prepare the dataset
-    df = load_and_prepare_data()
+    df = load_and_prepare_data(daily_df=daily_df)
     
     # Save to database
-    save_to_database(df) 
\ No newline at end of file
+    save_to_database(df, conn)
+
+if __name__ == "__main__":
+    main() 
\ No newline at end of file
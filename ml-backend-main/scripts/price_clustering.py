@@ -0,0 +1,123 @@
+"""
+Density clustering of a single price column
+
+cluster_prices() gives the same labels as
+sklearn.cluster.DBSCAN(eps, min_samples).fit(values.reshape(-1, 1)).labels_
+but works on the sorted values with NumPy instead of building a neighbour
+index: in one dimension a point's eps-neighbourhood is a contiguous run of
+the sorted values, and core points belong to the same cluster exactly when
+the gaps between consecutive core points are all within eps.
+
+Labels follow DBSCAN's numbering: clusters are numbered in the order of
+their first core point in the input, and a border point within eps of two
+clusters takes the lower-numbered one. Noise is -1.
+
+Distances are compared the way sklearn's kd_tree and ball_tree searches
+compare them. Its brute-force search (which algorithm='auto' picks for
+small inputs) rounds differently, so the two can only disagree on a pair
+of prices exactly eps apart, which the eps = 0.2 * std rule doesn't hit
+in practice.
+"""
+
+import numpy as np
+
+def _within(xs, i, j, eps_squared):
+    # DBSCAN's neighbour search compares squared distances
+    return (xs[j] - xs[i]) ** 2 <= eps_squared
+
+def _neighbourhood_bounds(xs, eps, eps_squared):
+    """For each sorted value, the [start, stop) range of values within eps of it"""
+    n = len(xs)
+    positions = np.arange(n)
+    start = np.searchsorted(xs, xs - eps, side='left')
+    stop = np.searchsorted(xs, xs + eps, side='right')
+
+    # xs - eps and xs + eps are rounded, so move the bounds onto the exact test
+    while True:
+        grow = (start > 0) & _within(xs, positions, np.maximum(start - 1, 0), eps_squared)
+        shrink = (start < positions) & ~_within(xs, positions, start, eps_squared)
+        if not (grow.any() or shrink.any()):
+            break
+        start = start - grow + shrink
+    while True:
+        grow = (stop < n) & _within(xs, positions, np.minimum(stop, n - 1), eps_squared)
+        shrink = (stop > positions + 1) & ~_within(xs, positions, stop - 1, eps_squared)
+        if not (grow.any() or shrink.any()):
+            break
+        stop = stop + grow - shrink
+    return start, stop
+
+def cluster_prices(values, eps, min_samples=2):
+    """
+    Cluster 1-D values like DBSCAN(eps=eps, min_samples=min_samples) and
+    return an int array of labels in the input order (-1 for noise)
+    """
+    if not eps > 0:
+        raise ValueError(f"eps must be greater than 0, got {eps}")
+
+    x = np.asarray(values, dtype=np.float64).ravel()
+    n = len(x)
+    labels = np.full(n, -1, dtype=np.int64)
+    if n == 0:
+        return labels
+
+    order = np.argsort(x, kind='stable')
+    xs = x[order]
+    eps_squared = eps ** 2
+
+    # Core points have min_samples values (themselves included) within eps
+    start, stop = _neighbourhood_bounds(xs, eps, eps_squared)
+    core_positions = np.flatnonzero(stop - start >= min_samples)
+    if len(core_positions) == 0:
+        return labels
+
+    # Consecutive core points further apart than eps start a new cluster
+    gaps_within = _within(xs, core_positions[:-1], core_positions[1:], eps_squared)
+    cluster_of_core = np.concatenate(([0], np.cumsum(~gaps_within)))
+    cluster_starts = np.flatnonzero(np.concatenate(([True], ~gaps_within)))
+
+    # Number clusters by their first core point in the input order
+    first_index = np.minimum.reduceat(order[core_positions], cluster_starts)
+    cluster_label = np.empty(len(cluster_starts), dtype=np.int64)
+    cluster_label[np.argsort(first_index)] = np.arange(len(cluster_starts))
+
+    sorted_labels = np.full(n, -1, dtype=np.int64)
+    sorted_labels[core_positions] = cluster_label[cluster_of_core]
+
+    # Border points join the lower-numbered neighbouring cluster; only the
+    # nearest core point on each side can be within eps
+    border = np.flatnonzero(sorted_labels == -1)
+    after = np.searchsorted(core_positions, border)
+    left_core = core_positions[np.maximum(after - 1, 0)]
+    right_core = core_positions[np.minimum(after, len(core_positions) - 1)]
+    left_ok = (after > 0) & _within(xs, border, left_core, eps_squared)
+    right_ok = (after < len(core_positions)) & _within(xs, border, right_core, eps_squared)
+
+    no_cluster = np.iinfo(np.int64).max
+    left_label = np.where(left_ok, sorted_labels[left_core], no_cluster)
+    right_label = np.where(right_ok, sorted_labels[right_core], no_cluster)
+    border_label = np.minimum(left_label, right_label)
+    sorted_labels[border] = np.where(border_label == no_cluster, -1, border_label)
+
+    labels[order] = sorted_labels
+    return labels
+
+def independent_groups(values, eps):
+    """
+    Split 1-D values into groups that cluster_prices() clusters
+    independently: a cluster never spans a gap between consecutive sorted
+    values further apart than eps, so clustering each group on its own
+    with the same eps gives the same clusters. With min_samples=2 every
+    value in a group of two or more has a neighbour within eps, so the
+    group is exactly one cluster (and a group of one is noise). Returns one
+    index array per group, in sorted order of the values, each in input
+    order.
+    """
+    x = np.asarray(values, dtype=np.float64).ravel()
+    if len(x) == 0:
+        return []
+    order = np.argsort(x, kind='stable')
+    xs = x[order]
+    positions = np.arange(len(xs) - 1)
+    splits = np.flatnonzero(~_within(xs, positions, positions + 1, eps ** 2)) + 1
+    return [np.sort(group) for group in np.split(order, splits)]
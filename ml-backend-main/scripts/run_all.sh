@@ -3,13 +3,14 @@
 # Analysis Pipeline Script
 # This script runs all the data processing and analysis scripts in sequence:
 # 1. generate_daily_data.py - Fetches and processes daily stock data
-# 2. generate_zones.py - Identifies support and resistance zones
-# 3. generate_trendline.py - Generates trendlines for technical analysis
-# 4. generate_trading_zone.py - Creates trading zones based on technical indicators
-# 5. generate_signals.py - Generates trading signals
-# 6. generate_ai_signals.py - Generates AI-powered trading signals
-# 7. prepare_ml_dataset.py - Prepares machine learning datasets
-# 8. update_trading_signals.py - Updates trading signals with latest data
+# 2. load_daily_data.py - Bulk loads the daily data into the daily_data table
+# 3. generate_zones.py - Identifies support and resistance zones
+# 4. generate_trendline.py - Generates trendlines for technical analysis
+# 5. generate_trading_zone.py - Creates trading zones based on technical indicators
+# 6. generate_signals.py - Generates trading signals
+# 7. generate_ai_signals.py - Generates AI-powered trading signals
+# 8. prepare_ml_dataset.py - Prepares machine learning datasets
+# 9. update_trading_signals.py - Updates trading signals with latest data
 
 # Set up logging
 LOG_FILE="script_execution.log"
@@ -57,25 +58,28 @@ echo "Starting analysis pipeline..." | tee -a $LOG_FILE
 # 1. Generate daily data
 run_script "generate_daily_data.py"
 
-# 2. Generate zones
+# 2. Bulk load daily data into the database
+run_script "load_daily_data.py"
+
+# 3. Generate zones
 run_script "generate_zones.py"
 
-# 3. Generate trendlines
+# 4. Generate trendlines
 run_script "generate_trendline.py"
 
-# 4. Generate trading zones
+# 5. Generate trading zones
 run_script "generate_trading_zone.py"
 
-# 5. Generate signals
+# 6. Generate signals
 run_script "generate_signals.py"
 
-# 6. Generate AI signals
+# 7. Generate AI signals
 # run_script "generate_ai_signals.py"
 
-# 7. Prepare ML dataset
+# 8. Prepare ML dataset
 run_script "prepare_ml_dataset.py"
 
-# 8. Update Trading Signals
+# 9. Update Trading Signals
 run_script "update_trading_signals.py"
 
 echo "Analysis pipeline completed at $(date)" | tee -a $LOG_FILE 
\ No newline at end of file
@@ -1,16 +1,28 @@
 #!/usr/bin/env python3
 """
 Production Analysis Pipeline Script
-This script runs all the data processing and analysis scripts in sequence
-without requiring a virtual environment - uses system Python directly
+This script runs all the data processing and analysis scripts as a dependency
+graph of stages, running independent stages in parallel, without requiring a
+virtual environment - uses system Python directly
 """
 
 import os
 import sys
+import argparse
+import hashlib
+import json
 import subprocess
 import logging
+import resource
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
 import importlib.util
+import inspect
+import ast
+import pipeline_metrics
 
 # Set up logging
 logging.basicConfig(
@@ -23,11 +35,102 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Master daily data file shared by the stages that read the raw snapshot
+DAILY_DATA_FILE = "data/daily_data_202507172305.csv"
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(SCRIPTS_DIR)
+
+# Per-stage fingerprints and run ids from previous runs
+STATE_DIR = os.path.join(BASE_DIR, "pipeline-state")
+STAGE_STATE_FILE = os.path.join(STATE_DIR, "stage_state.json")
+
+# Latest run report and the history of every run report
+RUN_REPORT_FILE = os.path.join(STATE_DIR, "run_report.json")
+RUN_HISTORY_FILE = os.path.join(STATE_DIR, "run_history.jsonl")
+
+# Artifacts that live on disk (relative to the backend directory); every
+# other artifact name is a database table
+PATH_ARTIFACTS = {DAILY_DATA_FILE, 'all-data'}
+
+# Manifest of the per-symbol daily data store in all-data (see ohlcv_store.py)
+STORE_MANIFEST = "_manifest.json"
+
+# Pipeline stages in their historical run order. Each stage declares the
+# files/tables it reads and writes; a stage waits for every earlier stage that
+# writes one of its inputs, or one of its own outputs so that two stages
+# rewriting the same table keep their original order. Sharded stages accept
+# --workers to split their symbols across processes and --resume to continue
+# from their per-symbol checkpoints.
+STAGES = [
+    {
+        'name': 'daily_data',
+        'script': 'generate_daily_data.py',
+        'inputs': [DAILY_DATA_FILE],
+        # Rebuilt in place: symbols are rewritten from the master file and
+        # bars ingested after it (generate_daily_data.py --ingest) are kept
+        'outputs': ['all-data'],
+    },
+    {
+        'name': 'load_daily_data',
+        'script': 'load_daily_data.py',
+        'inputs': [DAILY_DATA_FILE],
+        'outputs': ['daily_data'],
+    },
+    {
+        'name': 'zones',
+        'script': 'generate_zones.py',
+        'inputs': ['all-data'],
+        'outputs': ['support_zones', 'resistance_zones'],
+        'sharded': True,
+    },
+    {
+        'name': 'trendlines',
+        'script': 'generate_trendline.py',
+        'inputs': ['all-data'],
+        'outputs': ['trendlines'],
+        'sharded': True,
+    },
+    {
+        'name': 'trading_zones',
+        'script': 'generate_trading_zone.py',
+        'inputs': ['symbols', 'daily_data', 'support_zones', 'resistance_zones'],
+        'outputs': ['trading_zones'],
+        'sharded': True,
+    },
+    {
+        'name': 'signals',
+        'script': 'generate_signals.py',
+        'inputs': ['symbols', 'daily_data', 'trading_zones', 'trendlines'],
+        'outputs': ['trading_signals'],
+        'sharded': True,
+    },
+    # {
+    #     'name': 'ai_signals',
+    #     'script': 'generate_ai_signals.py',
+    #     'inputs': ['symbols', 'daily_data', 'support_zones', 'resistance_zones', 'trendlines'],
+    #     'outputs': ['ai_trading_signals_new', 'ai_signal_history'],
+    #     'sharded': True,
+    # },  # Commented out by default
+    {
+        'name': 'ml_dataset',
+        'script': 'prepare_ml_dataset.py',
+        'inputs': ['all-data'],
+        'outputs': ['signal_history_analytics'],
+    },
+    {
+        'name': 'update_signals',
+        'script': 'update_trading_signals.py',
+        'inputs': ['signal_history_analytics'],
+        'outputs': ['trading_signals'],
+    },
+]
+
 def check_and_install_packages():
     """Check and install required packages"""
     required_packages = [
         'pandas', 'numpy', 'requests', 'sqlalchemy', 'psycopg2-binary',
-        'scikit-learn', 'matplotlib', 'seaborn', 'yfinance', 'ta'
+        'scikit-learn', 'matplotlib', 'seaborn', 'yfinance', 'ta', 'pyarrow'
     ]
     
     missing_packages = []
@@ -52,32 +155,492 @@ def check_and_install_packages():
     
     return True
 
-def run_script(script_name):
-    """Run a Python script and log its execution"""
+def new_stage_stats():
+    """Return an empty per-stage measurement record"""
+    stats = {
+        'ok': False,
+        'wall_time_s': 0.0,
+        'cpu_time_s': 0.0,
+        'peak_rss_mb': 0.0,
+    }
+    stats.update({name: 0 for name in pipeline_metrics.snapshot()})
+    return stats
+
+def read_metrics_file(metrics_file):
+    """Read the counters a stage subprocess wrote on exit"""
+    try:
+        with open(metrics_file) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def run_script(script_name, script_args=()):
+    """
+    Run a Python script with the given arguments and log its execution.
+    Returns the stage's measurements: wall/CPU time and peak RSS of the
+    child process, plus the row and symbol counters the script reported
+    through pipeline_metrics.
+    """
     logger.info(f"Running {script_name} at {datetime.now()}")
+    stats = new_stage_stats()
+    started = time.monotonic()
     
     try:
-        # Run the script using subprocess
-        result = subprocess.run([sys.executable, script_name], 
-                              capture_output=True, text=True, check=True)
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+                tempfile.TemporaryFile('w+') as stdout, \
+                tempfile.TemporaryFile('w+') as stderr:
+            metrics_file = os.path.join(tmp_dir, 'metrics.json')
+            env = dict(os.environ, **{pipeline_metrics.METRICS_FILE_ENV: metrics_file})
+            
+            # Run the script using subprocess, reaping it with wait4 to get
+            # the resource usage of this child alone
+            process = subprocess.Popen([sys.executable, script_name, *script_args],
+                                       stdout=stdout, stderr=stderr, text=True, env=env)
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            
+            stats['wall_time_s'] = time.monotonic() - started
+            stats['cpu_time_s'] = usage.ru_utime + usage.ru_stime
+            stats['peak_rss_mb'] = usage.ru_maxrss / 1024  # ru_maxrss is in KB on Linux
+            stats.update(read_metrics_file(metrics_file))
+            
+            stdout.seek(0)
+            stderr.seek(0)
+            output = stdout.read()
+            error_output = stderr.read()
+        
+        if process.returncode != 0:
+            logger.error(f"ERROR: {script_name} failed at {datetime.now()}")
+            logger.error(f"Error output: {error_output}")
+            return stats
         
         # Log output
-        if result.stdout:
-            logger.info(f"{script_name} output: {result.stdout}")
+        if output:
+            logger.info(f"{script_name} output: {output}")
         
         logger.info(f"{script_name} completed successfully at {datetime.now()}")
-        return True
+        stats['ok'] = True
+        return stats
         
-    except subprocess.CalledProcessError as e:
-        logger.error(f"ERROR: {script_name} failed at {datetime.now()}")
-        logger.error(f"Error output: {e.stderr}")
-        return False
     except Exception as e:
         logger.error(f"ERROR: {script_name} failed with exception: {e}")
-        return False
+        stats['wall_time_s'] = time.monotonic() - started
+        return stats
+
+def get_db_connection():
+    """Create a database connection shared by in-process stages"""
+    import psycopg2
+    from dotenv import load_dotenv
+    
+    load_dotenv()
+    try:
+        conn = psycopg2.connect(
+            host=os.getenv('DB_HOST', 'localhost'),
+            port=os.getenv('DB_PORT', '5433'),
+            database=os.getenv('DB_NAME', 'stock_market'),
+            user=os.getenv('DB_USER', 'postgres'),
+            password=os.getenv('DB_PASSWORD', 'postgres')
+        )
+        logger.info("Successfully connected to database")
+        return conn
+    except Exception as e:
+        logger.error(f"Error connecting to database: {e}")
+        raise
+
+def load_daily_data():
+    """Load the master daily data file once for all in-process stages"""
+    from ohlcv_store import load_daily_csv
+    
+    data_file = os.path.join(BASE_DIR, DAILY_DATA_FILE)
+    logger.info(f"Loading shared daily data from {data_file}")
+    df = load_daily_csv(data_file)
+    logger.info(f"Loaded {len(df)} rows for {df['symbol'].nunique()} symbols")
+    return df
+
+def load_store_data():
+    """Load every symbol in the daily data store once for the in-process stages that read it"""
+    import ohlcv_store
+    
+    logger.info(f"Loading shared daily data from the store in {ohlcv_store.STORE_DIR}")
+    df = ohlcv_store.read_ohlcv()
+    logger.info(f"Loaded {len(df)} rows for {df['symbol'].nunique()} symbols")
+    return df
+
+def load_stage_module(script_name):
+    """Import a stage script as a module, reusing it if already imported"""
+    module_name = os.path.splitext(script_name)[0]
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    
+    spec = importlib.util.spec_from_file_location(module_name,
+                                                  os.path.join(SCRIPTS_DIR, script_name))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+def run_stage_in_process(stage, shared):
+    """
+    Run a stage's main() inside this interpreter, passing it whichever of the
+    shared resources (daily_df, conn, workers, resume) its signature accepts. Returns the same
+    measurements as run_script; peak RSS is the interpreter's peak so far.
+    A stage that reads the all-data store gets the store's bars (store_df)
+    as its daily_df, the others the master file's.
+    """
+    script_name = stage['script']
+    logger.info(f"Running {script_name} in-process at {datetime.now()}")
+    stats = new_stage_stats()
+    started = time.monotonic()
+    cpu_started = time.process_time()
+    pipeline_metrics.reset()
+    
+    try:
+        entry = load_stage_module(script_name).main
+        accepted = inspect.signature(entry).parameters
+        sources = {name: name for name in shared if name != 'store_df'}
+        if 'all-data' in stage['inputs']:
+            sources['daily_df'] = 'store_df'
+        for name, source in sources.items():
+            # Resources given as loader functions are loaded on first use
+            if name in accepted and callable(shared[source]):
+                shared[source] = shared[source]()
+        entry(**{name: shared[source] for name, source in sources.items() if name in accepted})
+        logger.info(f"{script_name} completed successfully at {datetime.now()}")
+        stats['ok'] = True
+    except Exception as e:
+        logger.error(f"ERROR: {script_name} failed with exception: {e}")
+    finally:
+        stats['wall_time_s'] = time.monotonic() - started
+        stats['cpu_time_s'] = time.process_time() - cpu_started
+        stats['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        stats.update(pipeline_metrics.snapshot())
+
+        # Stages commit their own work; clear any transaction a stage left
+        # open or aborted so the next stage starts from a clean connection
+        conn = shared.get('conn')
+        if conn is not None and not conn.closed:
+            conn.rollback()
+    return stats
+
+def hash_file(path):
+    """Return the SHA-256 hex digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def local_imports(script_name):
+    """
+    Return the stage script and every module in SCRIPTS_DIR it imports,
+    directly or through other local modules, as sorted file names
+    """
+    found = set()
+    pending = [script_name]
+    while pending:
+        name = pending.pop()
+        if name in found:
+            continue
+        found.add(name)
+        with open(os.path.join(SCRIPTS_DIR, name)) as f:
+            tree = ast.parse(f.read(), filename=name)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                modules = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                modules = [node.module]
+            else:
+                continue
+            for module in modules:
+                file_name = f"{module.split('.')[0]}.py"
+                if os.path.isfile(os.path.join(SCRIPTS_DIR, file_name)):
+                    pending.append(file_name)
+    return sorted(found)
+
+def hash_rows(rows):
+    """Return a SHA-256 hex digest of query result rows"""
+    return hashlib.sha256(repr(rows).encode('utf-8')).hexdigest()
+
+def fingerprint_table(conn, table):
+    """
+    Fingerprint a source table that no stage produces. daily_data is
+    summarised by its latest date and row count per symbol.
+    """
+    queries = {
+        'daily_data': "SELECT symbol, MAX(date), COUNT(*) FROM daily_data "
+                      "GROUP BY symbol ORDER BY symbol",
+        'symbols': "SELECT symbol FROM symbols ORDER BY symbol",
+    }
+    if table not in queries:
+        return None
+    
+    cursor = conn.cursor()
+    try:
+        cursor.execute(queries[table])
+        return hash_rows(cursor.fetchall())
+    finally:
+        cursor.close()
+        # Don't hold the read transaction (and its table locks) open
+        conn.rollback()
+
+class StageCache:
+    """
+    Records a fingerprint of each stage's inputs and skips stages whose
+    inputs are unchanged since their last successful run.
+    
+    A stage's fingerprint covers its own script and the local helper modules
+    it imports, the content hash of input files, a summary of source tables,
+    and the run id of every upstream stage that produced one of its inputs,
+    so re-running a stage invalidates everything downstream of it.
+    """
+    
+    def __init__(self, stages, state_file=STAGE_STATE_FILE, force=False, get_conn=None):
+        self.state_file = state_file
+        self.force = force
+        self.get_conn = get_conn
+        self.producers = {}
+        for stage in stages:
+            for output in stage['outputs']:
+                self.producers[output] = stage['name']
+        self.state = self._load_state()
+        self.pending_fingerprints = {}
+    
+    def _load_state(self):
+        if not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable stage state {self.state_file}: {e}")
+            return {}
+    
+    def _save_state(self):
+        os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+        tmp_file = f"{self.state_file}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(self.state, f, indent=2, sort_keys=True)
+        os.replace(tmp_file, self.state_file)
+    
+    def _fingerprint_input(self, stage, name):
+        producer = self.producers.get(name)
+        if producer is not None and producer != stage['name']:
+            run_id = self.state.get(producer, {}).get('run_id')
+            # Daily ingests append to the store outside the pipeline, so the
+            # store's manifest is part of its fingerprint too
+            manifest = os.path.join(BASE_DIR, name, STORE_MANIFEST)
+            if run_id is not None and os.path.isfile(manifest):
+                return f"{run_id}:{hash_file(manifest)}"
+            return run_id
+        if name in PATH_ARTIFACTS:
+            path = os.path.join(BASE_DIR, name)
+            return hash_file(path) if os.path.isfile(path) else None
+        if self.get_conn is None:
+            return None
+        return fingerprint_table(self.get_conn(), name)
+    
+    def fingerprint(self, stage):
+        """Return the stage's input fingerprint, or None if it can't be determined"""
+        try:
+            parts = {f"script:{name}": hash_file(os.path.join(SCRIPTS_DIR, name))
+                     for name in local_imports(stage['script'])}
+            for name in stage['inputs']:
+                value = self._fingerprint_input(stage, name)
+                if value is None:
+                    return None
+                parts[name] = value
+        except Exception as e:
+            logger.warning(f"Could not fingerprint inputs of {stage['name']}: {e}")
+            return None
+        return hash_rows(sorted(parts.items()))
+    
+    def is_fresh(self, stage):
+        """Return True if the stage can be skipped; otherwise remember its fingerprint"""
+        fingerprint = self.fingerprint(stage)
+        self.pending_fingerprints[stage['name']] = fingerprint
+        if self.force or fingerprint is None:
+            return False
+        
+        previous = self.state.get(stage['name'], {})
+        if previous.get('fingerprint') != fingerprint:
+            return False
+        
+        # The inputs match, but the outputs must still be there to reuse
+        for output in stage['outputs']:
+            if output in PATH_ARTIFACTS and not os.path.exists(os.path.join(BASE_DIR, output)):
+                return False
+        return True
+    
+    def record(self, stage):
+        """Record a successful run of the stage under a new run id"""
+        self.state[stage['name']] = {
+            'fingerprint': self.pending_fingerprints.pop(stage['name'], None),
+            'run_id': uuid.uuid4().hex,
+            'completed_at': datetime.now().isoformat(),
+        }
+        self._save_state()
+
+def resolve_dependencies(stages):
+    """Map each stage name to the names of the earlier stages it must wait for"""
+    dependencies = {}
+    for i, stage in enumerate(stages):
+        touched = set(stage['inputs']) | set(stage['outputs'])
+        dependencies[stage['name']] = {
+            previous['name'] for previous in stages[:i]
+            if touched & set(previous['outputs'])
+        }
+    return dependencies
+
+def stage_script_args(stage, workers=1, resume=False):
+    """Command line arguments for a stage run as a subprocess"""
+    args = []
+    if stage.get('sharded') and workers > 1:
+        args += ['--workers', str(workers)]
+    if stage.get('sharded') and resume:
+        args.append('--resume')
+    return args
+
+def run_pipeline(stages, max_parallel=1, runner=None, cache=None, report=None):
+    """
+    Run the stages as a DAG, starting every stage whose dependencies have
+    completed while keeping at most max_parallel stages running at once.
+    runner is called with each stage and returns its measurements, with
+    'ok' set on success. Stages whose inputs the cache reports as unchanged
+    are skipped and count as completed. Each stage's measurements and
+    status are appended to report, if given.
+    Returns the name of the first failed stage, or None on success.
+    """
+    if runner is None:
+        runner = lambda stage: run_script(stage['script'])
+    dependencies = resolve_dependencies(stages)
+    pending = list(stages)
+    completed = set()
+    running = {}
+    failed = None
+    
+    with ThreadPoolExecutor(max_workers=max_parallel) as executor:
+        while pending or running:
+            # Start every ready stage while there is room, in declaration order
+            if failed is None:
+                for stage in list(pending):
+                    if len(running) >= max_parallel:
+                        break
+                    if dependencies[stage['name']] <= completed:
+                        pending.remove(stage)
+                        if cache is not None and cache.is_fresh(stage):
+                            logger.info(f"Skipping {stage['script']}: "
+                                        "inputs unchanged since last run")
+                            completed.add(stage['name'])
+                            if report is not None:
+                                report.append({'stage': stage['name'], 'status': 'skipped'})
+                            continue
+                        future = executor.submit(runner, stage)
+                        running[future] = stage
+            
+            if not running:
+                break
+            
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                stats = future.result()
+                if report is not None:
+                    entry = {'stage': stage['name'], 'status': 'ok' if stats['ok'] else 'failed'}
+                    entry.update({name: value for name, value in stats.items() if name != 'ok'})
+                    report.append(entry)
+                if stats['ok']:
+                    completed.add(stage['name'])
+                    if cache is not None:
+                        cache.record(stage)
+                elif failed is None:
+                    # Let stages already in flight finish, but start nothing new
+                    failed = stage['script']
+    
+    return failed
+
+def load_previous_report(history_file=RUN_HISTORY_FILE):
+    """Return the most recent run report from the history, if any"""
+    if not os.path.exists(history_file):
+        return None
+    previous = None
+    with open(history_file) as f:
+        for line in f:
+            if line.strip():
+                try:
+                    previous = json.loads(line)
+                except ValueError:
+                    continue
+    return previous
+
+def save_run_report(run_report, report_file=RUN_REPORT_FILE, history_file=RUN_HISTORY_FILE):
+    """Write the run report and append it to the run history"""
+    os.makedirs(os.path.dirname(report_file), exist_ok=True)
+    with open(report_file, 'w') as f:
+        json.dump(run_report, f, indent=2)
+    with open(history_file, 'a') as f:
+        f.write(json.dumps(run_report) + "\n")
+
+def print_run_summary(run_report, previous=None):
+    """Print a per-stage summary table, with the previous run's wall time for comparison"""
+    previous_wall = {}
+    if previous:
+        for entry in previous.get('stages', []):
+            if entry.get('status') == 'ok':
+                previous_wall[entry['stage']] = entry['wall_time_s']
+    
+    header = (f"{'Stage':<16}{'Status':<9}{'Wall s':>9}{'Prev s':>9}{'CPU s':>9}"
+              f"{'Peak MB':>9}{'Rows in':>11}{'Rows out':>11}{'Symbols':>9}")
+    print(f"\nRUN SUMMARY ({run_report['run_id']})")
+    print(header)
+    print("-" * len(header))
+    for entry in run_report['stages']:
+        if entry['status'] == 'skipped':
+            print(f"{entry['stage']:<16}{'skipped':<9}")
+            continue
+        prev = previous_wall.get(entry['stage'])
+        prev_text = f"{prev:.1f}" if prev is not None else "-"
+        print(f"{entry['stage']:<16}{entry['status']:<9}{entry['wall_time_s']:>9.1f}{prev_text:>9}"
+              f"{entry['cpu_time_s']:>9.1f}{entry['peak_rss_mb']:>9.0f}{entry['rows_read']:>11}"
+              f"{entry['rows_written']:>11}{entry['symbols_processed']:>9}")
+    print("-" * len(header))
+    print(f"Total wall time: {run_report['wall_time_s']:.1f}s")
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Run the production analysis pipeline")
+    parser.add_argument(
+        '--max-parallel', type=int,
+        default=int(os.getenv('PIPELINE_MAX_PARALLEL', '2')),
+        help="Maximum number of independent stages to run at the same time (default: 2)"
+    )
+    parser.add_argument(
+        '--in-process', action='store_true',
+        help="Import and run each stage in this interpreter, sharing the loaded "
+             "daily data and one database connection (stages run one at a time)"
+    )
+    parser.add_argument(
+        '--workers', type=int, default=1,
+        help="Worker processes each sharded stage splits its symbols across (default: 1)"
+    )
+    parser.add_argument(
+        '--force', action='store_true',
+        help="Run every stage even if its inputs are unchanged since the last run"
+    )
+    parser.add_argument(
+        '--resume', action='store_true',
+        help="Continue an interrupted run: sharded stages skip the symbols they "
+             "checkpointed before it stopped (stages that finished are skipped as unchanged)"
+    )
+    args = parser.parse_args()
+    if args.max_parallel < 1:
+        parser.error("--max-parallel must be at least 1")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    return args
 
 def main():
     """Main function to run the analysis pipeline"""
+    args = parse_args()
     logger.info("Starting production analysis pipeline")
     
     # Check Python version
@@ -89,32 +652,66 @@ def main():
         logger.error("Failed to install required packages. Exiting.")
         sys.exit(1)
     
-    # Remove the all-data directory if it exists
-    if os.path.exists("all-data"):
-        logger.info("Removing existing all-data directory...")
-        import shutil
-        shutil.rmtree("all-data")
-    
-    # Create necessary directories
-    os.makedirs("all-data", exist_ok=True)
-    
-    # List of scripts to run in sequence
-    scripts = [
-        "generate_daily_data.py",
-        "generate_zones.py", 
-        "generate_trendline.py",
-        "generate_trading_zone.py",
-        "generate_signals.py",
-        # "generate_ai_signals.py",  # Commented out by default
-        "prepare_ml_dataset.py",
-        "update_trading_signals.py"
-    ]
+    # Source tables are fingerprinted over a connection opened on first use
+    connections = []
+    def get_conn():
+        if not connections:
+            connections.append(get_db_connection())
+        return connections[0]
+    
+    cache = StageCache(STAGES, force=args.force, get_conn=get_conn)
+    stage_reports = []
+    run_started = time.monotonic()
+    run_report = {
+        'run_id': datetime.now().strftime("%Y%m%d%H%M%S"),
+        'started_at': datetime.now().isoformat(),
+        'mode': 'in-process' if args.in_process else 'subprocess',
+        'max_parallel': 1 if args.in_process else args.max_parallel,
+        'workers': args.workers,
+    }
+    
+    try:
+        if args.in_process:
+            # Stages share one connection and one frame, so run them one at a time
+            # in dependency order instead of concurrently
+            if SCRIPTS_DIR not in sys.path:
+                sys.path.insert(0, SCRIPTS_DIR)
+            # The daily data is only loaded if a stage that needs it runs
+            shared = {'daily_df': load_daily_data, 'store_df': load_store_data, 'conn': get_conn(),
+                      'workers': args.workers, 'resume': args.resume}
+            logger.info(f"Running {len(STAGES)} stages in-process")
+            failed = run_pipeline(
+                STAGES, 1, lambda stage: run_stage_in_process(stage, shared),
+                cache, stage_reports
+            )
+        else:
+            # Run independent stages concurrently, respecting stage dependencies
+            logger.info(f"Running {len(STAGES)} stages with up to {args.max_parallel} in parallel")
+            failed = run_pipeline(
+                STAGES, args.max_parallel,
+                lambda stage: run_script(stage['script'],
+                                         stage_script_args(stage, args.workers, args.resume)),
+                cache, stage_reports
+            )
+    finally:
+        for conn in connections:
+            conn.close()
+    
+    # Write the machine-readable run report and print the summary table
+    run_report['wall_time_s'] = time.monotonic() - run_started
+    run_report['status'] = 'failed' if failed else 'ok'
+    run_report['stages'] = stage_reports
+    previous = load_previous_report()
+    try:
+        save_run_report(run_report)
+        logger.info(f"Run report saved to: {RUN_REPORT_FILE}")
+    except OSError as e:
+        logger.error(f"Could not save run report: {e}")
+    print_run_summary(run_report, previous)
     
-    # Run scripts in sequence
-    for script in scripts:
-        if not run_script(script):
-            logger.error(f"Pipeline failed at {script}. Exiting.")
-            sys.exit(1)
+    if failed:
+        logger.error(f"Pipeline failed at {failed}. Exiting.")
+        sys.exit(1)
     
     logger.info("Production analysis pipeline completed successfully")
     logger.info("Log file saved to: production_execution.log")
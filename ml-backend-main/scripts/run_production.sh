@@ -44,7 +44,7 @@ python3 -c "
 import sys
 required_packages = [
     'pandas', 'numpy', 'requests', 'sqlalchemy', 'psycopg2-binary',
-    'scikit-learn', 'matplotlib', 'seaborn', 'yfinance', 'ta'
+    'scikit-learn', 'matplotlib', 'seaborn', 'yfinance', 'ta', 'pyarrow'
 ]
 
 missing_packages = []
@@ -73,25 +73,28 @@ echo "Starting production analysis pipeline..." | tee -a $LOG_FILE
 # 1. Generate daily data
 run_script "generate_daily_data.py"
 
-# 2. Generate zones
+# 2. Bulk load daily data into the database
+run_script "load_daily_data.py"
+
+# 3. Generate zones
 run_script "generate_zones.py"
 
-# 3. Generate trendlines
+# 4. Generate trendlines
 run_script "generate_trendline.py"
 
-# 4. Generate trading zones
+# 5. Generate trading zones
 run_script "generate_trading_zone.py"
 
-# 5. Generate signals
+# 6. Generate signals
 run_script "generate_signals.py"
 
-# 6. Generate AI signals (commented out by default)
+# 7. Generate AI signals (commented out by default)
 # run_script "generate_ai_signals.py"
 
-# 7. Prepare ML dataset
+# 8. Prepare ML dataset
 run_script "prepare_ml_dataset.py"
 
-# 8. Update Trading Signals
+# 9. Update Trading Signals
 run_script "update_trading_signals.py"
 
 echo "Production analysis pipeline completed at $(date)" | tee -a $LOG_FILE
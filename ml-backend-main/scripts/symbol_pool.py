@@ -0,0 +1,84 @@
+"""
+Symbol-sharded process pool for the per-symbol analysis scripts
+
+Scripts describe their work as (symbol, payload) tasks and a module-level
+function process_fn(symbol, payload, conn). run_sharded() runs the tasks
+either serially on the caller's connection or across a process pool where
+every worker opens its own database connection, closed when the pool
+finishes. Results come back in task order regardless of which worker
+finished first, and an exception for one symbol is logged and reported
+without stopping the others. Row and symbol counters recorded in the
+workers are added to this process's pipeline_metrics.
+"""
+
+import logging
+import multiprocessing
+from multiprocessing import util
+
+import pipeline_metrics
+
+logger = logging.getLogger(__name__)
+
+# State of the current pool worker process, set up by _init_worker
+_worker = {}
+
+def add_workers_argument(parser):
+    """Add the common --workers option to a script's argument parser"""
+    parser.add_argument(
+        '--workers', type=int, default=1,
+        help="Number of worker processes to split the symbols across (default: 1)"
+    )
+
+def _close_worker_conn(conn):
+    try:
+        conn.close()
+    except Exception as e:
+        logger.warning(f"Error closing worker connection: {e}")
+
+def _init_worker(process_fn, get_conn):
+    _worker['process_fn'] = process_fn
+    _worker['conn'] = get_conn() if get_conn is not None else None
+    if _worker['conn'] is not None:
+        # Runs when the worker exits after the pool is closed and joined
+        util.Finalize(_worker['conn'], _close_worker_conn, args=(_worker['conn'],), exitpriority=10)
+
+def _run_task(process_fn, conn, task):
+    symbol, payload = task
+    try:
+        return symbol, process_fn(symbol, payload, conn), None
+    except Exception as e:
+        logger.error(f"Error processing {symbol}: {e}")
+        return symbol, None, str(e)
+
+def _run_worker_task(task):
+    pipeline_metrics.reset()
+    result = _run_task(_worker['process_fn'], _worker['conn'], task)
+    return result, pipeline_metrics.snapshot()
+
+def run_sharded(tasks, process_fn, workers=1, get_conn=None, conn=None):
+    """
+    Run process_fn over (symbol, payload) tasks and yield
+    (symbol, result, error) tuples in task order.
+
+    With workers <= 1 the tasks run in this process on conn. Otherwise they
+    are split across a pool of that many processes, each of which calls
+    get_conn() once for its own connection.
+    """
+    if workers <= 1:
+        for task in tasks:
+            yield _run_task(process_fn, conn, task)
+        return
+
+    # A few chunks per worker keeps the pool balanced when symbols differ in cost
+    chunksize = max(1, len(tasks) // (workers * 4)) if hasattr(tasks, '__len__') else 1
+    logger.info(f"Splitting symbols across {workers} worker processes")
+
+    with multiprocessing.Pool(workers, initializer=_init_worker,
+                              initargs=(process_fn, get_conn)) as pool:
+        for result, metrics in pool.imap(_run_worker_task, tasks, chunksize):
+            pipeline_metrics.count(**metrics)
+            yield result
+        # Let the workers exit on their own (rather than be terminated when
+        # the pool is left) so they close their connections
+        pool.close()
+        pool.join()
@@ -18,6 +18,10 @@ import openpyxl
 from openpyxl.styles import PatternFill, Font, Alignment
 from openpyxl.utils import get_column_letter
 import logging
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ohlcv_store
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -33,14 +37,11 @@ def get_db_connection():
 
 def load_and_prepare_data(data_dir='all-data'):
     all_data = []
-    csv_files = list(Path(data_dir).glob('*_daily_data_*.csv'))
-    for file_path in csv_files:
+    for symbol, df in ohlcv_store.iter_symbols(store_dir=data_dir):
         try:
-            df = pd.read_csv(file_path)
-            df['date'] = pd.to_datetime(df['date'])
             df = df.sort_values('date')
             if 'symbol' not in df.columns:
-                df['symbol'] = file_path.stem.split('_')[0]
+                df['symbol'] = symbol
             # Technical indicators
             df['sma_20'] = SMAIndicator(close=df['close'], window=20).sma_indicator()
             df['sma_50'] = SMAIndicator(close=df['close'], window=50).sma_indicator()
@@ -66,7 +67,7 @@ def load_and_prepare_data(data_dir='all-data'):
             df = df.dropna()
             all_data.append(df)
         except Exception as e:
-            logger.warning(f"Error processing {file_path}: {str(e)}")
+            logger.warning(f"Error processing {symbol}: {str(e)}")
             continue
     if all_data:
         return pd.concat(all_data, ignore_index=True)
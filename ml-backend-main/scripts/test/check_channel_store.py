@@ -0,0 +1,93 @@
+# Check: store_simplified_trendlines with a subset of CHANNEL_TIMEFRAMES only
+# replaces the channels of the analyzed (symbol, timeframe) pairs. Runs main()
+# for every timeframe and then for one, against an in-memory trend_channels table
+# standing in for Postgres, and reports any row the subset run lost or changed.
+import os
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import checkpoints
+import generate_trendlines_simplified as channels
+
+class ChannelsTable:
+    """The statements store_simplified_trendlines issues, applied to a list of rows"""
+
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=None):
+        if not sql.strip().startswith("DELETE FROM trend_channels"):
+            raise AssertionError(f"Unexpected statement: {sql}")
+        pairs = set(zip(*params))
+        self.rows = [row for row in self.rows if (row[0], row[1]) not in pairs]
+
+    def insert(self, sql, values):
+        if not sql.strip().startswith("INSERT INTO trend_channels"):
+            raise AssertionError(f"Unexpected statement: {sql}")
+        keys = {row[:3] for row in self.rows}
+        for row in values:
+            if row[:3] in keys:
+                raise AssertionError(f"Duplicate trendline {row[:3]}")
+            keys.add(row[:3])
+            self.rows.append(tuple(row))
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+def daily_bars(symbols=('AAA', 'BBB', 'CCC'), days=900, seed=3):
+    """Random daily bars, trending enough for every timeframe to find a channel"""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for symbol in symbols:
+        dates = pd.bdate_range('2021-01-04', periods=days)
+        close = np.round(rng.uniform(50, 900) * np.exp(np.cumsum(rng.normal(0, 0.012, days))), 1)
+        frames.append(pd.DataFrame({
+            'date': dates, 'symbol': symbol, 'open': close,
+            'high': np.round(close * (1 + rng.uniform(0, 0.02, days)), 1),
+            'low': np.round(close * (1 - rng.uniform(0, 0.02, days)), 1),
+            'close': close, 'volume': 1000.0,
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+if __name__ == "__main__":
+    checkpoint_dir = tempfile.mkdtemp()
+    make_checkpoint = checkpoints.SymbolCheckpoint
+    channels.SymbolCheckpoint = lambda stage, resume: make_checkpoint(stage, resume, checkpoint_dir)
+    channels.execute_values = lambda cursor, sql, values, page_size=100: cursor.insert(sql, values)
+
+    daily_df = daily_bars()
+    # Channels of a symbol the runs don't analyze
+    other = ('ZZZ', 90, 1, None, None, 1.0, 2.0, 0.1, 'upper')
+    table = ChannelsTable([other])
+    channels.main(conn=table, daily_df=daily_df)
+    before = set(table.rows)
+
+    subset = [channels.CHANNEL_TIMEFRAMES[-1]]
+    table.rows = [row for row in table.rows if row[1] != subset[0]['days']]
+    channels.main(conn=table, daily_df=daily_df, timeframes=subset)
+    after = set(table.rows)
+
+    failures = 0
+    if other not in after:
+        failures += 1
+        print("The subset run deleted another symbol's channel")
+    if after != before:
+        failures += 1
+        print(f"The subset run changed other rows:\n  lost: {sorted(before - after, key=str)}"
+              f"\n  added: {sorted(after - before, key=str)}")
+    timeframes = sorted({row[1] for row in before if row[0] in ('BBB', 'CCC')})
+    print(f"{len(before)} channel lines over timeframes {timeframes}, "
+          f"{failures} failures after a {subset[0]['days']}-day run")
+    sys.exit(1 if failures else 0)
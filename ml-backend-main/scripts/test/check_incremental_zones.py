@@ -0,0 +1,68 @@
+# Check: generate_zones.analyze_zones with the cluster state of the previous day
+# gives the same zones as analyzing from scratch. Replays random daily bars one
+# day at a time through the state (round-tripped through JSON like the zone
+# state file), compares every timeframe's zones with a run without state, and
+# reports how many candidate points were clustered again.
+import contextlib
+import io
+import json
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import generate_zones
+
+TIMEFRAMES = [30, 90, 180, 365]
+
+def daily_bars(days, seed):
+    """Random daily bars quoted to two decimals"""
+    rng = np.random.default_rng(seed)
+    close = rng.uniform(100, 2000) * np.exp(np.cumsum(rng.normal(0, 0.015, days)))
+    df = pd.DataFrame({
+        'open': close,
+        'high': close * (1 + rng.uniform(0, 0.02, days)),
+        'low': close * (1 - rng.uniform(0, 0.02, days)),
+        'close': close,
+        'volume': rng.integers(1000, 100000, days),
+    }, index=pd.bdate_range('2021-01-04', periods=days))
+    return df.round(2)
+
+def replay(df, first_day, counts):
+    """Analyze every day from first_day on with and without state, returning the mismatches"""
+    mismatches = 0
+    clusters = {}
+    for end in range(first_day, len(df) + 1):
+        window = df.iloc[:end]
+        with contextlib.redirect_stdout(io.StringIO()):
+            counts['clustered'] = 0
+            expected = generate_zones.analyze_zones(window, TIMEFRAMES)
+            counts['full'] += counts['clustered']
+            counts['clustered'] = 0
+            actual = generate_zones.analyze_zones(window, TIMEFRAMES, clusters=clusters)
+            counts['incremental'] += counts['clustered']
+        clusters = json.loads(json.dumps(clusters))
+        for days in TIMEFRAMES:
+            if expected[days] != actual[days]:
+                mismatches += 1
+                print(f"Mismatch on {window.index[-1].date()} ({days} days):\n"
+                      f"  from scratch: {expected[days]}\n  incremental: {actual[days]}")
+    return mismatches
+
+if __name__ == "__main__":
+    # Count the points cluster_zones clusters, with or without state
+    counts = {'clustered': 0, 'full': 0, 'incremental': 0}
+    cluster_prices = generate_zones.cluster_prices
+
+    def counting_cluster_prices(values, *args, **kwargs):
+        counts['clustered'] += len(values)
+        return cluster_prices(values, *args, **kwargs)
+    generate_zones.cluster_prices = counting_cluster_prices
+
+    failures = 0
+    for seed in range(4):
+        failures += replay(daily_bars(600, seed), 500, counts)
+    print(f"{failures} mismatches; clustered {counts['full']} points from scratch, "
+          f"{counts['incremental']} with the previous day's state")
+    sys.exit(1 if failures else 0)
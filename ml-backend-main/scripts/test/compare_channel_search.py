@@ -0,0 +1,246 @@
+# Equivalence check: channel_search.find_best_channel against the original
+# nested-loop channel search of generate_trendlines_simplified.find_trend_channel
+# and its per-date R-squared loop. Runs both on random price series over the
+# script's timeframes and on the stored daily data if it is available, and
+# reports any channel that differs. The prefix-sum R-squared sums in another
+# order, so scores are compared to a relative tolerance. Fixed edge cases (an
+# empty frame, a single bar, all-equal closes) are checked too.
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from scipy.signal import argrelextrema
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from generate_trendlines_simplified import (find_trend_channel, calculate_channel_width,
+                                            calculate_channel_r_squared, channel_scorer)
+import ohlcv_store
+
+# The 1095-day window is left out: the loops take minutes per window there
+TIMEFRAMES = [90, 180, 540]
+
+SCORE_FIELDS = ('slope', 'channel_width', 'r_squared')
+
+def loop_channel_r_squared(df, upper_start, upper_end, lower_start, lower_end,
+                           upper_start_price, upper_end_price, lower_start_price, lower_end_price, slope):
+    """The original per-date R-squared, kept here as the reference"""
+    start_date = max(upper_start, lower_start)
+    end_date = min(upper_end, lower_end)
+    if start_date >= end_date:
+        return 0
+    period_data = df[(df.index >= start_date) & (df.index <= end_date)]
+    if len(period_data) < 5:
+        return 0
+    actual_prices = list(period_data['close'])
+    mean_price = np.mean(actual_prices)
+    total_deviation = 0
+    total_variance = 0
+    for date, actual in zip(period_data.index, actual_prices):
+        upper = upper_start_price + (slope * (date - upper_start).days)
+        lower = lower_start_price + (slope * (date - lower_start).days)
+        total_deviation += abs(actual - (upper + lower) / 2)
+        total_variance += (actual - mean_price) ** 2
+    if total_variance == 0:
+        return 0
+    return max(0, 1 - (total_deviation / total_variance))
+
+def same_channel(expected, actual):
+    """Same lines, and scores equal to a relative tolerance"""
+    if expected is None or actual is None:
+        return expected is actual
+    if expected.keys() != actual.keys():
+        return False
+    return all(np.isclose(expected[key], actual[key], rtol=1e-9, atol=1e-12) if key in SCORE_FIELDS
+               else expected[key] == actual[key] for key in expected)
+
+def flat_period_channel(df, channel):
+    """
+    True for a channel the loops scored over a period of one repeated close:
+    rounding in np.mean can leave that period a tiny variance and the loops
+    an R-squared of 1, where the prefix sums see no variance and score 0
+    """
+    start = max(channel['upper_start_date'], channel['lower_start_date'])
+    end = min(channel['upper_end_date'], channel['lower_end_date'])
+    return df.loc[start:end, 'close'].nunique() == 1
+
+def loop_trend_channel(df, timeframe_days):
+    """The original O(H^2 * L^2) search, kept here as the reference"""
+    if len(df) < 20:
+        return None
+    pivot_highs = argrelextrema(df['high'].values, np.greater, order=5)[0]
+    pivot_lows = argrelextrema(df['low'].values, np.less, order=5)[0]
+    if len(pivot_highs) < 2 or len(pivot_lows) < 2:
+        return None
+    high_prices = df.iloc[pivot_highs]['high'].values
+    high_dates = df.iloc[pivot_highs].index
+    low_prices = df.iloc[pivot_lows]['low'].values
+    low_dates = df.iloc[pivot_lows].index
+
+    best_channel = None
+    best_r_squared = 0
+    for i in range(len(high_prices)):
+        for j in range(i + 1, len(high_prices)):
+            days_diff_upper = (high_dates[j] - high_dates[i]).days
+            if days_diff_upper < 15:
+                continue
+            slope_upper = (high_prices[j] - high_prices[i]) / days_diff_upper
+            for k in range(len(low_prices)):
+                for l in range(k + 1, len(low_prices)):
+                    days_diff_lower = (low_dates[l] - low_dates[k]).days
+                    if days_diff_lower < 15:
+                        continue
+                    slope_lower = (low_prices[l] - low_prices[k]) / days_diff_lower
+                    if abs(slope_upper - slope_lower) > 0.1:
+                        continue
+                    avg_slope = (slope_upper + slope_lower) / 2
+                    args = (df, high_dates[i], high_dates[j], low_dates[k], low_dates[l],
+                            high_prices[i], high_prices[j], low_prices[k], low_prices[l], avg_slope)
+                    channel_width = calculate_channel_width(*args)
+                    r_squared = loop_channel_r_squared(*args)
+                    if r_squared > best_r_squared and r_squared > 0.2 and channel_width > 0:
+                        best_r_squared = r_squared
+                        best_channel = {
+                            'upper_start_date': high_dates[i],
+                            'upper_end_date': high_dates[j],
+                            'upper_start_price': high_prices[i],
+                            'upper_end_price': high_prices[j],
+                            'lower_start_date': low_dates[k],
+                            'lower_end_date': low_dates[l],
+                            'lower_start_price': low_prices[k],
+                            'lower_end_price': low_prices[l],
+                            'slope': avg_slope,
+                            'channel_width': channel_width,
+                            'r_squared': r_squared,
+                            'timeframe_days': timeframe_days
+                        }
+    return best_channel
+
+def random_frames(count=12, seed=7):
+    """Yield random daily bars, some flat-ish and some trending, quoted to one decimal"""
+    rng = np.random.default_rng(seed)
+    for _ in range(count):
+        size = int(rng.integers(30, 300))
+        dates = pd.bdate_range('2021-01-04', periods=size)
+        close = rng.uniform(5, 500) * np.exp(np.cumsum(rng.normal(rng.normal(0, 0.002), rng.uniform(0.005, 0.03), size)))
+        df = pd.DataFrame({
+            'high': close * (1 + rng.uniform(0, 0.02, size)),
+            'low': close * (1 - rng.uniform(0, 0.02, size)),
+            'close': close,
+        }, index=dates)
+        yield df.round(1)
+
+def stored_frames(limit=3):
+    """Yield the daily bars of the first stored symbols"""
+    for symbol, df in ohlcv_store.iter_symbols(ohlcv_store.list_symbols()[:limit],
+                                               columns=['date', 'high', 'low', 'close']):
+        yield df.set_index('date').sort_index()
+
+def check_scores(df, count=200, seed=11):
+    """Compare calculate_channel_r_squared with the loop on random channels of one frame"""
+    rng = np.random.default_rng(seed)
+    scorer = channel_scorer(df)
+    mismatches = 0
+    for _ in range(count):
+        us, ue = np.sort(rng.choice(len(df), 2, replace=False))
+        ls, le = np.sort(rng.choice(len(df), 2, replace=False))
+        slope = rng.normal(0, 0.5)
+        args = (df, df.index[us], df.index[ue], df.index[ls], df.index[le],
+                df['high'].iloc[us], df['high'].iloc[ue], df['low'].iloc[ls], df['low'].iloc[le], slope)
+        expected = loop_channel_r_squared(*args)
+        actual = calculate_channel_r_squared(*args, scorer=scorer)
+        if not np.isclose(expected, actual, rtol=1e-9, atol=1e-12):
+            mismatches += 1
+            print(f"R-squared mismatch: loop {expected} vs prefix sums {actual}")
+    return mismatches
+
+def bars(high, low, close):
+    """Daily bars on consecutive business days"""
+    return pd.DataFrame({'high': high, 'low': low, 'close': close},
+                        index=pd.bdate_range('2021-01-04', periods=len(close)), dtype=np.float64)
+
+def edge_cases():
+    """Check an empty frame, a single bar and all-equal closes, returning the failure count"""
+    failures = 0
+    
+    def check(ok, description):
+        nonlocal failures
+        if not ok:
+            failures += 1
+            print(f"Edge case failed: {description}")
+    
+    t = np.arange(80)
+    wave = 5 * np.sin(2 * np.pi * t / 20)
+    frames = {
+        'empty frame': bars([], [], []),
+        'single bar': bars([101.0], [99.0], [100.0]),
+        'all-equal bars': bars(np.full(80, 100.0), np.full(80, 100.0), np.full(80, 100.0)),
+        # Pivots to build channels from, but one repeated close to score them on
+        'all-equal closes': bars(100.0 + 2 + wave, 100.0 - 2 + wave, np.full(80, 100.0)),
+        'all-equal closes off the grid': bars(12.3 + 2 + wave, 12.3 - 2 + wave, np.full(80, 12.3)),
+    }
+    for name, df in frames.items():
+        for days in TIMEFRAMES:
+            expected = loop_trend_channel(df, days)
+            actual = find_trend_channel(df, days)
+            # The loops may still score a flat period from np.mean's rounding,
+            # as in run(); the vectorized search must find no channel
+            check(actual is None and (expected is None or flat_period_channel(df, expected)),
+                  f"{name}, {days} days: expected no channel, got loops {expected}, vectorized {actual}")
+        
+        # Any channel over one repeated close has no variance, so scores 0
+        scorer = channel_scorer(df)
+        first, last = pd.Timestamp('2021-01-04'), pd.Timestamp('2021-03-01')
+        if len(df):
+            first, last = df.index[0], df.index[-1]
+        args = (df, first, last, first, last, 101.0, 101.0, 99.0, 99.0, 0.0)
+        r_squared = calculate_channel_r_squared(*args, scorer=scorer)
+        check(r_squared == 0, f"{name}: R-squared over the whole frame should be 0, got {r_squared}")
+        if len(df) >= 2 and name != 'all-equal closes off the grid':
+            check(check_scores(df) == 0, f"{name}: R-squared differs from the loop")
+    
+    # The off-grid close is where np.mean leaves that residue, so only the
+    # prefix sums are held to 0 there
+    df = frames['all-equal closes off the grid']
+    scorer = channel_scorer(df)
+    rng = np.random.default_rng(3)
+    for _ in range(200):
+        start, end = np.sort(rng.choice(len(df), 2, replace=False))
+        r_squared = calculate_channel_r_squared(df, df.index[start], df.index[end], df.index[start], df.index[end],
+                                                df['high'].iloc[start], df['high'].iloc[end], df['low'].iloc[start],
+                                                df['low'].iloc[end], rng.normal(0, 0.5), scorer=scorer)
+        check(r_squared == 0, f"flat period [{start}, {end}] scored {r_squared}")
+    
+    print(f"edge cases: {failures} failures")
+    return failures
+
+def run(frames, label):
+    checked = mismatches = 0
+    loop_time = fast_time = 0.0
+    for df in frames:
+        mismatches += check_scores(df)
+        for days in TIMEFRAMES:
+            window = df[df.index >= df.index.max() - pd.Timedelta(days=days)]
+            started = time.perf_counter()
+            expected = loop_trend_channel(window, days)
+            loop_time += time.perf_counter() - started
+            started = time.perf_counter()
+            actual = find_trend_channel(window, days)
+            fast_time += time.perf_counter() - started
+            checked += 1
+            if not same_channel(expected, actual):
+                if flat_period_channel(window, expected):
+                    print(f"Flat period scored by the loops only ({label}, {days} days): {expected}")
+                    continue
+                mismatches += 1
+                print(f"Mismatch ({label}, {days} days):\n  loops: {expected}\n  vectorized: {actual}")
+    print(f"{label}: {checked} windows, {mismatches} mismatches, "
+          f"loops {loop_time:.1f}s vs vectorized {fast_time:.1f}s")
+    return mismatches
+
+if __name__ == "__main__":
+    failures = edge_cases()
+    failures += run(random_frames(), "random")
+    if ohlcv_store.list_symbols():
+        failures += run(stored_frames(), "stored daily data")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,124 @@
+# Equivalence check: price_clustering.cluster_prices against sklearn's DBSCAN
+# Runs the eps = 0.2 * std rule used by generate_zones.analyze_zones on random
+# price series (rounded to paisa, with repeated prices and near-ties) and on
+# the stored daily data if it is available, and reports any label mismatch.
+# Fixed edge cases (empty, a single price, all-equal prices) are checked too.
+import os
+import sys
+import time
+import numpy as np
+from sklearn.cluster import DBSCAN
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from price_clustering import cluster_prices
+import ohlcv_store
+
+def compare(values, eps, min_samples=2):
+    """Return True if both implementations give the same labels"""
+    X = np.asarray(values, dtype=np.float64).reshape(-1, 1)
+    expected = DBSCAN(eps=eps, min_samples=min_samples).fit(X).labels_
+    actual = cluster_prices(X, eps, min_samples)
+    return np.array_equal(expected, actual)
+
+def random_cases(count=5000, seed=42):
+    """Yield random price samples shaped like the zone candidate points"""
+    rng = np.random.default_rng(seed)
+    for _ in range(count):
+        size = int(rng.integers(2, 120))
+        level = rng.uniform(50, 3000)
+        spread = rng.uniform(0.001, 0.2)
+        values = level * (1 + rng.normal(0, spread, size))
+        if rng.random() < 0.5:
+            # Real prices are quoted to two decimals, so repeats are common
+            values = np.round(values, 2)
+        if rng.random() < 0.2:
+            values = np.concatenate([values, rng.choice(values, size=size // 3 + 1)])
+        yield values
+
+def stored_cases(window=90):
+    """Yield the resistance and support candidate prices of every stored symbol"""
+    for symbol, df in ohlcv_store.iter_symbols(columns=['date', 'high', 'low']):
+        df = df.set_index('date').sort_index()
+        df = df[df.index >= df.index.max() - np.timedelta64(window, 'D')]
+        size = max(3, min(15, window // 20))
+        yield df['high'][df['high'] >= df['high'].rolling(size).max() * 0.995].values
+        yield df['low'][df['low'] <= df['low'].rolling(size).min() * 1.005].values
+
+def raises_value_error(fit):
+    try:
+        fit()
+    except ValueError:
+        return True
+    return False
+
+def edge_cases():
+    """Check empty, single-price and all-equal inputs, returning the failure count"""
+    failures = 0
+    
+    def check(ok, description):
+        nonlocal failures
+        if not ok:
+            failures += 1
+            print(f"Edge case failed: {description}")
+    
+    # DBSCAN rejects an empty array; callers skip empty candidates, and
+    # cluster_prices just returns no labels
+    labels = cluster_prices(np.empty((0, 1)), 1.0, 2)
+    check(len(labels) == 0, "empty input should give no labels")
+    
+    for values in ([101.5], [250.0] * 7):
+        X = np.asarray(values).reshape(-1, 1)
+        # The 0.2 * std rule gives eps = 0 here, which both implementations reject
+        eps = np.std(values) * 0.2
+        check(raises_value_error(lambda: DBSCAN(eps=eps, min_samples=2).fit(X)),
+              f"DBSCAN should reject eps={eps} for {values}")
+        check(raises_value_error(lambda: cluster_prices(X, eps, 2)),
+              f"cluster_prices should reject eps={eps} for {values}")
+        # With a positive eps the labels must match
+        for eps in (0.01, 1.0):
+            for min_samples in (1, 2, 3):
+                check(compare(values, eps, min_samples),
+                      f"labels differ for {values}, eps={eps}, min_samples={min_samples}")
+    
+    # All-equal prices with a positive eps form one cluster
+    labels = cluster_prices(np.full((7, 1), 250.0), 0.5, 2)
+    check(np.array_equal(labels, np.zeros(7, dtype=labels.dtype)),
+          f"all-equal prices should form one cluster, got {labels}")
+    # A single price is noise unless min_samples is 1
+    check(list(cluster_prices([[101.5]], 0.5, 2)) == [-1], "a single price should be noise")
+    check(list(cluster_prices([[101.5]], 0.5, 1)) == [0], "a single price should be its own cluster")
+    
+    print(f"edge cases: {failures} failures")
+    return failures
+
+def run(cases, label):
+    checked = mismatches = 0
+    sklearn_time = fast_time = 0.0
+    for values in cases:
+        if len(values) == 0:
+            continue
+        eps = np.std(values) * 0.2
+        if not eps > 0:
+            continue
+        for min_samples in (2, 3):
+            if not compare(values, eps, min_samples):
+                mismatches += 1
+                print(f"Mismatch ({label}, min_samples={min_samples}): {list(values)}")
+        X = values.reshape(-1, 1)
+        started = time.perf_counter()
+        DBSCAN(eps=eps, min_samples=2).fit(X)
+        sklearn_time += time.perf_counter() - started
+        started = time.perf_counter()
+        cluster_prices(X, eps, 2)
+        fast_time += time.perf_counter() - started
+        checked += 1
+    print(f"{label}: {checked} samples, {mismatches} mismatches, "
+          f"DBSCAN {sklearn_time:.2f}s vs cluster_prices {fast_time:.2f}s")
+    return mismatches
+
+if __name__ == "__main__":
+    failures = edge_cases()
+    failures += run(random_cases(), "random")
+    if ohlcv_store.list_symbols():
+        failures += run(stored_cases(), "stored daily data")
+    sys.exit(1 if failures else 0)
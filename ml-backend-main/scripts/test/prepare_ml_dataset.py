@@ -11,21 +11,23 @@ from tabulate import tabulate
 import openpyxl
 from openpyxl.styles import PatternFill, Font, Alignment
 from openpyxl.utils import get_column_letter
+import sys
 import warnings
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ohlcv_store
+
 # Minimum required data points for reliable technical analysis
 MIN_DATA_POINTS = 50  # Minimum number of data points required
 MIN_DAYS = 30  # Minimum number of days required
 
 def get_data_directory():
     """Get the absolute path to the data directory."""
-    # Get the absolute path to the backend directory
-    backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    # Return the path to the all-data directory
-    return os.path.join(backend_dir, 'all-data')
+    # The per-symbol daily data store lives in the all-data directory
+    return ohlcv_store.STORE_DIR
 
 def load_and_prepare_data(data_dir=None):
-    """Load all CSV files and prepare the dataset with technical indicators."""
+    """Load every stored symbol and prepare the dataset with technical indicators."""
     all_data = []
     skipped_files = []
     
@@ -33,26 +35,26 @@ def load_and_prepare_data(data_dir=None):
     if data_dir is None:
         data_dir = get_data_directory()
     
-    print(f"Looking for CSV files in: {data_dir}")
+    print(f"Looking for stored daily data in: {data_dir}")
     
-    # Get all CSV files
-    csv_files = list(Path(data_dir).glob('*_daily_data_*.csv'))
+    # Get all stored symbols
+    symbols = ohlcv_store.list_symbols(data_dir)
     
-    if not csv_files:
-        warnings.warn(f"No CSV files found in {data_dir} directory")
+    if not symbols:
+        warnings.warn(f"No symbols found in {data_dir} directory")
         return None
     
-    print(f"Found {len(csv_files)} CSV files")
+    print(f"Found {len(symbols)} symbols")
     
-    for file_path in csv_files:
+    for symbol in symbols:
         try:
-            # Read CSV file
-            df = pd.read_csv(file_path)
+            # Read the symbol from the store
+            df = ohlcv_store.read_ohlcv([symbol], store_dir=data_dir)
             
             # Check if file has enough data points
             if len(df) < MIN_DATA_POINTS:
-                warnings.warn(f"Insufficient data points in {file_path.name}: {len(df)} points (minimum {MIN_DATA_POINTS} required)")
-                skipped_files.append((file_path.name, "insufficient_data_points"))
+                warnings.warn(f"Insufficient data points in {symbol}: {len(df)} points (minimum {MIN_DATA_POINTS} required)")
+                skipped_files.append((symbol, "insufficient_data_points"))
                 continue
             
             # Convert date to datetime
@@ -61,8 +63,8 @@ def load_and_prepare_data(data_dir=None):
             # Check if data spans enough days
             date_range = (df['date'].max() - df['date'].min()).days
             if date_range < MIN_DAYS:
-                warnings.warn(f"Insufficient date range in {file_path.name}: {date_range} days (minimum {MIN_DAYS} days required)")
-                skipped_files.append((file_path.name, "insufficient_date_range"))
+                warnings.warn(f"Insufficient date range in {symbol}: {date_range} days (minimum {MIN_DAYS} days required)")
+                skipped_files.append((symbol, "insufficient_date_range"))
                 continue
             
             # Sort by date
@@ -70,14 +72,14 @@ def load_and_prepare_data(data_dir=None):
             
             # Add symbol column if not present
             if 'symbol' not in df.columns:
-                df['symbol'] = file_path.stem.split('_')[0]
+                df['symbol'] = symbol
             
             # Check for missing values in essential columns
             essential_columns = ['open', 'high', 'low', 'close', 'volume']
             missing_values = df[essential_columns].isnull().sum()
             if missing_values.any():
-                warnings.warn(f"Missing values found in {file_path.name}:\n{missing_values[missing_values > 0]}")
-                skipped_files.append((file_path.name, "missing_values"))
+                warnings.warn(f"Missing values found in {symbol}:\n{missing_values[missing_values > 0]}")
+                skipped_files.append((symbol, "missing_values"))
                 continue
             
             # Calculate technical indicators
@@ -132,16 +134,16 @@ def load_and_prepare_data(data_dir=None):
             
             # Check if enough data remains after technical indicator calculations
             if len(df) < MIN_DATA_POINTS:
-                warnings.warn(f"Insufficient data points after technical calculations in {file_path.name}: {len(df)} points (minimum {MIN_DATA_POINTS} required)")
-                skipped_files.append((file_path.name, "insufficient_data_after_calculations"))
+                warnings.warn(f"Insufficient data points after technical calculations in {symbol}: {len(df)} points (minimum {MIN_DATA_POINTS} required)")
+                skipped_files.append((symbol, "insufficient_data_after_calculations"))
                 continue
             
             all_data.append(df)
-            print(f"Successfully processed {file_path.name}")
+            print(f"Successfully processed {symbol}")
             
         except Exception as e:
-            warnings.warn(f"Error processing {file_path}: {str(e)}")
-            skipped_files.append((file_path.name, str(e)))
+            warnings.warn(f"Error processing {symbol}: {str(e)}")
+            skipped_files.append((symbol, str(e)))
             continue
     
     # Print summary of skipped files
@@ -4,6 +4,7 @@ import logging
 from datetime import datetime
 import os
 from dotenv import load_dotenv
+import pipeline_metrics
 
 # Load environment variables
 load_dotenv()
@@ -21,9 +22,11 @@ def get_db_connection():
         password=os.getenv('DB_PASSWORD', 'postgres')
     )
 
-def update_trading_signals():
+def update_trading_signals(conn=None):
     """Update trading_signals table with latest data from signal_history_analytics."""
-    conn = get_db_connection()
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
@@ -98,6 +101,7 @@ def update_trading_signals():
         signal_dist = cursor.fetchall()
         
         conn.commit()
+        pipeline_metrics.count(rows_written=count, symbols_processed=count)
         
         # Print summary
         logger.info(f"Successfully inserted {count} trading signals")
@@ -111,9 +115,13 @@ def update_trading_signals():
         raise
     finally:
         cursor.close()
-        conn.close()
+        if own_conn:
+            conn.close()
 
-if __name__ == "__main__":
+def main(conn=None):
     logger.info(f"Starting trading signals update at {datetime.now()}")
-    update_trading_signals()
-    logger.info(f"Completed trading signals update at {datetime.now()}") 
\ No newline at end of file
+    update_trading_signals(conn)
+    logger.info(f"Completed trading signals update at {datetime.now()}")
+
+if __name__ == "__main__":
+    main() 
\ No newline at end of file